@@ -1,11 +1,16 @@
-from flask import Flask, render_template, redirect, session, request, url_for
+from flask import Flask, render_template, redirect, session, request, url_for, jsonify, get_template_attribute
 from werkzeug.security import generate_password_hash
+from datetime import date as dt_date, datetime, timedelta
+import hashlib
 import os
 from dotenv import load_dotenv
 import uuid
 
+import assets
 import database
-import scraper
+import menu_cache
+import profiling
+import utils
 
 load_dotenv()
 
@@ -13,6 +18,10 @@ app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY")
 if not app.secret_key:
     raise RuntimeError("FLASK_SECRET_KEY not set")
+app.config["MENU_FRAGMENT_CACHE"] = os.getenv("MENU_FRAGMENT_CACHE", "1") != "0"
+assets.init_app(app) # fingerprinted, pre-compressed static files with immutable caching
+app.config["READY"] = False # set by warm_up(), reported by /ready
+profiling.init_app(app, database.DB_PATH) # per-route latency/sql stats at /metrics when TERP_PROFILE=1
 
 
 @app.route('/')
@@ -64,13 +73,23 @@ def continue_as_guest():
 
 @app.route("/menu", methods=["GET", "POST"])
 def menu():
+    # hall/date can also come from the url, menu.js keeps them there when switching in the browser
+    locations = database.get_locations()
+    if request.args.get("hall") in dict(locations):
+        session["dining_hall"] = request.args["hall"]
+    if request.args.get("date"):
+        try:
+            session["date"] = database.format_date(request.args["date"])
+        except ValueError:
+            pass
+
     dining_hall = session.get("dining_hall")
     if not dining_hall:
         session["dining_hall"] = "South Campus" # default to south campus dining hall
 
-    current_date = scraper.get_formatted_date() # used for logging, DON'T CHANGE
+    current_date = utils.get_formatted_date() # used for logging, DON'T CHANGE
     if not session.get("date"):
-        date = scraper.get_formatted_date() # auto filled date used for displaying (based on current)
+        date = utils.get_formatted_date() # auto filled date used for displaying (based on current)
     else:
         date = session["date"]
 
@@ -97,36 +116,58 @@ def menu():
             meal = database.get_food_meal_by_id(menu_id)
 
             if session.get("user_id"):
-                database.log_food(True, session.get("user_id"), food_id, quantity, current_date, meal) # log food using user id
+                database.log_food(True, session.get("user_id"), food_id, quantity, current_date, meal, menu_id) # log food using user id
             else:
-                database.log_food(False, session.get("guest_id"), food_id, quantity, current_date, meal) # log food using guest id
+                database.log_food(False, session.get("guest_id"), food_id, quantity, current_date, meal, menu_id) # log food using guest id
 
         return redirect(url_for("dashboard"))
 
-    has_brunch = database.has_brunch(date)
+    generation = database.get_scrape_generation(date)
+    has_brunch = get_cached_has_brunch(date, generation)
+    meals = ['brunch', 'dinner'] if has_brunch else ['breakfast', 'lunch', 'dinner']
 
-    foods = {}
-    if has_brunch:
-        for meal in ['brunch', 'dinner']:
-            result = database.get_foods_by_meal(meal, date, dining_hall)
-            if result:
-                foods[meal] = result 
-    else:
-        for meal in ['breakfast', 'lunch', 'dinner']:
-            result = database.get_foods_by_meal(meal, date, dining_hall)
-            if result:
-                foods[meal] = result 
+    meal_fragments = {}
+    for meal in meals:
+        fragment = get_meal_fragment(meal, date, session["dining_hall"], generation, not meal_fragments)
+        if fragment:
+            meal_fragments[meal] = fragment
+
+    # nothing scraped for this date yet, ask the prefetcher to get it next
+    if not meal_fragments and generation == 0:
+        database.request_scrape(date)
 
     return render_template(
         "menu.html",
-        foods=foods,
+        locations=locations,
+        meal_fragments=meal_fragments,
         date=date,
         has_brunch=has_brunch
     )
 
+# ------------- MENU FRAGMENT CACHE ------------------------------
+# the per-meal menu html is the same for every visitor, so it is rendered once per
+# (date, hall, meal, scrape generation) and only the page around it is rendered per request
+def get_cached_has_brunch(date, generation):
+    key = ("has_brunch", date, generation)
+    has_brunch = menu_cache.get(key) if app.config["MENU_FRAGMENT_CACHE"] else None
+    if has_brunch is None:
+        has_brunch = database.has_brunch(date)
+        menu_cache.put(key, has_brunch)
+    return has_brunch
+
+# returns the rendered meal (Markup), or "" if the hall has no foods for that meal
+def get_meal_fragment(meal, date, dining_hall, generation, is_first):
+    key = ("meal", date, dining_hall, meal, generation, is_first)
+    fragment = menu_cache.get(key) if app.config["MENU_FRAGMENT_CACHE"] else None
+    if fragment is None:
+        foods = database.get_foods_by_meal(meal, date, dining_hall)
+        fragment = get_template_attribute("_meal.html", "render_meal")(meal, foods, is_first) if foods else ""
+        menu_cache.put(key, fragment)
+    return fragment
+
 @app.route('/dashboard')
 def dashboard():
-    date = scraper.get_formatted_date()
+    date = utils.get_formatted_date()
     username = None
 
     if 'user_id' in session:
@@ -142,7 +183,7 @@ def dashboard():
 
 @app.route('/view_logs')
 def view_logs():
-    date = scraper.get_formatted_date()
+    date = utils.get_formatted_date()
     username = None
 
     if 'user_id' in session:
@@ -170,7 +211,276 @@ def modify_log():
 
     return redirect(url_for('view_logs'))
 
-
+# ------------- PRODUCTION WARM-UP -------------------------------
+# called once before serving (wsgi.py, in the gunicorn master before it forks) so workers
+# start with compiled templates and today's menu fragments instead of paying for them on
+# their first requests
+def warm_up():
+    for template in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(template)
+
+    date = utils.get_formatted_date()
+    with app.app_context():
+        generation = database.get_scrape_generation(date)
+        has_brunch = get_cached_has_brunch(date, generation)
+        meals = ['brunch', 'dinner'] if has_brunch else ['breakfast', 'lunch', 'dinner']
+        for dining_hall, _ in database.get_locations():
+            is_first = True
+            for meal in meals:
+                if get_meal_fragment(meal, date, dining_hall, generation, is_first):
+                    is_first = False
+
+    app.config["READY"] = True
+
+@app.route('/ready')
+def ready():
+    if not app.config["READY"]:
+        return jsonify(status="warming up"), 503
+    return jsonify(status="ready")
+
+# ------------- JSON API -----------------------------------------
+PAST_MENU_MAX_AGE = 60 * 60 * 24 * 365 # scraped past menus never change, cache for a year
+CURRENT_MENU_MAX_AGE = 60 * 5 # today/upcoming menus can be re-scraped, revalidate often
+POPULAR_MENU_MAX_AGE = 60 # ?order=popular follows the popularity counters
+
+def get_menu_meals(date):
+    if database.has_brunch(date):
+        return ['brunch', 'dinner']
+    return ['breakfast', 'lunch', 'dinner']
+
+# strong etag for a menu, changes whenever a new scrape run is logged for that date
+def make_menu_etag(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+# generation 0 (never successfully scraped) can still change: the prefetcher scrapes past dates
+# on request, so an empty past menu mustn't be cached as immutable
+def set_menu_cache_headers(response, menu_date, generation):
+    if menu_date < dt_date.today() and generation:
+        response.cache_control.public = True
+        response.cache_control.max_age = PAST_MENU_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = CURRENT_MENU_MAX_AGE
+        response.cache_control.must_revalidate = True
+    return response
+
+# date query arg as MM-DD-YYYY (same as the menu date picker), defaults to today
+def parse_menu_date(date_arg):
+    if not date_arg:
+        return dt_date.today()
+    return datetime.strptime(date_arg, "%m-%d-%Y").date()
+
+def not_modified(etag, menu_date, generation):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return set_menu_cache_headers(response, menu_date, generation)
+
+@app.route('/api/menu')
+def api_menu():
+    dining_hall = request.args.get('hall', 'South Campus')
+    try:
+        menu_date = parse_menu_date(request.args.get('date'))
+    except ValueError:
+        return jsonify(error="date must be formatted as MM-DD-YYYY"), 400
+    if dining_hall not in dict(database.get_locations()):
+        return jsonify(error=f"{dining_hall} is not a valid dining hall."), 400
+
+    date = f"{menu_date.month}/{menu_date.day}/{menu_date.year}"
+    generation = database.get_scrape_generation(date)
+    order = request.args.get('order', 'station')
+    if order not in ('station', 'popular'):
+        return jsonify(error="order must be 'station' or 'popular'"), 400
+
+    # popularity moves with every log rather than with scrape runs, so popular menus skip the etag
+    if order == 'station':
+        etag = make_menu_etag(date, dining_hall, generation)
+
+        # revalidation: answer before touching the menus table
+        if request.if_none_match.contains(etag):
+            return not_modified(etag, menu_date, generation)
+
+    meals = {}
+    for meal in get_menu_meals(date):
+        result = database.get_foods_by_meal(meal, date, dining_hall, order)
+        if result:
+            meals[meal] = result
+
+    response = jsonify(
+        date=date,
+        dining_hall=dining_hall,
+        generation=generation,
+        meal_types=list(meals), # json keys get sorted, keep the meal order here
+        station_order={meal: list(stations) for meal, stations in meals.items()}, # same for stations
+        meals=meals
+    )
+    if order == 'popular':
+        response.cache_control.public = True
+        response.cache_control.max_age = POPULAR_MENU_MAX_AGE
+        return response
+    response.set_etag(etag)
+    return set_menu_cache_headers(response, menu_date, generation)
+
+MEAL_ORDER = ['breakfast', 'brunch', 'lunch', 'dinner']
+
+# every hall and meal for a date in one compact payload for menu.js: food fields are stored once
+# per food as columns, menu items are columns of indexes into foods/halls/meals/stations
+@app.route('/api/menu/day')
+def api_menu_day():
+    try:
+        menu_date = parse_menu_date(request.args.get('date'))
+    except ValueError:
+        return jsonify(error="date must be formatted as MM-DD-YYYY"), 400
+
+    date = f"{menu_date.month}/{menu_date.day}/{menu_date.year}"
+    generation = database.get_scrape_generation(date)
+    etag = make_menu_etag(date, "day", generation)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag, menu_date, generation)
+
+    rows = database.get_menu_for_date(date)
+    if not rows and generation == 0:
+        database.request_scrape(date)
+    halls = [name for name, _ in database.get_locations()]
+    present_meals = {row[1] for row in rows}
+    meals = [meal for meal in MEAL_ORDER if meal in present_meals] + sorted(present_meals - set(MEAL_ORDER))
+    hall_index = {hall: i for i, hall in enumerate(halls)}
+    meal_index = {meal: i for i, meal in enumerate(meals)}
+    station_index = {}
+    food_index = {}
+
+    foods = {"id": [], "name": [], "serving_size": [], "calories": [], "protein": [], "carbs": [], "fat": []}
+    items = {"food": [], "hall": [], "meal": [], "station": [], "menu_id": []}
+    for hall, meal, station, food_id, name, serving_size, calories, protein, carbs, fat, menu_id in rows:
+        if hall not in hall_index:
+            hall_index[hall] = len(halls)
+            halls.append(hall)
+        if food_id not in food_index:
+            food_index[food_id] = len(food_index)
+            for column, value in zip(foods, (food_id, name, serving_size, calories, protein, carbs, fat)):
+                foods[column].append(value)
+        items["food"].append(food_index[food_id])
+        items["hall"].append(hall_index[hall])
+        items["meal"].append(meal_index[meal])
+        items["station"].append(station_index.setdefault(station, len(station_index)))
+        items["menu_id"].append(menu_id)
+
+    response = jsonify(
+        date=date,
+        generation=generation,
+        halls=halls,
+        meals=meals,
+        stations=list(station_index),
+        foods=foods,
+        items=items
+    )
+    response.set_etag(etag)
+    return set_menu_cache_headers(response, menu_date, generation)
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+
+# what scrapes changed, oldest first: pass the returned cursor back as ?since= to get only what's
+# new since then (start with since=0). ?date=MM-DD-YYYY limits it to one menu date
+@app.route('/api/changes')
+def api_changes():
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', CHANGES_PAGE_SIZE)), CHANGES_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify(error="since and limit must be integers"), 400
+    if since < 0 or limit < 1:
+        return jsonify(error="since must be >= 0 and limit >= 1"), 400
+
+    date = None
+    if request.args.get('date'):
+        try:
+            menu_date = parse_menu_date(request.args['date'])
+        except ValueError:
+            return jsonify(error="date must be formatted as MM-DD-YYYY"), 400
+        date = f"{menu_date.month}/{menu_date.day}/{menu_date.year}"
+
+    rows = database.get_menu_changes(since, limit + 1, date) # one extra to know if there's more
+    changes = [
+        {
+            "id": change_id,
+            "scrape_run": scrape_run_id,
+            "date": menu_date,
+            "hall": hall,
+            "meal": meal,
+            "change": change,
+            "food_id": food_id,
+            "food": food_name,
+            "station": station,
+            "old": old_value,
+        }
+        for change_id, scrape_run_id, menu_date, hall, meal, change, food_id, food_name, station, old_value in rows[:limit]
+    ]
+    response = jsonify(
+        changes=changes,
+        cursor=changes[-1]["id"] if changes else since,
+        has_more=len(rows) > limit
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# ------------- OFFLINE MODE -------------------------------------
+# templates/sw.js caches the static files and menu payloads and queues log-foods posts made
+# offline, which it sends here in batches once the connection is back
+OFFLINE_BATCH_SIZE = 100
+OFFLINE_PRECACHE = ["styles.css", "menu.js"]
+
+@app.route('/sw.js')
+def service_worker():
+    # from the root so it controls /menu, not just /static/. the version changes with any static
+    # file, a new one replaces the old worker and its caches
+    precache = [url_for('static', filename=filename) for filename in OFFLINE_PRECACHE]
+    response = app.response_class(render_template(
+        "sw.js",
+        version=hashlib.sha1("|".join(sorted(assets.manifest.values())).encode()).hexdigest()[:10],
+        precache=precache,
+        menu_url=url_for('menu'),
+        menu_api_url=url_for('api_menu_day'),
+        batch_url=url_for('api_logs_batch'),
+        batch_size=OFFLINE_BATCH_SIZE
+    ), mimetype="text/javascript")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# body: {"logs": [{"client_id", "food_id", "menu_id", "quantity", "date": "M/D/YYYY"}]}. entries
+# that can't be logged (not on that menu, too old, malformed) are skipped rather than failing
+# the batch, and a client_id already logged is skipped too, so a retried batch doesn't log twice
+@app.route('/api/logs/batch', methods=['POST'])
+def api_logs_batch():
+    if session.get("user_id"):
+        is_user, id = True, session["user_id"]
+    elif session.get("guest_id"):
+        is_user, id = False, session["guest_id"]
+    else:
+        return jsonify(error="sign in or continue as a guest to log foods"), 401
+
+    payload = request.get_json(silent=True)
+    logs = payload.get("logs") if isinstance(payload, dict) else None
+    if not isinstance(logs, list):
+        return jsonify(error="body must be {\"logs\": [...]}"), 400
+    if len(logs) > OFFLINE_BATCH_SIZE:
+        return jsonify(error=f"at most {OFFLINE_BATCH_SIZE} logs per batch"), 400
+
+    oldest = dt_date.today() - timedelta(days=database.OFFLINE_LOG_DAYS)
+    entries = []
+    for log in logs:
+        try:
+            log_date = datetime.strptime(log["date"], "%m/%d/%Y").date()
+            entry = (str(log["client_id"])[:64], int(log["food_id"]), int(log["menu_id"]), max(int(log["quantity"]), 1))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if oldest <= log_date <= dt_date.today():
+            entries.append(entry + (f"{log_date.month}/{log_date.day}/{log_date.year}",))
+
+    logged = database.log_food_batch(is_user, id, entries)
+    response = jsonify(logged=logged, skipped=len(logs) - logged)
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 # @app.route('/dashboard')
@@ -0,0 +1,119 @@
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+import database
+
+# archive.py used for moving old menus out of the hot database into one sqlite file per semester
+# (archive/menus_2025_fall.db). the hot 'menus' table then only holds recent/upcoming days and
+# stays small enough to live in the page cache. database.py attaches the right archive on demand,
+# so its query helpers still work for any date. a date scraped again after it was archived is read
+# from the hot table until the next run archives it again.
+#   python archive.py --keep-days 120
+#   python archive.py --before 2025-08-25 --vacuum
+
+
+def get_term(day):
+    if day.month <= 5:
+        return f"{day.year}_spring"
+    if day.month <= 8:
+        return f"{day.year}_summer"
+    return f"{day.year}_fall"
+
+def parse_menu_date(date_str):
+    return datetime.strptime(date_str, "%m/%d/%Y").date()
+
+def create_archive_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.menus (
+                id INTEGER PRIMARY KEY,
+                food_id INTEGER NOT NULL,
+                location TEXT NOT NULL,
+                station TEXT NOT NULL,
+                date TEXT NOT NULL,
+                meal_type TEXT NOT NULL,
+                UNIQUE(food_id, location, date, meal_type)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_menus_date ON menus(date, location, meal_type)")
+
+def archive_menus(cutoff, vacuum=False):
+    # moves every menu dated before cutoff (a datetime.date), returns {term: rows moved}
+    os.makedirs(database.ARCHIVE_DIR, exist_ok=True)
+    moved = {}
+
+    with database.get_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS archived_dates (
+                    date TEXT PRIMARY KEY,
+                    term TEXT NOT NULL,
+                    archived_at TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+
+        # dates are stored as M/D/YYYY text, so they can't be range-compared in sql
+        dates_by_term = {}
+        for (date_str,) in conn.execute("SELECT DISTINCT date FROM menus").fetchall():
+            menu_date = parse_menu_date(date_str)
+            if menu_date < cutoff:
+                dates_by_term.setdefault(get_term(menu_date), []).append(date_str)
+
+        archived_at = datetime.now().isoformat()
+        for term, dates in sorted(dates_by_term.items()):
+            conn.execute("ATTACH DATABASE ? AS archive", (database.get_archive_path(term),))
+            create_archive_tables(conn)
+            conn.commit()
+
+            # a transaction across attached files isn't atomic in wal mode (each file commits on its
+            # own), so the copy commits first and the delete after it. a crash in between leaves a
+            # date in both files, still read from menus. the copy replaces what the archive has for
+            # the date's halls, so rerunning (or archiving a date that was scraped again) is safe
+            rows = 0
+            for menu_date in dates:
+                conn.execute("""
+                    DELETE FROM archive.menus
+                    WHERE date = ? AND location IN (SELECT location FROM main.menus WHERE date = ?)
+                """, (menu_date, menu_date))
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO archive.menus (id, food_id, location, station, date, meal_type)
+                    SELECT id, food_id, location, station, date, meal_type FROM main.menus WHERE date = ?
+                """, (menu_date,))
+                rows += cursor.rowcount
+            conn.commit()
+            for menu_date in dates:
+                conn.execute("DELETE FROM main.menus WHERE date = ?", (menu_date,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO archived_dates (date, term, archived_at) VALUES (?, ?, ?)",
+                    (menu_date, term, archived_at)
+                )
+            conn.commit()
+            conn.execute("DETACH DATABASE archive")
+            moved[term] = rows
+            print(f"Archived {len(dates)} days ({rows} menu rows) to {database.get_archive_path(term)}")
+
+    if vacuum and moved:
+        with database.get_connection() as conn:
+            conn.execute("VACUUM")
+
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old menus into per-semester archive databases.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--before", help="archive menus dated before this day (YYYY-MM-DD)")
+    group.add_argument("--keep-days", type=int, default=120, help="keep this many past days in the hot db")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot db afterwards to give the space back")
+    args = parser.parse_args()
+
+    if args.before:
+        cutoff = date.fromisoformat(args.before)
+    else:
+        cutoff = date.today() - timedelta(days=args.keep_days)
+
+    moved = archive_menus(cutoff, vacuum=args.vacuum)
+    if not moved:
+        print(f"No menus before {cutoff} to archive.")
+
+if __name__ == "__main__":
+    main()
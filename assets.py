@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError: # brotli is optional, gzip is always available
+    brotli = None
+
+# assets.py used for fingerprinting static files so they can be cached forever.
+# at startup every file in static/ is hashed, url_for('static', filename=...) is rewritten to
+# the hashed name (styles.css -> styles.1a2b3c4d5e.css) and text assets are pre-compressed.
+# a changed file gets a new name, so the old url can safely be immutable.
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+TEXT_EXTENSIONS = {".css", ".js", ".json", ".svg", ".txt", ".html"}
+MIN_COMPRESS_SIZE = 512 # smaller files don't gain anything from compression
+
+manifest = {} # static/styles.css -> styles.1a2b3c4d5e.css
+_originals = {} # reverse of manifest
+_compressed = {} # (hashed name, encoding) -> compressed bytes
+
+
+def fingerprint(filename, content):
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest}{ext}"
+
+def compress(content):
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli:
+        variants["br"] = brotli.compress(content, quality=11)
+    # only keep encodings that are actually smaller
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+def build_manifest(static_folder):
+    manifest.clear()
+    _originals.clear()
+    _compressed.clear()
+
+    for dirpath, _, filenames in os.walk(static_folder):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                content = f.read()
+
+            hashed = fingerprint(filename, content)
+            manifest[filename] = hashed
+            _originals[hashed] = filename
+
+            if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS and len(content) >= MIN_COMPRESS_SIZE:
+                for encoding, data in compress(content).items():
+                    _compressed[(hashed, encoding)] = data
+
+    return manifest
+
+def init_app(app):
+    app.config.setdefault("STATIC_FINGERPRINTING", os.getenv("STATIC_FINGERPRINTING", "1") != "0")
+    build_manifest(app.static_folder)
+    default_static_view = app.view_functions["static"]
+
+    def enabled():
+        # in debug mode files change under us, so leave the plain flask behaviour alone
+        return app.config["STATIC_FINGERPRINTING"] and not app.debug
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == "static" and enabled():
+            filename = values.get("filename")
+            if filename in manifest:
+                values["filename"] = manifest[filename]
+
+    def serve_static(filename):
+        original = _originals.get(filename)
+        if original is None or not enabled():
+            return default_static_view(filename=filename)
+
+        for encoding in ("br", "gzip"):
+            data = _compressed.get((filename, encoding))
+            if data is not None and encoding in request.accept_encodings:
+                response = app.response_class(data, mimetype=mimetypes.guess_type(original)[0])
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, original, max_age=IMMUTABLE_MAX_AGE)
+
+        if (filename, "gzip") in _compressed:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = serve_static
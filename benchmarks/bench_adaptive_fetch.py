@@ -0,0 +1,98 @@
+import argparse
+import contextlib
+import io
+import time
+
+from common import REPO_DIR # noqa: F401 (puts the repo on sys.path)
+from fake_site import FakeSite
+
+import scraper
+
+# bench_adaptive_fetch.py fetches nutrition labels from the local stand-in site (fake_site.py) under
+# a few upstream conditions, once with the old fixed pool of 10 and once with scraper.AdaptiveLimiter,
+# and reports time taken, pages lost and how hard the site was hit. exits with an AssertionError when
+# the limiter doesn't behave as expected in a scenario (see check).
+#   python benchmarks/bench_adaptive_fetch.py --foods 300
+#   python benchmarks/bench_adaptive_fetch.py --scenario overloaded --floor 2 --ceiling 32
+
+SCENARIOS = {
+    # name: FakeSite options
+    "fast": {"latency_ms": 20, "jitter_ms": 5, "capacity": 64},
+    "slow": {"latency_ms": 300, "jitter_ms": 50, "capacity": 64},
+    "overloaded": {"latency_ms": 60, "jitter_ms": 10, "capacity": 4, "max_queue": 4},
+    "flaky": {"latency_ms": 60, "jitter_ms": 10, "capacity": 64, "fail_rate": 0.05},
+    # fast, then slower for good after 50 pages whatever the load
+    "slowdown": {"latency_ms": 20, "jitter_ms": 5, "capacity": 64, "slow_down_after": 50, "slow_latency_ms": 120},
+}
+
+
+def make_foods(base_url, count):
+    return [
+        {"name": f"Food {i}", "url": f"{base_url}label.aspx?RecNumAndPort={100000 + i}*16"}
+        for i in range(count)
+    ]
+
+def run(site_options, foods_count, limiter):
+    site = FakeSite(**site_options).start()
+    try:
+        foods = make_foods(site.base_url, foods_count)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # get_macros prints every food
+            results = scraper.fetch_macros_for_new(foods, limiter)
+        elapsed = time.perf_counter() - start
+    finally:
+        site.stop()
+
+    return {
+        "seconds": elapsed,
+        "fetched": len(results),
+        "lost": foods_count - len(results),
+        "site_errors": site.stats["errors"] + site.stats["shed"],
+        "peak_in_flight": site.stats["peak_in_flight"],
+        "final_limit": int(limiter.limit),
+        "limit_changes": len(limiter.history),
+        "slowed_fetches": site.stats["slowed_requests"],
+    }
+
+def check(name, fixed, adaptive, floor, ceiling):
+    # what the limiter has to do in each scenario, loose enough not to trip on timing noise
+    if name in ("fast", "slow", "slowdown"):
+        assert adaptive["lost"] == 0, f"{name}: lost {adaptive['lost']} pages"
+    if name == "slow": # latency that doesn't grow with load is no reason to hold back
+        assert adaptive["final_limit"] == ceiling, f"slow: stopped at {adaptive['final_limit']} of {ceiling}"
+    if name == "overloaded":
+        assert adaptive["site_errors"] * 4 <= fixed["site_errors"], \
+            f"overloaded: {adaptive['site_errors']} site errors, the fixed pool got {fixed['site_errors']}"
+    if name == "slowdown":
+        # the limit only says something once the site has been slow for a while (the baseline
+        # takes ~50 fetches to catch up)
+        assert adaptive["slowed_fetches"] >= 100, \
+            f"slowdown: only {adaptive['slowed_fetches']} fetches after the site slowed down, use more --foods"
+    if name in ("fast", "flaky", "slowdown"):
+        # slowdown: judged against the fastest fetch ever seen, the limit would stay at the floor
+        assert adaptive["final_limit"] > floor, f"{name}: limit stuck at the floor ({floor})"
+
+def report(label, result, foods_count):
+    print(f"  {label:<10} {result['seconds']:>7.2f}s {foods_count / result['seconds']:>8.1f} pages/s "
+          f"lost {result['lost']:>4}  site errors {result['site_errors']:>4}  "
+          f"peak in flight {result['peak_in_flight']:>3}  final limit {result['final_limit']:>3} "
+          f"({result['limit_changes']} changes)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--foods", type=int, default=200, help="label pages to fetch per run")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="run only these (default all)")
+    parser.add_argument("--floor", type=int, default=scraper.MIN_CONCURRENCY)
+    parser.add_argument("--ceiling", type=int, default=scraper.MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    for name in args.scenario or SCENARIOS:
+        print(f"{name}: {SCENARIOS[name]}")
+        fixed = run(SCENARIOS[name], args.foods, scraper.AdaptiveLimiter(floor=10, ceiling=10, start=10))
+        report("fixed 10", fixed, args.foods)
+        adaptive = run(SCENARIOS[name], args.foods, scraper.AdaptiveLimiter(floor=args.floor, ceiling=args.ceiling))
+        report("adaptive", adaptive, args.foods)
+        check(name, fixed, adaptive, args.floor, args.ceiling)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from common import REPO_DIR, make_temp_db
+
+# bench_cold_start.py measures what a fresh worker pays on its first /menu request, without
+# warm-up (python app.py) and with warm_up() run before serving (wsgi.py / gunicorn preload).
+# every sample runs in a new interpreter so nothing is cached between them.
+#   python benchmarks/bench_cold_start.py --runs 5
+
+WORKER = """
+import json, os, sys, time
+sys.path.insert(0, {repo!r})
+os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+if {warm}:
+    app.warm_up()
+warmed = time.perf_counter()
+client = app.app.test_client()
+client.get("/guest")
+timings = []
+for _ in range(3):
+    request_start = time.perf_counter()
+    client.get("/menu")
+    timings.append(time.perf_counter() - request_start)
+print(json.dumps({{"import": imported - start, "warm_up": warmed - imported, "requests": timings}}))
+"""
+
+
+def sample(warm):
+    script = WORKER.format(repo=REPO_DIR, warm=warm)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = make_temp_db()
+    os.chdir(workdir)
+
+    for label, warm in [("no warm-up", False), ("warm_up()", True)]:
+        samples = [sample(warm) for _ in range(args.runs)]
+        median = lambda values: statistics.median(values) * 1000
+        print(f"{label:<11} import {median([s['import'] for s in samples]):7.1f} ms   "
+              f"warm-up {median([s['warm_up'] for s in samples]):6.1f} ms   "
+              f"1st /menu {median([s['requests'][0] for s in samples]):6.2f} ms   "
+              f"2nd /menu {median([s['requests'][1] for s in samples]):6.2f} ms")
+
+if __name__ == "__main__":
+    main()
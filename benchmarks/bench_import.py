@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from common import REPO_DIR, make_temp_db
+
+# bench_import.py measures what starting a web worker costs before it serves anything: time to
+# import app.py and the worker's resident memory afterwards, each sample in a fresh interpreter.
+# it also lists heavy modules that leaked into the web process (the scraper's bs4/requests,
+# email_validator), which should only load on the paths that use them.
+#   python benchmarks/bench_import.py --runs 10
+#   python benchmarks/bench_import.py --save benchmarks/results/import_baseline.json
+#   python benchmarks/bench_import.py --compare benchmarks/results/import_baseline.json
+
+HEAVY_MODULES = ["scraper", "bs4", "requests", "email_validator", "concurrent.futures", "urllib3"]
+
+WORKER = """
+import json, os, sys, time
+sys.path.insert(0, {repo!r})
+os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+baseline_modules = len(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+print(json.dumps({{
+    "import": elapsed,
+    "rss_kb": rss_kb,
+    "modules": len(sys.modules) - baseline_modules,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def sample(module):
+    script = WORKER.format(repo=REPO_DIR, module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(samples):
+    return {
+        "import_ms": round(statistics.median(s["import"] for s in samples) * 1000, 2),
+        "rss_mb": round(statistics.median(s["rss_kb"] for s in samples) / 1024, 2),
+        "modules": samples[-1]["modules"],
+        "heavy_modules": samples[-1]["heavy"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--module", action="append", help="modules to time (default: app, and scraper for scale)")
+    parser.add_argument("--save", help="write the results as a json baseline")
+    parser.add_argument("--compare", help="json baseline to compare against")
+    args = parser.parse_args()
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["modules"]
+
+    os.chdir(make_temp_db(num_foods=50, days=1, foods_per_meal=10))
+    results = {}
+    for module in args.module or ["app", "scraper"]:
+        results[module] = summary = summarize([sample(module) for _ in range(args.runs)])
+        line = (f"import {module:<10} {summary['import_ms']:8.1f} ms  {summary['rss_mb']:7.1f} MB RSS  "
+                f"{summary['modules']:4} modules  heavy: {', '.join(summary['heavy_modules']) or 'none'}")
+        if baseline and module in baseline:
+            old = baseline[module]
+            line += (f"   vs baseline: {summary['import_ms'] / old['import_ms'] - 1:+.0%} time, "
+                     f"{summary['rss_mb'] - old['rss_mb']:+.1f} MB")
+        print(line)
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        with open(save_path, "w") as f:
+            json.dump({"runs": args.runs, "python": sys.version.split()[0], "modules": results}, f, indent=2)
+        print(f"Saved baseline to {save_path}")
+
+if __name__ == "__main__":
+    main()
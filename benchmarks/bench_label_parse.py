@@ -0,0 +1,119 @@
+import argparse
+import glob
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from common import REPO_DIR
+
+import scraper
+
+# bench_label_parse.py times scraper.parse_label (one compiled-regex pass) against the old
+# BeautifulSoup get_macros parsing on the recorded labels in benchmarks/fixtures/labels, and
+# shows what each one got out of every label.
+#   python benchmarks/bench_label_parse.py --rounds 200
+
+FIXTURES_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures", "labels")
+# what parse_label has to get out of the labels with unusual markup: turkey_chili has the label
+# classes on other tags, in other attribute orders and around nested tags, and "<1g" is stored as 0
+EXPECTED = {
+    "turkey_chili.html": {"serving_size": "8 oz", "calories": 240, "total_fat": 7, "trans_fat": 0,
+                          "total_carbohydrate": 24, "added_sugars": 0, "protein": 22},
+    "grilled_chicken_breast.html": {"serving_size": "4 oz", "total_carbohydrate": 0, "protein": 35.2},
+}
+
+
+# the parsing half of get_macros before parse_label, kept here to compare against
+def legacy_parse(page):
+    soup = BeautifulSoup(page, "html.parser")
+    name = soup.find("h2").text.strip() if soup.find("h2") else None
+    serving_sizes = soup.find_all("div", class_="nutfactsservsize")
+    serving_size = serving_sizes[1].text.strip().lower() if len(serving_sizes) > 1 else None
+    protein = None
+    carbs = None
+    fat = None
+    calories = None
+
+    for fact in soup.find_all(class_="nutfactstopnutrient"):
+        text = fact.text.lower().replace("\xa0", " ").strip()
+        if "protein" in text:
+            try:
+                protein = float(text.split()[1].replace("g", ""))
+            except:
+                pass
+        elif "total carbohydrate" in text:
+            try:
+                carbs = float(text.split()[2].replace("g", ""))
+            except:
+                pass
+        elif "total fat" in text:
+            try:
+                fat = float(text.split()[2].replace("g", ""))
+            except:
+                pass
+        elif "calories" in text and calories == None:
+            try:
+                calories = float(text.split()[1].replace("kcal", ""))
+            except:
+                pass
+
+    return {
+        "name": name,
+        "serving_size": serving_size or 0.0,
+        "protein": protein or 0.0,
+        "carbs": carbs or 0.0,
+        "fat": fat or 0.0,
+        "calories": calories or 0.0
+    }
+
+def new_parse(page):
+    try:
+        return scraper.parse_label(page)
+    except scraper.LabelParseError as e:
+        return e
+
+def check_expected(paths, pages):
+    for path, page in zip(paths, pages):
+        expected = EXPECTED.get(os.path.basename(path))
+        if not expected:
+            continue
+        label = scraper.parse_label(page)
+        got = {key: label["serving_size"] if key == "serving_size" else label["nutrients"][key][0] for key in expected}
+        assert got == expected, f"{os.path.basename(path)}: expected {expected}, got {got}"
+
+def time_per_page(parse, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            parse(page)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=100, help="passes over the fixture corpus")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+    pages = [open(path, encoding="utf-8").read() for path in paths]
+
+    for path, page in zip(paths, pages):
+        old = legacy_parse(page)
+        new = new_parse(page)
+        print(os.path.basename(path))
+        print(f"  old: cal {old['calories']} fat {old['fat']} carbs {old['carbs']} protein {old['protein']}")
+        if isinstance(new, Exception):
+            print(f"  new: LabelParseError: {new}")
+        else:
+            print(f"  new: {len(new['nutrients'])} nutrients: {', '.join(new['nutrients'])}")
+
+    check_expected(paths, pages)
+
+    legacy = time_per_page(legacy_parse, pages, args.rounds)
+    compiled = time_per_page(new_parse, pages, args.rounds)
+    print(f"\n{len(pages)} labels x {args.rounds} rounds")
+    print(f"  get_macros (BeautifulSoup): {legacy * 1e6:>8.1f} us/page")
+    print(f"  parse_label (regex):        {compiled * 1e6:>8.1f} us/page ({legacy / compiled:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
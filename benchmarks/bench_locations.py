@@ -0,0 +1,60 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from common import REPO_DIR # noqa: F401 (puts the repo on sys.path)
+from fake_site import LOCATIONS, FakeSite
+
+import scraper
+
+# bench_locations.py scrapes a day from the local stand-in site (fake_site.py) with more and more
+# locations, once one location at a time (the old loop) and once with a worker per location, to
+# check scrape time stays flat as locations are added. the first scrape of a day fetches every
+# label, the re-scrape only the menu pages (the usual case once foods are known).
+#   python benchmarks/bench_locations.py --locations 3 6 12 --latency-ms 200
+
+
+def make_locations(count):
+    locations = dict(LOCATIONS)
+    for i in range(count - len(locations)):
+        locations[f"Satellite Cafe {i + 1}"] = 100 + i
+    return dict(list(locations.items())[:count])
+
+def scrape(site_options, locations, workers):
+    os.chdir(tempfile.mkdtemp(prefix="terp_eats_bench_"))
+    site = FakeSite(locations=locations, **site_options).start()
+    scraper.BASE_URL = site.base_url
+    scraper.LOCATION_WORKERS = workers
+    try:
+        with contextlib.redirect_stdout(io.StringIO()): # the scraper prints every food
+            scraper.create_tables()
+            scraper.discover_locations()
+            timings = []
+            for _ in range(2):
+                start = time.perf_counter()
+                status = scraper.run_scraper("10/20/2025")
+                timings.append(time.perf_counter() - start)
+                assert status == "success", status
+    finally:
+        site.stop()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, nargs="+", default=[3, 6, 12])
+    parser.add_argument("--latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    site_options = {"latency_ms": args.latency_ms, "jitter_ms": args.latency_ms / 10}
+    print(f"{'locations':>9} {'mode':<13} {'first scrape':>13} {'re-scrape':>10}")
+    for count in args.locations:
+        locations = make_locations(count)
+        for mode, workers in (("one at a time", 1), ("per location", None)):
+            first, again = scrape(site_options, locations, workers)
+            print(f"{count:>9} {mode:<13} {first:>12.2f}s {again:>9.2f}s")
+
+if __name__ == "__main__":
+    main()
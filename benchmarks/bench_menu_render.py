@@ -0,0 +1,82 @@
+import argparse
+import statistics
+import time
+
+import flask
+
+from common import make_temp_db, load_app
+
+# bench_menu_render.py measures /menu template rendering time per request with the menu
+# fragment cache off (every meal rendered per request) and on (only the page shell rendered)
+#   python benchmarks/bench_menu_render.py --requests 300
+
+
+def install_render_timer(app_module, timings):
+    # wraps the two template entry points app.py uses and sums their time into timings[-1]
+    render_template = app_module.render_template
+    get_template_attribute = app_module.get_template_attribute
+
+    def timed_render_template(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return render_template(*args, **kwargs)
+        finally:
+            timings[-1] += time.perf_counter() - start
+
+    def timed_get_template_attribute(*args, **kwargs):
+        macro = get_template_attribute(*args, **kwargs)
+
+        def timed_macro(*macro_args, **macro_kwargs):
+            start = time.perf_counter()
+            try:
+                return macro(*macro_args, **macro_kwargs)
+            finally:
+                timings[-1] += time.perf_counter() - start
+        return timed_macro
+
+    app_module.render_template = timed_render_template
+    app_module.get_template_attribute = timed_get_template_attribute
+
+def run(client, num_requests, render_timings):
+    request_timings = []
+    for _ in range(num_requests):
+        render_timings.append(0.0)
+        start = time.perf_counter()
+        response = client.get("/menu")
+        request_timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return request_timings
+
+def report(label, request_timings, render_timings):
+    print(f"{label:<12} request p50 {statistics.median(request_timings) * 1000:7.3f} ms   "
+          f"render p50 {statistics.median(render_timings) * 1000:7.3f} ms   "
+          f"render mean {statistics.fmean(render_timings) * 1000:7.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--foods-per-meal", type=int, default=60)
+    args = parser.parse_args()
+
+    make_temp_db(foods_per_meal=args.foods_per_meal)
+    app = load_app()
+    import app as app_module
+    import menu_cache
+
+    client = app.test_client()
+    client.get("/guest")
+
+    for label, enabled in [("cache off", False), ("cache on", True)]:
+        app.config["MENU_FRAGMENT_CACHE"] = enabled
+        menu_cache.clear()
+        render_timings = []
+        install_render_timer(app_module, render_timings)
+        run(client, 10, render_timings) # warm up jinja's template cache
+        render_timings.clear()
+        request_timings = run(client, args.requests, render_timings)
+        report(label, request_timings, render_timings)
+        app_module.render_template = flask.render_template
+        app_module.get_template_attribute = flask.get_template_attribute
+
+if __name__ == "__main__":
+    main()
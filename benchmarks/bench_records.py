@@ -0,0 +1,135 @@
+import argparse
+import contextlib
+import gc
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from common import REPO_DIR # noqa: F401 (puts the repo on sys.path)
+
+import archive
+import database
+import records
+import synthetic_data
+
+# bench_records.py compares the old one-dict-per-row results of get_foods_by_meal/get_daily_macros
+# with the __slots__ records from records.py on large result sets (every menu row / every log in
+# a synthetic db, not just one meal), for build time and the memory the result holds on to.
+# it then archives the oldest day and checks database.get_foods_by_meal reads it back the same.
+#   python benchmarks/bench_records.py --scale medium --rounds 5
+
+MENU_QUERY = """
+    SELECT f.id, f.name, f.serving_size, m.station, f.protein, f.carbs, f.fat, f.calories, m.id
+    FROM menus m
+    JOIN foods f ON m.food_id = f.id
+    ORDER BY m.station, f.name
+"""
+LOG_QUERY = """
+    SELECT f.name, l.servings, f.calories * l.servings, f.protein * l.servings, f.carbs * l.servings,
+           f.fat * l.servings, l.meal_type, f.serving_size, l.id
+    FROM food_logs l
+    JOIN foods f ON l.food_id = f.id
+    ORDER BY l.meal_type
+"""
+
+
+# the dict-building loops as they were before records.py, kept here to compare against
+def menu_dicts(conn):
+    grouped = {}
+    for food_id, name, serving_size, station, protein, carbs, fat, calories, menu_id in conn.execute(MENU_QUERY).fetchall():
+        if station not in grouped:
+            grouped[station] = []
+        grouped[station].append({
+            "id": food_id, "name": name, "serving_size": serving_size, "protein": protein,
+            "carbs": carbs, "fat": fat, "calories": calories, "menu_id": menu_id
+        })
+    return grouped
+
+def log_dicts(conn):
+    foods = []
+    for name, servings, calories, protein, carbs, fat, meal, serving_size, log_id in conn.execute(LOG_QUERY).fetchall():
+        foods.append({
+            "name": name, "servings": servings, "calories": round(calories, 1), "protein": round(protein, 1),
+            "carbs": round(carbs, 1), "fat": round(fat, 1), "meal": meal, "serving_size": serving_size, "log_id": log_id
+        })
+    return foods
+
+def menu_records(conn):
+    conn.row_factory = records.MenuFood
+    grouped = {}
+    for food in conn.execute(MENU_QUERY).fetchall():
+        if food.station not in grouped:
+            grouped[food.station] = []
+        grouped[food.station].append(food)
+    conn.row_factory = None
+    return grouped
+
+def log_records(conn):
+    conn.row_factory = records.FoodLog
+    foods = conn.execute(LOG_QUERY).fetchall()
+    conn.row_factory = None
+    return foods
+
+def measure(build, conn, rounds):
+    # (best seconds, bytes the result keeps alive, peak bytes while building)
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        build(conn)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(conn)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return min(times), held, peak
+
+def check_archived_read(conn):
+    # the menu of the oldest day, read from the hot table and again from its archive file
+    dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM menus").fetchall()]
+    oldest = min(dates, key=archive.parse_menu_date)
+    hall, meal = conn.execute("SELECT location, meal_type FROM menus WHERE date = ? LIMIT 1", (oldest,)).fetchone()
+    before = database.get_foods_by_meal(meal, oldest, hall)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        archive.archive_menus(archive.parse_menu_date(oldest) + timedelta(days=1))
+    after = database.get_foods_by_meal(meal, oldest, hall)
+    assert conn.execute("SELECT COUNT(*) FROM menus WHERE date = ?", (oldest,)).fetchone()[0] == 0, "nothing was archived"
+    assert before and after == before, f"archived menu for {oldest} reads back differently"
+    print(f"archived read: {oldest} {hall} {meal}, {sum(map(len, after.values()))} foods, same as before archiving")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=synthetic_data.SCALES, default="medium")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="terp_eats_records_"))
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        synthetic_data.generate("macro_tracker.db", date(2025, 10, 20), seed=0, **synthetic_data.SCALES[args.scale])
+    conn = sqlite3.connect("macro_tracker.db")
+    menu_rows = conn.execute("SELECT COUNT(*) FROM menus").fetchone()[0]
+    log_rows = conn.execute("SELECT COUNT(*) FROM food_logs").fetchone()[0]
+
+    for label, rows, dicts, slots in [
+        ("menu rows (get_foods_by_meal)", menu_rows, menu_dicts, menu_records),
+        ("log rows (get_daily_macros)", log_rows, log_dicts, log_records),
+    ]:
+        print(f"{label}: {rows:,}")
+        results = {}
+        for kind, build in [("dicts", dicts), ("records", slots)]:
+            seconds, held, peak = measure(build, conn, args.rounds)
+            results[kind] = (seconds, held)
+            print(f"  {kind:<8} {seconds * 1000:>8.1f} ms  {held / rows:>6.0f} B/row held  "
+                  f"{held / 1e6:>7.1f} MB held  {peak / 1e6:>7.1f} MB peak")
+        print(f"  records: {results['dicts'][0] / results['records'][0]:.2f}x faster, "
+              f"{1 - results['records'][1] / results['dicts'][1]:.0%} less memory held")
+
+    check_archived_read(conn)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import contextlib
+import io
+import re
+
+from common import make_temp_db, load_app
+
+# bench_static_assets.py measures bytes transferred per page view with a simulated browser cache,
+# with static fingerprinting off (flask defaults: every view revalidates each asset) and on
+# (immutable hashed urls: repeat views don't touch the server for assets at all)
+#   python benchmarks/bench_static_assets.py --views 5
+
+PAGES = ["/", "/login", "/register", "/menu", "/dashboard", "/view_logs"]
+STATIC_URL = re.compile(r'(?:src|href)="(/static/[^"]+)"')
+
+
+def response_bytes(response):
+    headers = sum(len(f"{key}: {value}\r\n") for key, value in response.headers.items())
+    return len("HTTP/1.1 200 OK\r\n\r\n") + headers + len(response.get_data())
+
+class BrowserCache:
+    def __init__(self, client):
+        self.client = client
+        self.entries = {} # url -> response headers
+
+    def fetch(self, url):
+        # returns (bytes transferred, requests made) for one asset
+        cached = self.entries.get(url)
+        if cached is not None:
+            cache_control = cached.get("Cache-Control", "")
+            if "immutable" in cache_control or re.search(r"max-age=[1-9]", cache_control):
+                return 0, 0 # fresh, served from the browser's cache
+
+        headers = {"Accept-Encoding": "gzip, br"}
+        if cached is not None:
+            if "ETag" in cached:
+                headers["If-None-Match"] = cached["ETag"]
+            if "Last-Modified" in cached:
+                headers["If-Modified-Since"] = cached["Last-Modified"]
+
+        response = self.client.get(url, headers=headers)
+        transferred = response_bytes(response)
+        if response.status_code == 200:
+            self.entries[url] = dict(response.headers)
+        response.close()
+        return transferred, 1
+
+# returns (page bytes, static asset bytes, static asset requests) for one page view
+def view_page(client, cache, page):
+    with contextlib.redirect_stdout(io.StringIO()): # database.py prints on empty logs
+        response = client.get(page, headers={"Accept-Encoding": "gzip, br"})
+    asset_bytes = asset_requests = 0
+    for url in STATIC_URL.findall(response.get_data(as_text=True)):
+        transferred, requests_made = cache.fetch(url)
+        asset_bytes += transferred
+        asset_requests += requests_made
+    return response_bytes(response), asset_bytes, asset_requests
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--views", type=int, default=5, help="repeat views per page")
+    args = parser.parse_args()
+
+    make_temp_db()
+    app = load_app()
+
+    for label, enabled in [("fingerprinting off", False), ("fingerprinting on", True)]:
+        app.config["STATIC_FINGERPRINTING"] = enabled
+        client = app.test_client()
+        client.get("/guest")
+        cache = BrowserCache(client)
+
+        print(label)
+        for page in PAGES:
+            if page == "/":
+                continue # clears the session, skip it after the first view
+            page_bytes, first_bytes, first_requests = view_page(client, cache, page)
+            repeat_bytes = repeat_requests = 0
+            for _ in range(args.views):
+                _, asset_bytes, asset_requests = view_page(client, cache, page)
+                repeat_bytes += asset_bytes
+                repeat_requests += asset_requests
+            print(f"  {page:<12} html {page_bytes:>7} B   static first view {first_bytes:>7} B / {first_requests} req   "
+                  f"static repeat view {repeat_bytes / args.views:>7.0f} B / {repeat_requests / args.views:.0f} req")
+
+if __name__ == "__main__":
+    main()
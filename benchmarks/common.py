@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+# common.py used by the benchmark scripts for setting up a throwaway database/app
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+STATIONS = ["Grill", "Pizza", "Salad Bar", "Deli", "Vegan", "Dessert", "Soup", "International"]
+
+
+def format_date(day):
+    return f"{day.month}/{day.day}/{day.year}"
+
+# creates a temp dir with a seeded macro_tracker.db and chdirs into it (every module uses the relative path)
+def make_temp_db(num_foods=400, days=3, foods_per_meal=60):
+    import scraper
+
+    workdir = tempfile.mkdtemp(prefix="terp_eats_bench_")
+    os.chdir(workdir)
+    scraper.create_tables()
+
+    with sqlite3.connect("macro_tracker.db") as conn:
+        conn.executemany("""
+            INSERT INTO foods (name, url, protein, carbs, fat, calories, serving_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (f"Food {i}", f"{scraper.BASE_URL}label.aspx?RecNumAndPort={100000 + i}*3",
+             i % 40, i % 70, i % 25, 50 + i % 600, "1 each")
+            for i in range(num_foods)
+        ])
+
+        for offset in range(days):
+            menu_date = format_date(date.today() + timedelta(days=offset))
+            for hall_num, hall in enumerate(scraper.DINING_HALL_ID_DICT):
+                for meal_num, meal in enumerate(["breakfast", "lunch", "dinner"]):
+                    start = (offset * 7 + hall_num * 13 + meal_num * 29) % num_foods
+                    conn.executemany("""
+                        INSERT OR IGNORE INTO menus (food_id, location, station, date, meal_type)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, [
+                        ((start + i) % num_foods + 1, hall, STATIONS[i % len(STATIONS)], menu_date, meal)
+                        for i in range(foods_per_meal)
+                    ])
+            conn.execute("""
+                INSERT INTO scrape_runs (menu_date, ran_at, status, foods_found, new_foods, menu_rows)
+                VALUES (?, datetime('now'), 'success', 0, 0, 0)
+            """, (menu_date,))
+        conn.commit()
+
+    return workdir
+
+def load_app():
+    os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+    import app
+    return app.app
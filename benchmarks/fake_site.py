@@ -0,0 +1,171 @@
+import argparse
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# fake_site.py is a local stand-in for nutrition.umd.edu: the location list (/), menu pages
+# (/?locationNum=&dtdate=) and nutrition labels (/label.aspx?RecNumAndPort=) with the same markup
+# the scraper parses, plus knobs for how the real site misbehaves:
+#   latency_ms/jitter_ms  time to serve one page
+#   capacity              pages served at once, the rest queue (so latency climbs under load)
+#   max_queue             queued requests beyond this get a 503 right away (0 = never)
+#   fail_rate             fraction of pages answered with a 500
+#   slow_down_after       after this many requests (0 = never) pages take slow_latency_ms instead
+# used by the benchmarks in-process (FakeSite(...).start(), then scraper.BASE_URL = site.base_url)
+# or on its own:
+#   python benchmarks/fake_site.py --port 8765 --latency-ms 200 --capacity 4 --fail-rate 0.05
+
+LOCATIONS = {"South Campus": 16, "Yahentamitsi Dining Hall": 19, "251 North": 51}
+STATIONS = ["Grill", "Pizza", "Salad Bar", "Deli", "Vegan", "Dessert"]
+ITEMS_PER_STATION = 8
+RECIPES = 3000
+
+
+def locations_html(locations):
+    options = "".join(f'<option value="{location_num}">{name}</option>' for name, location_num in locations.items())
+    return (f'<html><body><select class="form-select" id="location-select-menu">'
+            f'<option value="">Select a location</option>{options}</select></body></html>')
+
+def menu_html(location, menu_date):
+    rng = random.Random(f"{location} {menu_date}")
+    meals = ["Breakfast", "Lunch", "Dinner"]
+    tabs = "".join(f'<li><a class="nav-link" href="#pane-{i}">{meal}</a></li>' for i, meal in enumerate(meals))
+    panes = []
+    for i in range(len(meals)):
+        cards = []
+        for station in rng.sample(STATIONS, 4):
+            rows = "".join(
+                f'<div class="row menu-item-row"><div class="col-md-8">'
+                f'<a class="menu-item-name" href="label.aspx?RecNumAndPort={100000 + recipe}*{location}">Food {recipe}</a>'
+                f'</div><div class="col-md-4"><img class="nutri-icon" title="vegetarian"></div></div>'
+                for recipe in rng.sample(range(RECIPES), ITEMS_PER_STATION)
+            )
+            cards.append(f'<div class="card"><div class="card-body"><h5 class="card-title">{station}</h5>{rows}</div></div>')
+        panes.append(f'<div class="tab-pane" id="pane-{i}">{"".join(cards)}</div>')
+    return (f'<html><body><ul class="nav nav-tabs">{tabs}</ul>'
+            f'<div class="tab-content">{"".join(panes)}</div></body></html>')
+
+def label_html(recipe):
+    rng = random.Random(recipe)
+    calories = rng.randint(40, 700)
+    return f"""<html><body><h2>Food {recipe % 100000}</h2>
+<div class="nutfactsservsize">Serving size</div><div class="nutfactsservsize">{rng.choice(["1 each", "4 oz", "1 cup", "1 slice"])}</div>
+<table>
+<tr><td><span class="nutfactstopnutrient"><b>Calories</b>&nbsp;{calories}</span></td></tr>
+<tr><td><span class="nutfactstopnutrient"><b>Total Fat</b>&nbsp;{rng.randint(0, 40)}g</span></td></tr>
+<tr><td><span class="nutfactstopnutrient"><b>Sodium</b>&nbsp;{rng.randint(0, 1200)}mg</span></td></tr>
+<tr><td><span class="nutfactstopnutrient"><b>Total Carbohydrate</b>&nbsp;{rng.randint(0, 90)}g</span></td></tr>
+<tr><td><span class="nutfactstopnutrient"><b>Protein</b>&nbsp;{rng.randint(0, 50)}g</span></td></tr>
+</table></body></html>"""
+
+class FakeSite:
+    def __init__(self, port=0, latency_ms=50, jitter_ms=10, capacity=64, max_queue=0, fail_rate=0.0, seed=0,
+                 locations=None, slow_down_after=0, slow_latency_ms=None):
+        self.locations = locations or LOCATIONS
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.fail_rate = fail_rate
+        self.slow_down_after = slow_down_after
+        self.slow_latency_ms = latency_ms if slow_latency_ms is None else slow_latency_ms
+        self.rng = random.Random(seed)
+        self.slots = threading.Semaphore(capacity)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "shed": 0, "peak_in_flight": 0, "slowed_requests": 0}
+        self.in_flight = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = site.handle(self.path)
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def handle(self, path):
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.slow_down_after and self.stats["requests"] > self.slow_down_after:
+                self.latency_ms = self.slow_latency_ms
+                self.stats["slowed_requests"] += 1
+            self.in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+            queued = self.in_flight - self.capacity
+            fail = self.rng.random() < self.fail_rate
+            delay = max(0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        try:
+            if self.max_queue and queued > self.max_queue:
+                with self.lock:
+                    self.stats["shed"] += 1
+                return 503, "<html><body>Service Unavailable</body></html>"
+
+            with self.slots:
+                time.sleep(delay)
+            if fail:
+                with self.lock:
+                    self.stats["errors"] += 1
+                return 500, "<html><body>Server Error</body></html>"
+            return 200, self.render(path)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def render(self, path):
+        parsed = urlparse(path)
+        query = parse_qs(parsed.query)
+        if parsed.path.endswith("label.aspx"):
+            recipe = int(re.match(r"\d+", query["RecNumAndPort"][0]).group())
+            return label_html(recipe)
+        if "locationNum" not in query:
+            return locations_html(self.locations)
+        return menu_html(int(query["locationNum"][0]), query["dtdate"][0])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for nutrition.umd.edu.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--capacity", type=int, default=64, help="pages served at once, the rest queue")
+    parser.add_argument("--max-queue", type=int, default=0, help="503 when more than this many are queued (0 = never)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of pages answered with a 500")
+    args = parser.parse_args()
+
+    site = FakeSite(args.port, args.latency_ms, args.jitter_ms, args.capacity, args.max_queue, args.fail_rate)
+    print(f"Serving a fake nutrition site at {site.base_url} (ctrl-c to stop)")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+if __name__ == "__main__":
+    main()
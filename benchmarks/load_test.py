@@ -0,0 +1,252 @@
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from common import REPO_DIR, make_temp_db
+
+# load_test.py runs the app against a synthetic database on localhost and simulates guests and
+# registered users browsing menus and logging meals, then reports throughput and latency per route.
+#   python benchmarks/load_test.py --users 20 --duration 30
+#   python benchmarks/load_test.py --save benchmarks/results/load_baseline.json
+#   python benchmarks/load_test.py --compare benchmarks/results/load_baseline.json
+# nothing leaves 127.0.0.1, the server runs in its own process so it doesn't share the GIL with
+# the load generator.
+
+PASSWORD = "LoadTest!2345"
+
+# (route label, weight) for what a virtual user does next
+ACTIONS = [
+    ("GET /menu", 45),
+    ("POST /menu (change hall)", 10),
+    ("POST /menu (log food)", 15),
+    ("GET /dashboard", 20),
+    ("GET /view_logs", 10),
+]
+
+
+def serve(workdir, port):
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    os.environ.setdefault("FLASK_SECRET_KEY", "load-test")
+    from werkzeug.serving import make_server
+    import app
+
+    app.warm_up()
+    sys.stdout = open(os.devnull, "w") # database.py prints on every empty log lookup
+    make_server("127.0.0.1", port, app.app, threaded=True).serve_forever()
+
+def start_server(workdir, port):
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port), "--workdir", workdir],
+        stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base_url + "/ready", timeout=1)
+            return process, base_url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("load test server didn't start")
+
+def create_users(count):
+    from werkzeug.security import generate_password_hash
+
+    password_hash = generate_password_hash(PASSWORD)
+    with sqlite3.connect("macro_tracker.db") as conn:
+        conn.executemany(
+            "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+            [(f"loaduser{i}", f"loaduser{i}@terpmail.umd.edu", password_hash) for i in range(count)]
+        )
+        conn.commit()
+
+def get_menu_items(date):
+    with sqlite3.connect("macro_tracker.db") as conn:
+        return conn.execute("SELECT food_id, id FROM menus WHERE date = ?", (date,)).fetchall()
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # measure the POST itself, not the page it redirects to
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class VirtualUser:
+    def __init__(self, base_url, username, menu_items, halls, rng):
+        self.base_url = base_url
+        self.username = username
+        self.menu_items = menu_items
+        self.halls = halls
+        self.rng = rng
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect
+        )
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as err:
+            err.read()
+            return err.code
+
+    def start_session(self):
+        if self.username:
+            self.request("/login", {"username": self.username, "password": PASSWORD})
+        else:
+            self.request("/guest")
+
+    def run_action(self, action):
+        if action == "GET /menu":
+            return self.request("/menu")
+        if action == "POST /menu (change hall)":
+            return self.request("/menu", {"change-menu": "change-menu", "dining-hall": self.rng.choice(self.halls), "date": ""})
+        if action == "POST /menu (log food)":
+            data = {"food_id": []}
+            for food_id, menu_id in self.rng.sample(self.menu_items, self.rng.randint(1, 4)):
+                data["food_id"].append(food_id)
+                data[f"quantity_{food_id}"] = self.rng.randint(1, 3)
+                data[f"menu_id_{food_id}"] = menu_id
+            return self.request("/menu", data)
+        if action == "GET /dashboard":
+            return self.request("/dashboard")
+        return self.request("/view_logs")
+
+def run_user(user, deadline, results, lock):
+    labels = [label for label, _ in ACTIONS]
+    weights = [weight for _, weight in ACTIONS]
+    user.start_session()
+    local = defaultdict(list)
+    errors = defaultdict(int)
+
+    while time.perf_counter() < deadline:
+        action = user.rng.choices(labels, weights)[0]
+        start = time.perf_counter()
+        status = user.run_action(action)
+        local[action].append(time.perf_counter() - start)
+        if status >= 400:
+            errors[action] += 1
+
+    with lock:
+        for action, timings in local.items():
+            results["timings"][action].extend(timings)
+        for action, count in errors.items():
+            results["errors"][action] += count
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+def summarize(results, duration):
+    summary = {}
+    for action, _ in ACTIONS:
+        timings = results["timings"].get(action)
+        if not timings:
+            continue
+        summary[action] = {
+            "requests": len(timings),
+            "errors": results["errors"].get(action, 0),
+            "throughput_rps": round(len(timings) / duration, 2),
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+            "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        }
+    return summary
+
+def print_summary(summary, baseline=None):
+    print(f"{'route':<26} {'reqs':>7} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for action, stats in summary.items():
+        line = (f"{action:<26} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+                f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        if baseline and action in baseline:
+            old = baseline[action]
+            line += (f"   vs baseline: req/s {stats['throughput_rps'] / old['throughput_rps'] - 1:+.0%}, "
+                     f"p95 {stats['p95_ms'] / old['p95_ms'] - 1:+.0%}")
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--registered", type=float, default=0.3, help="fraction of users that log in, the rest are guests")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--foods-per-meal", type=int, default=60)
+    parser.add_argument("--port", type=int, default=5057)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results as a json baseline")
+    parser.add_argument("--compare", help="json baseline to compare against")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.workdir, args.serve)
+        return
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["routes"]
+
+    import scraper
+    workdir = make_temp_db(foods_per_meal=args.foods_per_meal)
+    num_registered = round(args.users * args.registered)
+    create_users(num_registered)
+    menu_items = get_menu_items(scraper.get_formatted_date())
+    halls = list(scraper.DINING_HALL_ID_DICT)
+
+    process, base_url = start_server(workdir, args.port)
+    try:
+        rng = random.Random(args.seed)
+        users = [
+            VirtualUser(base_url, f"loaduser{i}" if i < num_registered else None, menu_items, halls,
+                        random.Random(rng.random()))
+            for i in range(args.users)
+        ]
+        results = {"timings": defaultdict(list), "errors": defaultdict(int)}
+        lock = threading.Lock()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        threads = [threading.Thread(target=run_user, args=(user, deadline, results, lock)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+
+    summary = summarize(results, elapsed)
+    print(f"{args.users} users ({num_registered} registered) for {elapsed:.1f}s")
+    print_summary(summary, baseline)
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        with open(save_path, "w") as f:
+            json.dump({
+                "config": {
+                    "users": args.users,
+                    "registered": num_registered,
+                    "duration": round(elapsed, 2),
+                    "foods_per_meal": args.foods_per_meal,
+                    "seed": args.seed,
+                },
+                "routes": summary,
+            }, f, indent=2)
+        print(f"Saved baseline to {save_path}")
+
+if __name__ == "__main__":
+    main()
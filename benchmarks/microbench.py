@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from bs4 import BeautifulSoup
+
+from common import REPO_DIR
+
+import database
+import scraper
+import synthetic_data
+
+# microbench.py times the scraper's parsing and the database hot paths one function at a time:
+# parsing runs on the checked-in pages in benchmarks/fixtures, database functions on synthetic
+# databases (synthetic_data.py) of a few sizes. reports ops/sec and peak memory per call, writes
+# the results as json and exits 1 when something got slower (or hungrier) than a stored baseline
+# by more than --threshold.
+#   python benchmarks/microbench.py --sizes tiny small --save benchmarks/results/microbench_baseline.json
+#   python benchmarks/microbench.py --compare benchmarks/results/microbench_baseline.json --threshold 0.25
+#   python benchmarks/microbench.py --only get_foods_by_meal --sizes medium
+
+FIXTURES_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures")
+SIZES = {
+    "tiny": {"foods": 300, "days": 14, "users": 20, "visitors": 50, "logs_per_day": 30},
+    **synthetic_data.SCALES,
+}
+MEMORY_SLACK_BYTES = 64 * 1024 # ignore memory changes smaller than this
+AS_OF = date(2025, 10, 20) # the synthetic dbs' today, fixed so every run times the same data
+
+
+def read_fixtures(kind, skip=()):
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, kind, "*.html")))
+    return [open(path, encoding="utf-8").read() for path in paths if os.path.basename(path) not in skip]
+
+# ------------- BENCHMARKS ---------------------------------------
+# each returns {name: op}, an op is a no-argument callable doing one call of the function. an op
+# that writes can be (op, reset) instead: reset undoes its writes after every call, untimed, so
+# each call (and the next benchmark) sees the same db however many calls fit in the time
+def parsing_benchmarks():
+    menu_pages = read_fixtures("menus")
+    label_pages = read_fixtures("labels", skip=("shifted_layout.html",)) # the broken layout raises
+    menu_soups = [BeautifulSoup(page, "html.parser") for page in menu_pages]
+    cycle = {"menu": 0, "label": 0}
+
+    def next_item(kind, items):
+        cycle[kind] = (cycle[kind] + 1) % len(items)
+        return items[cycle[kind]]
+
+    def get_macros():
+        page = next_item("label", label_pages)
+        fetch_page = scraper.fetch_page
+        scraper.fetch_page = lambda url: page # no network, the parsing is what's measured
+        try:
+            return scraper.get_macros("label.aspx")
+        finally:
+            scraper.fetch_page = fetch_page
+
+    return {
+        "get_meal_id_map": lambda: scraper.get_meal_id_map(next_item("menu", menu_soups)),
+        "get_all_foods": lambda: scraper.get_all_foods(next_item("menu", menu_soups), "10/20/2025", "South Campus"),
+        "get_macros": get_macros,
+    }
+
+def database_benchmarks(db_path):
+    # runs inside the db's directory, database.py uses a relative path
+    with database.get_connection() as conn:
+        today = synthetic_data.format_date(AS_OF)
+        hall, meal = conn.execute("""
+            SELECT location, meal_type FROM menus WHERE date = ?
+            GROUP BY location, meal_type ORDER BY COUNT(*) DESC LIMIT 1
+        """, (today,)).fetchone()
+        user_id, log_date = conn.execute("""
+            SELECT user_id, date FROM food_logs WHERE user_id IS NOT NULL
+            GROUP BY user_id, date ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()
+    batch = {"n": 0}
+
+    def new_foods(count=100):
+        batch["n"] += 1
+        return [
+            {
+                "name": f"Bench Food {batch['n']}-{i}", "url": f"bench://{batch['n']}/{i}",
+                "protein": 10.0, "carbs": 20.0, "fat": 5.0, "calories": 165.0, "serving_size": "1 each",
+                "dining_hall": hall, "station": "Bench", "date": f"1/{batch['n'] % 28 + 1}/1999", "meal": "lunch",
+            }
+            for i in range(count)
+        ]
+
+    def insert_menus():
+        foods = new_foods()
+        scraper.batch_insert_foods(foods, db_path)
+        return scraper.batch_insert_menus(foods, db_path)
+
+    def remove_bench_rows():
+        with database.get_connection() as conn:
+            conn.execute("DELETE FROM menus WHERE food_id IN (SELECT id FROM foods WHERE url LIKE 'bench://%')")
+            conn.execute("DELETE FROM foods WHERE url LIKE 'bench://%'")
+            conn.commit()
+
+    return {
+        "get_foods_by_meal": lambda: database.get_foods_by_meal(meal, today, hall),
+        "get_daily_macros": lambda: database.get_daily_macros(True, user_id, log_date),
+        "batch_insert_foods": (lambda: scraper.batch_insert_foods(new_foods(), db_path), remove_bench_rows),
+        "batch_insert_menus": (insert_menus, remove_bench_rows), # includes inserting the foods it references
+    }
+
+# ------------- MEASURING ----------------------------------------
+def measure(op, min_time, rounds, reset=None):
+    reset = reset or (lambda: None)
+    op() # warm-up (imports, sqlite page cache, regex caches)
+    reset()
+
+    # ops/sec: as many calls as fit in min_time, best of rounds (like timeit, the
+    # slower rounds are other processes getting in the way, not the code). only op is timed
+    rates = []
+    for _ in range(rounds):
+        calls = 0
+        elapsed = 0
+        while elapsed < min_time:
+            start = time.perf_counter()
+            op()
+            elapsed += time.perf_counter() - start
+            calls += 1
+            reset()
+        rates.append(calls / elapsed)
+
+    tracemalloc.start()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    reset()
+
+    return {
+        "ops_per_sec": round(max(rates), 2),
+        "spread": round((max(rates) - min(rates)) / max(rates), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def run_suite(sizes, only, min_time, rounds):
+    results = {}
+
+    def run(key, benchmarks):
+        for name, op in benchmarks.items():
+            if only and name not in only:
+                continue
+            op, reset = op if isinstance(op, tuple) else (op, None)
+            with contextlib.redirect_stdout(open(os.devnull, "w")): # the scraper prints every food
+                result = measure(op, min_time, rounds, reset)
+            results[key(name)] = result
+            print(f"{key(name):<34} {result['ops_per_sec']:>12,.1f} ops/s  (±{result['spread']:.0%})  "
+                  f"{result['peak_kb']:>9,.1f} KB peak")
+
+    run(lambda name: name, parsing_benchmarks())
+
+    cwd = os.getcwd()
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix=f"terp_eats_microbench_{size}_")
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                synthetic_data.generate("macro_tracker.db", AS_OF, seed=0, **SIZES[size])
+            run(lambda name: f"{name}[{size}]", database_benchmarks("macro_tracker.db"))
+        finally:
+            os.chdir(cwd)
+    return results
+
+def compare(results, baseline, threshold):
+    # returns the lines describing regressions past threshold
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if not old:
+            continue
+        slowdown = old["ops_per_sec"] / result["ops_per_sec"] - 1
+        growth = result["peak_kb"] / old["peak_kb"] - 1 if old["peak_kb"] else 0
+        if slowdown > threshold:
+            regressions.append(f"{key}: {old['ops_per_sec']:,.1f} -> {result['ops_per_sec']:,.1f} ops/s ({slowdown:+.0%} time)")
+        if growth > threshold and (result["peak_kb"] - old["peak_kb"]) * 1024 > MEMORY_SLACK_BYTES:
+            regressions.append(f"{key}: {old['peak_kb']:,.1f} -> {result['peak_kb']:,.1f} KB peak ({growth:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["tiny", "small"], help="synthetic db sizes")
+    parser.add_argument("--only", nargs="+", help="run only these functions")
+    parser.add_argument("--min-time", type=float, default=0.3, help="seconds per timing round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--save", help="write the results as a json baseline")
+    parser.add_argument("--output", help="write the results as json (without making them the baseline)")
+    parser.add_argument("--compare", help="json baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown/memory growth, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(path) for path in (args.save, args.output) if path]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = run_suite(args.sizes, args.only, args.min_time, args.rounds)
+
+    for path in paths:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "config": {"sizes": args.sizes, "min_time": args.min_time, "rounds": args.rounds},
+                "python": sys.version.split()[0],
+                "results": results,
+            }, f, indent=2)
+        print(f"Saved results to {path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions past {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions past {args.threshold:.0%} against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import html
+import re
+import sqlite3
+from contextlib import closing
+
+# canonical.py used for telling when two foods rows are the same dish. menus link every item to
+# label.aspx?RecNumAndPort=<recipe>*<port>, the port being the kitchen serving it, so one recipe
+# at three halls is three urls: three foods rows and, before this, three label fetches. a
+# canonical food is the recipe number plus the normalized name, foods point at theirs with
+# canonical_id and the scraper fetches one label per canonical food, copying it to the other urls.
+#   python canonical.py           (link foods that have no canonical food yet, then report)
+#   python canonical.py --stats
+
+RECIPE_PATTERN = re.compile(r"RecNumAndPort=(\d+)", re.IGNORECASE)
+NON_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def get_recipe(url):
+    # the recipe number, or the whole url when there is none (then nothing else matches it)
+    match = RECIPE_PATTERN.search(url)
+    return match[1] if match else url
+
+def normalize_name(name):
+    # "Mac &amp; Cheese " and "mac & cheese" -> "mac cheese"
+    return " ".join(NON_WORD_PATTERN.sub(" ", html.unescape(name).lower()).split())
+
+def get_key(url, name):
+    return get_recipe(url), normalize_name(name)
+
+def get_known_keys(conn):
+    # canonical foods that already have a labeled food to copy from
+    return set(conn.execute("""
+        SELECT c.recipe, c.name_key FROM canonical_foods c
+        WHERE EXISTS (SELECT 1 FROM foods f WHERE f.canonical_id = c.id)
+    """).fetchall())
+
+def backfill(conn):
+    # links foods without a canonical_id (rows from before canonical_foods, or inserted by
+    # synthetic_data.py), returns how many
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("SELECT id, url, name FROM foods WHERE canonical_id IS NULL").fetchall()
+        keys = [(food_id, *get_key(url, name)) for food_id, url, name in rows]
+        conn.executemany(
+            "INSERT OR IGNORE INTO canonical_foods (recipe, name_key) VALUES (?, ?)",
+            [(recipe, name_key) for _, recipe, name_key in keys]
+        )
+        conn.executemany("""
+            UPDATE foods SET canonical_id = (SELECT id FROM canonical_foods WHERE recipe = ? AND name_key = ?)
+            WHERE id = ?
+        """, [(recipe, name_key, food_id) for food_id, recipe, name_key in keys])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(rows)
+
+def get_stats(conn):
+    foods, canonical_foods = conn.execute("SELECT COUNT(*), COUNT(DISTINCT canonical_id) FROM foods").fetchone()
+    shared = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(urls), 0) FROM (
+            SELECT COUNT(*) AS urls FROM foods WHERE canonical_id IS NOT NULL GROUP BY canonical_id HAVING urls > 1
+        )
+    """).fetchone()
+    # scrape runs from before labels_fetched have it NULL and aren't counted
+    runs, new_foods, labels_fetched = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(new_foods), 0), COALESCE(SUM(labels_fetched), 0)
+        FROM scrape_runs WHERE labels_fetched IS NOT NULL
+    """).fetchone()
+    return {
+        "foods": foods,
+        "canonical_foods": canonical_foods,
+        "shared_canonical_foods": shared[0], # canonical foods served under more than one url
+        "shared_foods": shared[1], # foods rows pointing at one of those
+        "runs": runs,
+        "new_foods": new_foods,
+        "labels_fetched": labels_fetched,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Link foods to their canonical food and report the duplicates.")
+    parser.add_argument("--stats", action="store_true", help="only report, don't link anything")
+    args = parser.parse_args()
+
+    with closing(sqlite3.connect("macro_tracker.db", isolation_level=None)) as conn:
+        if not args.stats:
+            print(f"Linked {backfill(conn)} foods to canonical foods")
+        stats = get_stats(conn)
+
+    duplicates = stats["foods"] - stats["canonical_foods"]
+    print(f"{stats['foods']} foods are {stats['canonical_foods']} canonical foods ({duplicates} duplicate labels): "
+          f"{stats['shared_foods']} urls share {stats['shared_canonical_foods']} of them")
+    if stats["runs"]:
+        saved = stats["new_foods"] - stats["labels_fetched"]
+        print(f"{stats['runs']} scrape runs with canonical foods: {stats['new_foods']} new foods, "
+              f"{stats['labels_fetched']} labels fetched ({saved} fetches saved, {saved / max(stats['new_foods'], 1):.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,84 @@
+import os
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from werkzeug.security import check_password_hash, generate_password_hash
-from email_validator import validate_email, EmailNotValidError
 import re
 
+import menu_snapshot
+import profiling
+import records
+
 # database.py used for querying database and updating logs/goals/users
 
+DB_PATH = "macro_tracker.db"
+ARCHIVE_DIR = "archive" # per-semester menu archives, see archive.py
+OFFLINE_LOG_DAYS = 7 # how old a log queued offline can be and still be accepted
+
+# every helper opens its connection here so profiling.py can count/time their queries
+def get_connection():
+    if profiling.enabled:
+        return sqlite3.connect(DB_PATH, factory=profiling.ProfiledConnection)
+    return sqlite3.connect(DB_PATH)
+
+def get_archive_path(term):
+    return os.path.join(ARCHIVE_DIR, f"menus_{term}.db")
+
+# menus older than the archive cutoff live in per-semester files (archive.py), returns the table to
+# read a date's menus from and attaches that date's archive to conn if needed. an archived date
+# that was scraped again since (the next archive run moves the new rows) is decided per hall: halls
+# that were re-scraped read menus, the rest their archived rows, merged into a temp table for conn
+def get_menus_table(conn, date):
+    try:
+        row = conn.execute("SELECT term FROM archived_dates WHERE date = ?", (date,)).fetchone()
+    except sqlite3.OperationalError: # db created before archiving existed
+        return "menus"
+    if row is None:
+        return "menus"
+    conn.execute("ATTACH DATABASE ? AS archive", (get_archive_path(row[0]),))
+    if not conn.execute("SELECT 1 FROM menus WHERE date = ? LIMIT 1", (date,)).fetchone():
+        return "archive.menus"
+    conn.execute("DROP TABLE IF EXISTS temp.merged_menus")
+    conn.execute("""
+        CREATE TEMP TABLE merged_menus AS
+        SELECT id, food_id, location, station, date, meal_type FROM main.menus WHERE date = :date
+        UNION ALL
+        SELECT id, food_id, location, station, date, meal_type FROM archive.menus
+        WHERE date = :date AND location NOT IN (SELECT location FROM main.menus WHERE date = :date)
+    """, {"date": date})
+    return "temp.merged_menus"
+
 def get_food_name_by_id(food_id):
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM foods WHERE id = ?", (food_id,))
         result = cursor.fetchone()
         return result[0] if result else None
     
 def get_food_meal_by_id(menu_id):
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT meal_type FROM menus WHERE id = ?", (menu_id,))
         result = cursor.fetchone()
-        return result[0] if result else None
+        if result:
+            return result[0]
+
+        # archived menu ids keep their ids, look through the archives (rare, old menus only)
+        try:
+            terms = [row[0] for row in cursor.execute("SELECT DISTINCT term FROM archived_dates").fetchall()]
+        except sqlite3.OperationalError:
+            return None
+        for term in terms:
+            conn.execute("ATTACH DATABASE ? AS archive", (get_archive_path(term),))
+            cursor.execute("SELECT meal_type FROM archive.menus WHERE id = ?", (menu_id,))
+            result = cursor.fetchone()
+            conn.execute("DETACH DATABASE archive")
+            if result:
+                return result[0]
+        return None
 
-def get_foods_by_meal(meal_type, date, dining_hall):
+# order="popular" puts the busiest stations first and the most logged foods first within each
+# station, straight from the popularity counters (last week's score, then all-time logs)
+def get_foods_by_meal(meal_type, date, dining_hall, order="station"):
     query = """
         SELECT 
             f.id,
@@ -32,42 +90,102 @@ def get_foods_by_meal(meal_type, date, dining_hall):
             f.fat,
             f.calories,
             m.id
-        FROM menus m
+        FROM {menus} m
         JOIN foods f ON m.food_id = f.id
+        {popularity}
         WHERE m.meal_type = ?
           AND m.date = ?
           AND m.location = ?
-        ORDER BY m.station, f.name
+        ORDER BY {order}
     """
+    if order != "popular":
+        snapshot = menu_snapshot.get_snapshot()
+        if snapshot and snapshot.covers(date):
+            return snapshot.get_foods_by_meal(meal_type, date, dining_hall)
+
+    by_station = {"popularity": "", "order": "m.station, f.name"}
+    by_popularity = {
+        "popularity": """
+        LEFT JOIN station_popularity sp ON sp.location = m.location AND sp.station = m.station
+        LEFT JOIN food_popularity fp ON fp.food_id = f.id""",
+        "order": """COALESCE(sp.score_7d, 0) DESC, COALESCE(sp.logs, 0) DESC, m.station,
+                 COALESCE(fp.score_7d, 0) DESC, COALESCE(fp.logs, 0) DESC, f.name""",
+    }
 
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
+        menus = get_menus_table(conn, date)
+        # on the cursor, not conn: get_menus_table's own lookups need plain tuples
         cursor = conn.cursor()
-        cursor.execute(query, (meal_type, date, dining_hall))
+        cursor.row_factory = records.MenuFood
+        try:
+            cursor.execute(
+                query.format(menus=menus, **(by_popularity if order == "popular" else by_station)),
+                (meal_type, date, dining_hall)
+            )
+        except sqlite3.OperationalError: # db created before popularity counters existed
+            if order != "popular":
+                raise
+            cursor.execute(query.format(menus=menus, **by_station), (meal_type, date, dining_hall))
         results = cursor.fetchall()
 
     grouped = {}
-    for food_id, name, serving_size, station, protein, carbs, fat, calories, menu_id in results:
-        if station not in grouped:
-            grouped[station] = []
-
-        grouped[station].append({
-            "id": food_id,
-            "name": name,
-            "serving_size": serving_size,
-            "protein": protein,
-            "carbs": carbs,
-            "fat": fat,
-            "calories": calories,
-            "menu_id": menu_id
-        })
+    for food in results:
+        if food.station not in grouped:
+            grouped[food.station] = []
+
+        grouped[food.station].append(food)
 
     return grouped
 
+# active dining locations as (name, dropdown label), kept up to date by scraper.discover_locations
+def get_locations():
+    query = "SELECT name, COALESCE(display_name, name) FROM locations WHERE active = 1 ORDER BY id"
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query)
+        except sqlite3.OperationalError: # db created before locations existed
+            cursor.execute("SELECT DISTINCT location, location FROM menus ORDER BY location")
+        return cursor.fetchall()
+
+# every hall and meal for a date in one query (used for the client-side menu payload)
+def get_menu_for_date(date):
+    query = """
+        SELECT
+            m.location,
+            m.meal_type,
+            m.station,
+            f.id,
+            f.name,
+            f.serving_size,
+            f.calories,
+            f.protein,
+            f.carbs,
+            f.fat,
+            m.id
+        FROM {menus} m
+        JOIN foods f ON m.food_id = f.id
+        WHERE m.date = ?
+        ORDER BY m.location, m.meal_type, m.station, f.name
+    """
+    snapshot = menu_snapshot.get_snapshot()
+    if snapshot and snapshot.covers(date):
+        return snapshot.get_menu_for_date(date)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query.format(menus=get_menus_table(conn, date)), (date,))
+        return cursor.fetchall()
+
 
 # user logic
 def create_user(username, email, password):
     query = "INSERT INTO users (username, email, password) VALUES (?, ?, ?)"
 
+    # only registration needs it, imported here so web workers don't load it at startup
+    from email_validator import validate_email, EmailNotValidError
+
     try:
         emailinfo = validate_email(email)
         email = emailinfo.normalized
@@ -76,7 +194,7 @@ def create_user(username, email, password):
         return None
 
     try:
-        with sqlite3.connect("macro_tracker.db") as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (username, email, generate_password_hash(password)))
             conn.commit()
@@ -88,21 +206,21 @@ def create_user(username, email, password):
     
 def get_user_by_username(username):
     query = "SELECT id FROM users WHERE username = ?"
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, (username,))
         return cursor.fetchone()
 
 def get_user_by_id(id):
     query = "SELECT id, username, email, created_at FROM users WHERE id = ?"
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, (id,))
         return cursor.fetchone()
 
 def remove_user(username):
     query = "DELETE FROM users WHERE username = ?"
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, (username,))
         conn.commit()
@@ -134,7 +252,7 @@ def remove_user(username):
 #         return cursor.fetchone() is not None
 
 def validate_account(username, password):
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT password FROM users WHERE username = ?", (username, ))
         row = cursor.fetchone()
@@ -227,39 +345,22 @@ def get_daily_macros(is_user, user_id, date, return_foods=True):
         ORDER BY l.meal_type
         """
 
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = records.FoodLog
         cursor.execute(query, (user_id, date))
-        rows = cursor.fetchall()
+        foods = cursor.fetchall()
     
-    if not rows:
+    if not foods:
         print("No logs found for this date and user")
     
-    foods = []
     total_cals = total_protein = total_carbs = total_fat = 0
 
-    for name, servings, calories, protein, carbs, fat, meal, serving_size, log_id in rows:
-        calories = round(calories, 1)
-        protein = round(protein, 1)
-        carbs = round(carbs, 1)
-        fat = round(fat, 1)
-
-        foods.append({
-            "name": name,
-            "servings": servings,
-            "calories": calories,
-            "protein": protein,
-            "carbs": carbs,
-            "fat": fat,
-            "meal": meal,
-            "serving_size": serving_size,
-            "log_id": log_id
-        })
-        
-        total_cals += calories
-        total_protein += protein
-        total_carbs += carbs
-        total_fat += fat
+    for food in foods:
+        total_cals += food.calories
+        total_protein += food.protein
+        total_carbs += food.carbs
+        total_fat += food.fat
 
     total = {
         "calories": round(total_cals, 1),
@@ -293,7 +394,77 @@ def get_daily_macros(is_user, user_id, date, return_foods=True):
         "fat_remaining": round(fat_goal - total_fat, 1)
     }
 
-def log_food(is_user, id, food_id, quantity, date, meal):
+# what a log dated log_date weighs in each score as of the last decay (the scores are current as of
+# then), so adding a log and taking it back out move the counters by the same amount. nothing
+# decayed yet: weighed as of now
+def get_popularity_weights(cursor, log_date):
+    import popularity # imports this module
+    cursor.execute("SELECT decayed_at FROM popularity_decay WHERE id = 1")
+    row = cursor.fetchone()
+    decayed_at = datetime.fromisoformat(row[0]) if row else datetime.now()
+    return {
+        column: popularity.get_log_weight(log_date, window, decayed_at)
+        for column, window in popularity.WINDOWS_HOURS.items()
+    }
+
+# bumps the popularity counters for a new log, on the caller's cursor so they commit or roll back
+# with the log itself. menu_id (the menu row the food was logged from) credits the hall station too.
+# a log for an earlier day (a queued offline one) adds what it would have decayed to by now, the
+# same weight popularity.rebuild gives it
+def record_popularity(cursor, food_id, log_date, menu_id=None):
+    logged_at = datetime.now().isoformat(timespec="seconds")
+    try:
+        weights = get_popularity_weights(cursor, log_date)
+        cursor.execute("""
+            INSERT INTO food_popularity (food_id, logs, score_1d, score_7d, last_logged)
+            VALUES (:food_id, 1, :score_1d, :score_7d, :logged_at)
+            ON CONFLICT(food_id) DO UPDATE SET
+                logs = logs + 1,
+                score_1d = score_1d + excluded.score_1d,
+                score_7d = score_7d + excluded.score_7d,
+                last_logged = excluded.last_logged
+        """, {**weights, "food_id": food_id, "logged_at": logged_at})
+
+        if menu_id is None:
+            return
+        cursor.execute("SELECT location, station FROM menus WHERE id = ?", (menu_id,))
+        row = cursor.fetchone()
+        if row is None: # archived menu
+            return
+        cursor.execute("""
+            INSERT INTO station_popularity (location, station, logs, score_1d, score_7d, last_logged)
+            VALUES (:location, :station, 1, :score_1d, :score_7d, :logged_at)
+            ON CONFLICT(location, station) DO UPDATE SET
+                logs = logs + 1,
+                score_1d = score_1d + excluded.score_1d,
+                score_7d = score_7d + excluded.score_7d,
+                last_logged = excluded.last_logged
+        """, {**weights, "location": row[0], "station": row[1], "logged_at": logged_at})
+    except sqlite3.OperationalError: # db created before popularity counters existed
+        return
+
+# takes a removed log back out of the counters, what it still weighs as of the last decay. logs
+# don't remember the menu row they came from, so its stations are looked up the way
+# popularity.rebuild does (every station serving that food at that meal; archived menus are skipped)
+def unrecord_popularity(cursor, food_id, log_date, meal_type):
+    try:
+        weights = {**get_popularity_weights(cursor, log_date), "food_id": food_id}
+        cursor.execute("""
+            UPDATE food_popularity
+            SET logs = MAX(logs - 1, 0), score_1d = MAX(score_1d - :score_1d, 0), score_7d = MAX(score_7d - :score_7d, 0)
+            WHERE food_id = :food_id
+        """, weights)
+        cursor.execute("""
+            UPDATE station_popularity
+            SET logs = MAX(logs - 1, 0), score_1d = MAX(score_1d - :score_1d, 0), score_7d = MAX(score_7d - :score_7d, 0)
+            WHERE (location, station) IN (
+                SELECT location, station FROM menus WHERE food_id = :food_id AND date = :date AND meal_type = :meal_type
+            )
+        """, {**weights, "date": log_date, "meal_type": meal_type})
+    except sqlite3.OperationalError:
+        return
+
+def log_food(is_user, id, food_id, quantity, date, meal, menu_id=None):
     if is_user:
         query = """
             INSERT INTO food_logs (user_id, food_id, date, meal_type, servings)
@@ -305,7 +476,7 @@ def log_food(is_user, id, food_id, quantity, date, meal):
             VALUES (?, ?, ?, ?, ?)
         """
 
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         conn.execute('PRAGMA foreign_keys = ON')
         cursor = conn.cursor()
         
@@ -315,20 +486,61 @@ def log_food(is_user, id, food_id, quantity, date, meal):
             return False
 
         cursor.execute(query, (id, food_id, date, meal, quantity))
+        record_popularity(cursor, food_id, date, menu_id)
         conn.commit()
         return True
 
+# logs the service worker queued while offline (app.py /api/logs/batch), in one transaction.
+# entries are (client_id, food_id, menu_id, quantity, date); one whose client_id was already
+# logged (a retried batch) or whose food isn't on that menu is skipped. returns how many were logged
+def log_food_batch(is_user, id, entries):
+    column = "user_id" if is_user else "visitor_id"
+    received_at = datetime.now()
+
+    with get_connection() as conn:
+        conn.execute('PRAGMA foreign_keys = ON')
+        cursor = conn.cursor()
+        # a client_id only has to be remembered as long as its log could still be retried
+        cursor.execute("DELETE FROM offline_logs WHERE received_at < ?",
+                       ((received_at - timedelta(days=OFFLINE_LOG_DAYS + 1)).isoformat(timespec="seconds"),))
+
+        logged = 0
+        for client_id, food_id, menu_id, quantity, date in entries:
+            cursor.execute("SELECT meal_type FROM menus WHERE id = ? AND food_id = ?", (menu_id, food_id))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            cursor.execute("INSERT OR IGNORE INTO offline_logs (client_id, received_at) VALUES (?, ?)",
+                           (client_id, received_at.isoformat(timespec="seconds")))
+            if cursor.rowcount == 0:
+                continue
+            cursor.execute(f"""
+                INSERT INTO food_logs ({column}, food_id, date, meal_type, servings)
+                VALUES (?, ?, ?, ?, ?)
+            """, (id, food_id, date, row[0], quantity))
+            record_popularity(cursor, food_id, date, menu_id)
+            logged += 1
+        conn.commit()
+        return logged
+
 def remove_log_by_id(id):
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         conn.execute('PRAGMA foreign_keys = ON')
         cursor = conn.cursor()
 
+        cursor.execute("SELECT food_id, date, meal_type FROM food_logs WHERE id = ?", (id,))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+
         cursor.execute("""
             DELETE FROM food_logs WHERE id = ?
         """, (id,))
+        removed = cursor.rowcount > 0
+        unrecord_popularity(cursor, *row)
 
         conn.commit()
-        return cursor.rowcount > 0
+        return removed
 
 # def remove_log_by_date(date):
 #     with sqlite3.connect("macro_tracker.db") as conn:
@@ -342,7 +554,7 @@ def remove_log_by_id(id):
 #     conn.commit()
 
 def update_log(log_id, servings):
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         conn.execute('PRAGMA foreign_keys = ON')
         cursor = conn.cursor()
 
@@ -362,11 +574,11 @@ def format_date(date):
 
 def valid_date(date):
     formatted_date = format_date(date)
-    query = "SELECT id FROM menus WHERE date = ?"
+    query = "SELECT id FROM {menus} WHERE date = ?"
 
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(query, (formatted_date, ))
+        cursor.execute(query.format(menus=get_menus_table(conn, formatted_date)), (formatted_date, ))
         results = cursor.fetchone()
 
         if results:
@@ -382,11 +594,14 @@ def validate_password_strength(password):
 # find if dining hall menu is a 3-count (breakfast, lunch, dinner) or a 2-count (brunch, dinner)
 # (returns True if 2-count, False if 3-count)
 def has_brunch(date):
-    query = "SELECT EXISTS(SELECT 1 FROM menus WHERE date = ? AND meal_type = ?)"
+    query = "SELECT EXISTS(SELECT 1 FROM {menus} WHERE date = ? AND meal_type = ?)"
+    snapshot = menu_snapshot.get_snapshot()
+    if snapshot and snapshot.covers(date):
+        return snapshot.has_meal(date, 'brunch')
 
-    with sqlite3.connect("macro_tracker.db") as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(query, (date, 'brunch'))
+        cursor.execute(query.format(menus=get_menus_table(conn, date)), (date, 'brunch'))
 
         results = cursor.fetchone()
         if results[0] == 1: # brunch found, meaning 2-count
@@ -395,6 +610,63 @@ def has_brunch(date):
             return False
 
 
+# scrape generation for a menu date (id of the latest scrape run), used to version cached menus
+# only successful runs count: a failed or closed run publishes nothing, so it mustn't invalidate
+# the etags and fragment caches keyed by the generation
+def get_scrape_generation(date):
+    query = "SELECT COALESCE(MAX(id), 0) FROM scrape_runs WHERE menu_date = ? AND status = 'success'"
+    # covered dates take the generation of the snapshot their menus are read from, so a cache
+    # keyed by it never pairs a newer generation with the older snapshot's menus
+    snapshot = menu_snapshot.get_snapshot()
+    if snapshot and snapshot.covers(date):
+        return snapshot.get_generation(date)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (date,))
+        return cursor.fetchone()[0]
+
+
+# menu changes after cursor `since` (a menu_changes id), oldest first, for the /api/changes feed
+def get_menu_changes(since, limit, date=None):
+    query = """
+        SELECT c.id, c.scrape_run_id, c.date, c.location, c.meal_type, c.change,
+               c.food_id, f.name, c.station, c.old_value
+        FROM menu_changes c
+        LEFT JOIN foods f ON f.id = c.food_id
+        WHERE c.id > ? {date_filter}
+        ORDER BY c.id
+        LIMIT ?
+    """
+    parameters = [since]
+    date_filter = ""
+    if date:
+        date_filter = "AND c.date = ?"
+        parameters.append(date)
+    parameters.append(limit)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query.format(date_filter=date_filter), parameters)
+        return cursor.fetchall()
+
+# asks prefetcher.py to scrape a date nobody has scraped yet (jumps its queue)
+def request_scrape(date):
+    # generation 0 also means a day the halls were closed, those aren't asked for again
+    query = """
+        INSERT OR IGNORE INTO scrape_requests (date, requested_at)
+        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM scrape_runs WHERE menu_date = ? AND status = 'closed')
+    """
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, (date, datetime.now().isoformat(), date))
+        except sqlite3.OperationalError: # db created before the prefetcher existed
+            return
+        conn.commit()
+
+
 # def search_food(food_name, foods):
 #     for food in foods:
 #         if 
\ No newline at end of file
@@ -0,0 +1,24 @@
+import multiprocessing
+import os
+
+# gunicorn.conf.py production server settings, override with env vars:
+#   WEB_CONCURRENCY (workers), WEB_THREADS, PORT/BIND, WEB_TIMEOUT
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("WEB_THREADS", "1"))
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+
+# import and warm the app (wsgi.py calls warm_up()) once in the master, then fork:
+# workers share the loaded modules/caches copy-on-write and skip the cold start
+preload_app = True
+
+# sqlite connections must never cross a fork, app code only opens them per call so there
+# is nothing to close here, but each worker re-reads the db once so its first query is warm
+def post_fork(server, worker):
+    import database
+    import utils
+    database.has_brunch(utils.get_formatted_date())
+
+def when_ready(server):
+    server.log.info("TerpEats warmed up, accepting traffic")
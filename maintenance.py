@@ -0,0 +1,239 @@
+import argparse
+import glob
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import database
+
+# maintenance.py used for keeping macro_tracker.db healthy while the app and scraper keep writing
+# to it: refreshes the query planner's statistics, gives deleted pages back to the filesystem a
+# few at a time (incremental vacuum), checks integrity and takes hot backups with sqlite's online
+# backup api in small page steps. nothing here holds a write lock for long, so the app keeps
+# serving while it runs. every task is logged in maintenance_runs with its duration and the space
+# it reclaimed, which is also how the schedule knows what's due.
+#   python maintenance.py                   (run whatever is due, e.g. every 15 minutes from cron)
+#   python maintenance.py --loop            (same, forever)
+#   python maintenance.py --task backup --task check
+#   python maintenance.py --enable-incremental-vacuum   (one-off full VACUUM for dbs made before it,
+#                                                         same as --task full_vacuum)
+
+BACKUP_DIR = "backups"
+BACKUPS_KEPT = 7
+BACKUP_STEP_PAGES = 256 # ~1 MB at the default page size, the source is only locked during a step
+BACKUP_STEP_PAUSE = 0.01 # seconds between steps, lets the app's writes through
+VACUUM_STEP_PAGES = 256
+VACUUM_STEP_PAUSE = 0.01
+ANALYSIS_LIMIT = 1000 # rows sampled per index by ANALYZE/optimize, keeps it fast on big tables
+BUSY_TIMEOUT = 30
+POLL_SECONDS = 15 * 60
+
+# how often each task runs (--loop / cron), in the order they run
+SCHEDULE = {
+    "optimize": timedelta(hours=6),
+    "vacuum": timedelta(days=1),
+    "check": timedelta(days=1),
+    "backup": timedelta(days=1),
+}
+
+# ------------- RUN LOG ------------------------------------------
+def create_maintenance_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                status TEXT NOT NULL,
+                bytes_before INTEGER,
+                bytes_after INTEGER,
+                reclaimed_bytes INTEGER DEFAULT 0,
+                detail TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_runs_task ON maintenance_runs(task, started_at)")
+
+def get_db_bytes(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+
+def get_due_tasks(conn, now=None):
+    now = now or datetime.now()
+    due = []
+    for task, interval in SCHEDULE.items():
+        row = conn.execute(
+            "SELECT MAX(started_at) FROM maintenance_runs WHERE task = ? AND status != 'failed'", (task,)
+        ).fetchone()
+        if row[0] is None or now - datetime.fromisoformat(row[0]) >= interval:
+            due.append(task)
+    return due
+
+def run_task(conn, task):
+    # runs one task and logs it, returns the maintenance_runs row as a dict
+    started_at = datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+    bytes_before = get_db_bytes(conn)
+    try:
+        status, reclaimed, detail = TASKS[task](conn)
+    except (sqlite3.Error, OSError) as e: # OSError: the backup's file work (full disk, permissions)
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        status, reclaimed, detail = "failed", 0, str(e)
+    logged = {
+        "task": task,
+        "started_at": started_at,
+        "seconds": round(time.perf_counter() - start, 3),
+        "status": status,
+        "bytes_before": bytes_before,
+        "bytes_after": get_db_bytes(conn),
+        "reclaimed_bytes": reclaimed,
+        "detail": detail,
+    }
+    conn.execute("""
+        INSERT INTO maintenance_runs (task, started_at, seconds, status, bytes_before, bytes_after, reclaimed_bytes, detail)
+        VALUES (:task, :started_at, :seconds, :status, :bytes_before, :bytes_after, :reclaimed_bytes, :detail)
+    """, logged)
+    return logged
+
+# ------------- TASKS --------------------------------------------
+# each takes an autocommit connection and returns (status, reclaimed bytes, detail)
+def optimize(conn):
+    # PRAGMA optimize only re-analyzes tables whose stats are missing or stale, ANALYZE when nothing
+    # has ever been analyzed (optimize skips tables with no stats at all on older sqlite)
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    # write lock up front: a read that later upgrades to a write gets "database is locked" right
+    # away when the app is writing, instead of waiting its turn
+    conn.execute("BEGIN IMMEDIATE")
+    analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    conn.execute("PRAGMA optimize" if analyzed else "ANALYZE")
+    conn.execute("COMMIT")
+    return "ok", 0, "PRAGMA optimize" if analyzed else "ANALYZE (first run)"
+
+def vacuum(conn):
+    # frees pages left by deletes in small transactions, then checkpoints so the wal doesn't keep them
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return "skipped", 0, "auto_vacuum is not incremental, run --enable-incremental-vacuum once"
+
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    steps = 0
+    while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+        # executescript steps the pragma to the end, execute() would free a single page per call
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+        steps += 1
+        time.sleep(VACUUM_STEP_PAUSE)
+    freed = free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    detail = f"{freed} pages freed in {steps} steps"
+
+    _, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    if wal_pages >= 0: # -1 when the db isn't in wal mode
+        detail += f", checkpointed {checkpointed}/{wal_pages} wal pages"
+    return "ok", freed * page_size, detail
+
+def check(conn):
+    # quick_check skips the index-vs-table comparison of integrity_check, minutes faster on a big db
+    problems = [row[0] for row in conn.execute("PRAGMA quick_check").fetchall()]
+    problems += [f"foreign key: {row}" for row in conn.execute("PRAGMA foreign_key_check").fetchall()]
+    if problems == ["ok"]:
+        return "ok", 0, "ok"
+    problems = [problem for problem in problems if problem != "ok"]
+    return "corrupt", 0, "; ".join(problems[:20])
+
+def backup(conn):
+    # copies into a temp file page by page, checks it, then renames it. in wal mode the copy reads
+    # from one open read transaction, so it's a consistent snapshot that the app's writes don't
+    # disturb (without it sqlite restarts the copy after every write from another connection and
+    # a busy db never finishes). rollback-journal dbs can't hold a reader open without blocking
+    # writers, so they just restart
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    # microseconds: two backups in the same second would overwrite each other. still sorts by time
+    path = os.path.join(BACKUP_DIR, f"macro_tracker_{datetime.now():%Y%m%d_%H%M%S_%f}.db")
+    temp_path = path + ".tmp"
+    steps = {"count": 0}
+
+    def progress(status, remaining, total):
+        steps["count"] += 1
+        time.sleep(BACKUP_STEP_PAUSE)
+
+    snapshot = conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    try:
+        with closing(sqlite3.connect(temp_path)) as target:
+            if snapshot:
+                conn.execute("BEGIN")
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone() # starts the read transaction
+            try:
+                conn.backup(target, pages=BACKUP_STEP_PAGES, progress=progress)
+            finally:
+                if snapshot:
+                    conn.execute("COMMIT")
+            result = target.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            os.remove(temp_path)
+            return "failed", 0, f"backup failed its integrity check: {result}"
+        os.replace(temp_path, path)
+    except BaseException: # a half-written copy would sit in BACKUP_DIR forever
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    old_backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "macro_tracker_*.db")))[:-BACKUPS_KEPT]
+    for old in old_backups:
+        os.remove(old)
+    size = os.path.getsize(path)
+    return "ok", 0, f"{path} ({size / 1e6:.1f} MB in {steps['count']} steps, removed {len(old_backups)} old backups)"
+
+def full_vacuum(conn):
+    # switches an existing db to incremental vacuum, which only takes with a full VACUUM: that
+    # rewrites the whole db and blocks writers while it runs, so once, off-hours (new dbs get
+    # auto_vacuum from scraper.create_tables)
+    bytes_before = get_db_bytes(conn)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return "ok" if mode == 2 else "failed", bytes_before - get_db_bytes(conn), f"auto_vacuum = {mode}"
+
+TASKS = {"optimize": optimize, "vacuum": vacuum, "check": check, "backup": backup, "full_vacuum": full_vacuum}
+
+# ------------- MAIN ---------------------------------------------
+def connect():
+    conn = sqlite3.connect(database.DB_PATH, timeout=BUSY_TIMEOUT, isolation_level=None)
+    create_maintenance_table(conn)
+    return conn
+
+def run(tasks=None):
+    # runs the given tasks (default: whatever is due), returns their maintenance_runs rows
+    with closing(connect()) as conn:
+        runs = []
+        for task in tasks or get_due_tasks(conn):
+            logged = run_task(conn, task)
+            runs.append(logged)
+            print(f"{task}: {logged['status']} in {logged['seconds']:.2f}s, reclaimed {logged['reclaimed_bytes'] / 1e6:.1f} MB "
+                  f"({logged['detail']})")
+        return runs
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze, vacuum, check and back up macro_tracker.db without blocking the app.")
+    parser.add_argument("--task", choices=TASKS, action="append", help="run this task now (default: whatever is due)")
+    parser.add_argument("--loop", action="store_true", help="keep running due tasks every 15 minutes")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="switch an existing db to incremental vacuum (one full VACUUM, blocks writers)")
+    args = parser.parse_args()
+    if args.loop and args.task:
+        parser.error("--loop follows the schedule, it can't be combined with --task")
+
+    if args.enable_incremental_vacuum:
+        run(["full_vacuum"])
+        return
+
+    while True:
+        runs = run(args.task)
+        if not args.loop:
+            if not runs:
+                print("No maintenance due.")
+            return
+        time.sleep(POLL_SECONDS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from collections import OrderedDict
+from threading import Lock
+
+# menu_cache.py used for caching rendered menu fragments shared by every visitor of the same menu.
+# keys always include the scrape generation, so a new successful scrape run makes old entries unreachable
+# and they just age out of the LRU.
+
+MAX_ENTRIES = 512
+
+_entries = OrderedDict()
+_lock = Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def get(key):
+    with _lock:
+        if key not in _entries:
+            stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        stats["hits"] += 1
+        return _entries[key]
+
+def put(key, value):
+    with _lock:
+        _entries[key] = value
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+def clear():
+    with _lock:
+        _entries.clear()
+        stats["hits"] = stats["misses"] = 0
@@ -0,0 +1,261 @@
+import argparse
+import mmap
+import os
+import sqlite3
+import struct
+import time
+from contextlib import closing
+from datetime import date, timedelta
+from threading import Lock
+
+import records
+
+# menu_snapshot.py used for sharing the near-term menus (yesterday through next week) between the
+# web workers without asking sqlite. the scraper publishes them after every run as one read-only
+# binary file; each worker mmaps it, so the pages are shared through the os page cache instead of
+# copied into every process, and database.py serves menu reads for covered dates straight from it.
+# a new snapshot is written next to the old one and os.replace'd over it, workers notice the new
+# file (checked at most once a second) and switch to it in one step, so a read never mixes two.
+#   python menu_snapshot.py           (publish now, e.g. after restoring a backup)
+#   python menu_snapshot.py --stats
+#
+# layout, little-endian, sections in this order right after the header:
+#   string offsets  (strings + 1) x u32 into the string blob
+#   string blob     utf-8
+#   foods           id, name, serving_size (string ids), calories, protein, carbs, fat (f64)
+#   items           food index, station (string id), menu id, sorted like get_menu_for_date
+#   dates           date (string id), scrape generation, first item, item count
+#   meals           date, hall, meal (string ids), first item, item count
+
+SNAPSHOT_PATH = "menu_snapshot.bin"
+DAYS_BACK = 1
+DAYS_AHEAD = 7
+CHECK_INTERVAL = 1.0 # seconds between checks for a newer file
+
+MAGIC = b"TEMS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQdIIIII") # magic, format, version, built_at, strings, foods, items, dates, meals
+OFFSET = struct.Struct("<I")
+FOOD = struct.Struct("<IIIdddd")
+ITEM = struct.Struct("<III")
+DATE = struct.Struct("<IIII")
+MEAL = struct.Struct("<IIIII")
+
+
+def format_date(day):
+    return f"{day.month}/{day.day}/{day.year}"
+
+def get_window(today=None):
+    today = today or date.today()
+    return [format_date(today + timedelta(days=offset)) for offset in range(-DAYS_BACK, DAYS_AHEAD + 1)]
+
+# ------------- WRITING ------------------------------------------
+def build(conn, dates):
+    # returns the snapshot bytes for dates (M/D/YYYY), read in one transaction so the menus and
+    # their generations agree
+    placeholders = ", ".join("?" for _ in dates)
+    conn.execute("BEGIN")
+    try:
+        rows = conn.execute(f"""
+            SELECT m.date, m.location, m.meal_type, m.station, f.id, f.name, f.serving_size,
+                   f.calories, f.protein, f.carbs, f.fat, m.id
+            FROM menus m
+            JOIN foods f ON m.food_id = f.id
+            WHERE m.date IN ({placeholders})
+            ORDER BY m.date, m.location, m.meal_type, m.station, f.name
+        """, dates).fetchall()
+        generations = dict(conn.execute(f"""
+            SELECT menu_date, MAX(id) FROM scrape_runs
+            WHERE menu_date IN ({placeholders}) AND status = 'success' GROUP BY menu_date
+        """, dates).fetchall()) # same generations as database.get_scrape_generation
+        version = conn.execute("SELECT COALESCE(MAX(id), 0) FROM scrape_runs").fetchone()[0]
+    finally:
+        conn.execute("COMMIT")
+
+    strings = {}
+    def string_id(value):
+        return strings.setdefault(value or "", len(strings))
+
+    foods = {} # food id -> index
+    food_records = []
+    items = []
+    date_records = {}
+    meal_records = []
+    for menu_date, hall, meal, station, food_id, name, serving_size, calories, protein, carbs, fat, menu_id in rows:
+        if food_id not in foods:
+            foods[food_id] = len(food_records)
+            food_records.append(FOOD.pack(
+                food_id, string_id(name), string_id(serving_size),
+                calories or 0.0, protein or 0.0, carbs or 0.0, fat or 0.0
+            ))
+        if menu_date not in date_records:
+            date_records[menu_date] = [len(items), 0]
+        date_records[menu_date][1] += 1
+        key = (menu_date, hall, meal)
+        if not meal_records or meal_records[-1][0] != key:
+            meal_records.append([key, len(items), 0])
+        meal_records[-1][2] += 1
+        items.append(ITEM.pack(foods[food_id], string_id(station), menu_id))
+
+    for menu_date in dates: # closed/unscraped days are covered too, as empty
+        date_records.setdefault(menu_date, [len(items), 0])
+    date_blob = b"".join(
+        DATE.pack(string_id(menu_date), generations.get(menu_date, 0), start, count)
+        for menu_date, (start, count) in date_records.items()
+    )
+    meal_blob = b"".join(
+        MEAL.pack(string_id(menu_date), string_id(hall), string_id(meal), start, count)
+        for (menu_date, hall, meal), start, count in meal_records
+    )
+
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    return b"".join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, version, time.time(), len(encoded), len(food_records),
+                    len(items), len(date_records), len(meal_records)),
+        b"".join(OFFSET.pack(offset) for offset in offsets),
+        b"".join(encoded),
+        b"".join(food_records),
+        b"".join(items),
+        date_blob,
+        meal_blob,
+    ])
+
+def publish(db_path="macro_tracker.db", path=SNAPSHOT_PATH, today=None):
+    # writes the snapshot for the current window and swaps it in, returns its size in bytes
+    with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+        data = build(conn, get_window(today))
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path) # readers see the old file or the new one, never half of one
+    return len(data)
+
+# ------------- READING ------------------------------------------
+class MenuSnapshot:
+    # one mapped snapshot file. only the small date/meal indexes are decoded up front, foods and
+    # strings are read out of the mapping when a menu is asked for
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self.map)
+
+        magic, format_version, self.version, self.built_at, strings, foods, items, dates, meals = HEADER.unpack_from(self.data)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} menu snapshot")
+
+        self.strings = [None] * strings
+        self.offsets_at = HEADER.size
+        self.blob_at = self.offsets_at + (strings + 1) * OFFSET.size
+        self.foods_at = self.blob_at + OFFSET.unpack_from(self.data, self.offsets_at + strings * OFFSET.size)[0]
+        self.items_at = self.foods_at + foods * FOOD.size
+        dates_at = self.items_at + items * ITEM.size
+        meals_at = dates_at + dates * DATE.size
+        if meals_at + meals * MEAL.size != len(self.data):
+            raise ValueError(f"{path} is truncated")
+
+        self.dates = {} # date -> (generation, first item, count)
+        for date_string, generation, start, count in DATE.iter_unpack(self.data[dates_at:meals_at]):
+            self.dates[self.string(date_string)] = (generation, start, count)
+        self.meals = {} # (date, hall, meal) -> (first item, count)
+        self.meal_types = {} # date -> meals served that day at any hall
+        for date_string, hall, meal, start, count in MEAL.iter_unpack(self.data[meals_at:meals_at + meals * MEAL.size]):
+            key = (self.string(date_string), self.string(hall), self.string(meal))
+            self.meals[key] = (start, count)
+            self.meal_types.setdefault(key[0], set()).add(key[2])
+
+    def string(self, string_id):
+        # decoded once per worker: menus repeat the same few hundred names and stations all day
+        value = self.strings[string_id]
+        if value is None:
+            start, end = struct.unpack_from("<II", self.data, self.offsets_at + string_id * OFFSET.size)
+            value = self.strings[string_id] = str(self.data[self.blob_at + start:self.blob_at + end], "utf-8")
+        return value
+
+    def item(self, index):
+        # (station, food id, name, serving_size, calories, protein, carbs, fat, menu id)
+        food_index, station, menu_id = ITEM.unpack_from(self.data, self.items_at + index * ITEM.size)
+        food_id, name, serving_size, calories, protein, carbs, fat = FOOD.unpack_from(self.data, self.foods_at + food_index * FOOD.size)
+        return (self.string(station), food_id, self.string(name), self.string(serving_size),
+                calories, protein, carbs, fat, menu_id)
+
+    def covers(self, menu_date):
+        return menu_date in self.dates
+
+    def get_generation(self, menu_date):
+        return self.dates[menu_date][0]
+
+    def has_meal(self, menu_date, meal):
+        return meal in self.meal_types.get(menu_date, ())
+
+    def get_foods_by_meal(self, meal, menu_date, hall):
+        # same shape as database.get_foods_by_meal
+        start, count = self.meals.get((menu_date, hall, meal), (0, 0))
+        grouped = {}
+        for index in range(start, start + count):
+            station, food_id, name, serving_size, calories, protein, carbs, fat, menu_id = self.item(index)
+            grouped.setdefault(station, []).append(records.MenuFood(
+                None, (food_id, name, serving_size, station, protein, carbs, fat, calories, menu_id)
+            ))
+        return grouped
+
+    def get_menu_for_date(self, menu_date):
+        # same rows as database.get_menu_for_date
+        rows = []
+        for (row_date, hall, meal), (start, count) in self.meals.items():
+            if row_date != menu_date:
+                continue
+            for index in range(start, start + count):
+                station, food_id, name, serving_size, calories, protein, carbs, fat, menu_id = self.item(index)
+                rows.append((hall, meal, station, food_id, name, serving_size, calories, protein, carbs, fat, menu_id))
+        return rows
+
+_current = None
+_checked_at = 0
+_lock = Lock()
+
+def get_snapshot(path=SNAPSHOT_PATH):
+    # the newest published snapshot, None if there is none (or it can't be read)
+    global _current, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < CHECK_INTERVAL:
+        return _current
+    with _lock:
+        if now - _checked_at < CHECK_INTERVAL:
+            return _current
+        _checked_at = now
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _current = None
+            return None
+        if _current is None or (stat.st_ino, stat.st_mtime_ns) != (_current.stat.st_ino, _current.stat.st_mtime_ns):
+            try:
+                _current = MenuSnapshot(path) # the old one is unmapped once the last reader drops it
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Couldn't load menu snapshot {path}: {e}")
+                _current = None
+        return _current
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the near-term menus as a memory-mapped snapshot.")
+    parser.add_argument("--stats", action="store_true", help="describe the current snapshot instead")
+    args = parser.parse_args()
+
+    if not args.stats:
+        size = publish()
+        print(f"Published {SNAPSHOT_PATH} ({size / 1024:.1f} KB)")
+    snapshot = MenuSnapshot(SNAPSHOT_PATH)
+    items = sum(count for _, _, count in snapshot.dates.values())
+    print(f"version {snapshot.version}, built {time.ctime(snapshot.built_at)}: {len(snapshot.dates)} days, "
+          f"{len(snapshot.meals)} hall meals, {items} menu items, {len(snapshot.data) / 1024:.1f} KB")
+
+if __name__ == "__main__":
+    main()
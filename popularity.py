@@ -0,0 +1,106 @@
+import argparse
+import math
+from datetime import datetime
+
+import database
+
+# popularity.py used for keeping the popularity counters (food_popularity, station_popularity)
+# rolling. database.log_food adds 1 to a food's score_1d/score_7d, this decays them exponentially
+# so each one tracks about the last day/week of logs (a steady 10 logs a day settles at ~10 and
+# ~70). run it every hour or so from cron; it decays by the time since the last run, so a missed
+# run just means a bigger step next time.
+#   python popularity.py
+#   python popularity.py --rebuild   (recount everything from food_logs, e.g. on an existing db)
+
+WINDOWS_HOURS = {"score_1d": 24, "score_7d": 24 * 7}
+MIN_SCORE = 0.01 # scores decayed below this are zeroed instead of shrinking forever
+
+
+def get_log_weight(date_str, window, now):
+    # what one log dated date_str still adds to a score with this window (hours) at now. logs only
+    # know their menu date, so each one counts as logged at noon that day
+    logged_at = datetime.strptime(date_str, "%m/%d/%Y").replace(hour=12)
+    return math.exp(-max((now - logged_at).total_seconds() / 3600, 0) / window)
+
+def get_factors(hours):
+    return {column: math.exp(-hours / window) for column, window in WINDOWS_HOURS.items()}
+
+def decay(now=None):
+    # returns the hours decayed by (0 on the first run, which only starts the clock)
+    now = now or datetime.now()
+    with database.get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE") # log_food can't slip a +1 in between the read and the update
+        row = conn.execute("SELECT decayed_at FROM popularity_decay WHERE id = 1").fetchone()
+        hours = (now - datetime.fromisoformat(row[0])).total_seconds() / 3600 if row else 0
+        if hours > 0:
+            factors = get_factors(hours)
+            for table in ("food_popularity", "station_popularity"):
+                conn.execute(f"""
+                    UPDATE {table} SET
+                        score_1d = CASE WHEN score_1d * :score_1d < {MIN_SCORE} THEN 0 ELSE score_1d * :score_1d END,
+                        score_7d = CASE WHEN score_7d * :score_7d < {MIN_SCORE} THEN 0 ELSE score_7d * :score_7d END
+                    WHERE score_1d > 0 OR score_7d > 0
+                """, factors)
+        conn.execute(
+            "INSERT OR REPLACE INTO popularity_decay (id, decayed_at) VALUES (1, ?)",
+            (now.isoformat(timespec="seconds"),)
+        )
+        conn.commit()
+    return max(hours, 0)
+
+def rebuild(now=None):
+    # recounts both tables from food_logs, each log weighted by get_log_weight. its station is
+    # looked up from the menu it was on (all stations serving that food at that meal when several
+    # halls had it; archived menus are skipped)
+    now = now or datetime.now()
+    with database.get_connection() as conn:
+        conn.create_function("decayed", 2, lambda date_str, window: get_log_weight(date_str, window, now), deterministic=True)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM food_popularity")
+        conn.execute("DELETE FROM station_popularity")
+        conn.execute("""
+            INSERT INTO food_popularity (food_id, logs, score_1d, score_7d, last_logged)
+            SELECT l.food_id, COUNT(*), SUM(decayed(l.date, :score_1d)), SUM(decayed(l.date, :score_7d)), NULL
+            FROM food_logs l
+            JOIN foods f ON f.id = l.food_id
+            GROUP BY l.food_id
+        """, WINDOWS_HOURS)
+        conn.execute("""
+            INSERT INTO station_popularity (location, station, logs, score_1d, score_7d, last_logged)
+            SELECT m.location, m.station, COUNT(*), SUM(decayed(l.date, :score_1d)), SUM(decayed(l.date, :score_7d)), NULL
+            FROM food_logs l
+            JOIN menus m ON m.food_id = l.food_id AND m.date = l.date AND m.meal_type = l.meal_type
+            GROUP BY m.location, m.station
+        """, WINDOWS_HOURS)
+        for table in ("food_popularity", "station_popularity"):
+            conn.execute(f"UPDATE {table} SET score_1d = 0 WHERE score_1d < {MIN_SCORE}")
+            conn.execute(f"UPDATE {table} SET score_7d = 0 WHERE score_7d < {MIN_SCORE}")
+        conn.execute(
+            "INSERT OR REPLACE INTO popularity_decay (id, decayed_at) VALUES (1, ?)",
+            (now.isoformat(timespec="seconds"),)
+        )
+        conn.commit()
+
+        return {
+            table: conn.execute(f"SELECT COUNT(*), COALESCE(SUM(logs), 0) FROM {table}").fetchone()
+            for table in ("food_popularity", "station_popularity")
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Decay (or rebuild) the food/station popularity counters.")
+    parser.add_argument("--rebuild", action="store_true", help="recount the counters from food_logs")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        for table, (rows, logs) in rebuild().items():
+            print(f"Rebuilt {table}: {rows} rows from {logs} logs")
+        return
+
+    hours = decay()
+    if hours:
+        print(f"Decayed popularity scores by {hours:.2f} hours")
+    else:
+        print("Started the popularity decay clock")
+
+if __name__ == "__main__":
+    main()
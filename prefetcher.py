@@ -0,0 +1,179 @@
+import argparse
+import heapq
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import scraper
+
+# prefetcher.py used for keeping the next few days of menus scraped ahead of time, so a student
+# looking at tomorrow's menu doesn't get an empty page. it loops forever picking the most urgent
+# date, scraping it, and staying under an hourly budget of requests to nutrition.umd.edu.
+#   python prefetcher.py --days 7 --budget 600
+#   python prefetcher.py --once   (scrape whatever is due now and exit, e.g. from cron)
+# priority: dates users asked for (scrape_requests, filled by the app) > never scraped dates in
+# the window, soonest first > stale dates, by how overdue they are and how close they are.
+
+DB_PATH = "macro_tracker.db"
+WINDOW_DAYS = 7
+REQUESTS_PER_HOUR = 600
+POLL_SECONDS = 60
+REQUEST_LOOKBACK_DAYS = 14 # how far back a user-requested date is still worth scraping
+RETRY_MINUTES = 30 # wait after a failed scrape before trying that date again
+DEFAULT_NEW_FOODS = 50 # label pages per hall assumed when there's no scrape history yet
+LOCATION_REFRESH_HOURS = 24
+
+# how old a scrape can get before it's refreshed, by days ahead (today changes the most)
+def get_refresh_hours(days_ahead):
+    if days_ahead <= 0:
+        return 2
+    if days_ahead == 1:
+        return 6
+    return 24
+
+def format_date(day):
+    return f"{day.month}/{day.day}/{day.year}"
+
+def parse_date(date_str):
+    return datetime.strptime(date_str, "%m/%d/%Y").date()
+
+# ------------- QUEUE --------------------------------------------
+def get_last_runs(conn, date_str):
+    # (last non-failed run, last run of any status) as datetimes or None
+    row = conn.execute("""
+        SELECT MAX(CASE WHEN status != 'failed' THEN ran_at END), MAX(ran_at)
+        FROM scrape_runs WHERE menu_date = ?
+    """, (date_str,)).fetchone()
+    return tuple(datetime.fromisoformat(ran_at) if ran_at else None for ran_at in row)
+
+def build_queue(conn, days, now=None):
+    # heap of (priority, date_str, reason), smallest priority is scraped first
+    now = now or datetime.now()
+    today = now.date()
+    queue = []
+
+    requested = conn.execute("SELECT date, requested_at FROM scrape_requests").fetchall()
+    for date_str, requested_at in requested:
+        try:
+            days_ahead = (parse_date(date_str) - today).days
+        except ValueError:
+            days_ahead = None
+        if days_ahead is None or not -REQUEST_LOOKBACK_DAYS <= days_ahead < days:
+            clear_request(conn, date_str) # outside what the site has menus for
+            continue
+        _, last_attempt = get_last_runs(conn, date_str)
+        if last_attempt and now - last_attempt < timedelta(minutes=RETRY_MINUTES):
+            continue
+        heapq.heappush(queue, ((0, requested_at), date_str, "requested"))
+
+    queued = {date_str for _, date_str, _ in queue}
+    for days_ahead in range(days):
+        date_str = format_date(today + timedelta(days=days_ahead))
+        if date_str in queued:
+            continue
+        last_success, last_attempt = get_last_runs(conn, date_str)
+        if last_attempt and now - last_attempt < timedelta(minutes=RETRY_MINUTES):
+            continue
+        if last_success is None:
+            heapq.heappush(queue, ((1, days_ahead), date_str, "missing"))
+            continue
+
+        # overdue ratio, discounted by distance: an hour-stale today beats a day-stale next week
+        age_hours = (now - last_success).total_seconds() / 3600
+        overdue = age_hours / get_refresh_hours(days_ahead)
+        if overdue >= 1:
+            heapq.heappush(queue, ((2, -overdue / (1 + days_ahead)), date_str, "stale"))
+
+    return queue
+
+def clear_request(conn, date_str):
+    conn.execute("DELETE FROM scrape_requests WHERE date = ?", (date_str,))
+    conn.commit()
+
+# ------------- BUDGET -------------------------------------------
+class RequestBudget:
+    # sliding one-hour window of the pages the scraper actually downloaded
+    def __init__(self, per_hour):
+        self.per_hour = per_hour
+        self.spent = deque() # (monotonic time, requests)
+
+    def used(self):
+        hour_ago = time.monotonic() - 3600
+        while self.spent and self.spent[0][0] < hour_ago:
+            self.spent.popleft()
+        return sum(requests for _, requests in self.spent)
+
+    def can_spend(self, estimate):
+        # a single scrape bigger than the whole budget still runs once the hour is empty
+        return self.used() + min(estimate, self.per_hour) <= self.per_hour
+
+    def record(self, requests):
+        self.spent.append((time.monotonic(), requests))
+
+def estimate_cost(conn):
+    # one menu page per hall plus a label page per new canonical food, averaged over recent runs
+    # (runs from before canonical foods fetched a label per new food)
+    row = conn.execute("""
+        SELECT AVG(COALESCE(labels_fetched, new_foods)) FROM (
+            SELECT labels_fetched, new_foods FROM scrape_runs WHERE status = 'success' ORDER BY id DESC LIMIT 10
+        )
+    """).fetchone()
+    halls = len(scraper.get_locations(DB_PATH))
+    new_foods = row[0] if row[0] is not None else DEFAULT_NEW_FOODS * halls
+    return halls + round(new_foods)
+
+# ------------- MAIN LOOP ----------------------------------------
+def run_next(conn, days, budget):
+    # scrapes the most urgent date, returns "done", "idle" (nothing due) or "budget"
+    queue = build_queue(conn, days)
+    if not queue:
+        return "idle"
+
+    estimate = estimate_cost(conn)
+    if not budget.can_spend(estimate):
+        return "budget"
+
+    _, date_str, reason = heapq.heappop(queue)
+    print(f"Prefetching {date_str} ({reason}, {len(queue)} more queued, {budget.used()}/{budget.per_hour} requests this hour)")
+    before = scraper.http_requests
+    status = scraper.run_scraper(date_str)
+    budget.record(scraper.http_requests - before)
+    if status in ("success", "closed"): # a failed run keeps its request, retried after RETRY_MINUTES
+        clear_request(conn, date_str)
+    return "done"
+
+def run(days=WINDOW_DAYS, per_hour=REQUESTS_PER_HOUR, once=False):
+    scraper.create_tables(DB_PATH)
+    budget = RequestBudget(per_hour)
+    discovered_at = None
+
+    with sqlite3.connect(DB_PATH) as conn:
+        while True:
+            # the location list barely changes, re-read it once a day (one request)
+            if discovered_at is None or time.monotonic() - discovered_at > LOCATION_REFRESH_HOURS * 3600:
+                before = scraper.http_requests
+                scraper.discover_locations(DB_PATH)
+                budget.record(scraper.http_requests - before)
+                discovered_at = time.monotonic()
+
+            result = run_next(conn, days, budget)
+            if result == "done":
+                continue
+            if once:
+                if result == "budget":
+                    print("Request budget used up, stopping.")
+                return
+            time.sleep(POLL_SECONDS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the next few days of menus scraped ahead of time.")
+    parser.add_argument("--days", type=int, default=WINDOW_DAYS, help="days to keep scraped, starting today")
+    parser.add_argument("--budget", type=int, default=REQUESTS_PER_HOUR, help="max requests to the menu site per hour")
+    parser.add_argument("--once", action="store_true", help="scrape what's due now and exit instead of looping")
+    args = parser.parse_args()
+
+    run(days=args.days, per_hour=args.budget, once=args.once)
+
+if __name__ == "__main__":
+    main()
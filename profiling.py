@@ -0,0 +1,183 @@
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# profiling.py used for per-request profiling: route latency plus the number, time and rows of the
+# sql statements database.py runs for it. statements slower than SLOW_QUERY_MS are printed with
+# their EXPLAIN QUERY PLAN. results are served at /metrics, to requests with an
+# "Authorization: Bearer <TERP_METRICS_TOKEN>" header, or when that isn't set only to requests made
+# on this machine (not forwarded by a proxy), everyone else gets a 404.
+# off unless TERP_PROFILE=1, when off database.py uses plain connections and the hooks return
+# right away.
+
+enabled = os.getenv("TERP_PROFILE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "50"))
+METRICS_TOKEN = os.getenv("TERP_METRICS_TOKEN")
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+RECENT_SAMPLES = 1000 # latencies kept per route for percentiles
+RECENT_SLOW_QUERIES = 50
+
+_lock = threading.Lock()
+_local = threading.local()
+routes = {} # "GET /menu" -> aggregate stats
+slow_queries = deque(maxlen=RECENT_SLOW_QUERIES)
+
+
+# ------------- SQL INSTRUMENTATION ------------------------------
+class ProfiledCursor(sqlite3.Cursor):
+    # sqlite runs a statement lazily (execute steps to the first row, fetch* steps the rest),
+    # so a statement's time is its execute plus every fetch on it
+    def _record(self, sql, parameters, start):
+        statements = getattr(_local, "statements", None)
+        if statements is None:
+            self._statement = None # not inside a profiled request (scraper, cli, warm-up)
+            return
+        self._statement = [sql, parameters, time.perf_counter() - start, 0]
+        statements.append(self._statement)
+
+    def _fetched(self, rows, start):
+        statement = getattr(self, "_statement", None)
+        if statement is not None:
+            statement[2] += time.perf_counter() - start
+            statement[3] += rows
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._record(sql, parameters, start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._record(sql, (), start)
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, start)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # Connection.execute would otherwise skip the cursor's execute
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ------------- FLASK HOOKS --------------------------------------
+def explain(db_path, sql, parameters):
+    try:
+        with sqlite3.connect(db_path) as conn:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        return [row[-1] for row in plan]
+    except sqlite3.Error as err:
+        return [f"(no plan: {err})"]
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def can_see_metrics(request):
+    if METRICS_TOKEN:
+        # compared as bytes: compare_digest raises TypeError on a non-ascii str
+        return hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode())
+    return request.remote_addr in LOCAL_ADDRESSES and "X-Forwarded-For" not in request.headers
+
+def init_app(app, db_path="macro_tracker.db"):
+    from flask import abort, g, jsonify, request
+
+    @app.before_request
+    def start_profile():
+        if not enabled:
+            return
+        g.profile_start = time.perf_counter()
+        _local.statements = []
+
+    @app.teardown_request
+    def finish_profile(exc=None):
+        statements = getattr(_local, "statements", None)
+        if statements is None or "profile_start" not in g:
+            return
+        _local.statements = None
+        elapsed_ms = (time.perf_counter() - g.profile_start) * 1000
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        sql_ms = sum(statement[2] for statement in statements) * 1000
+        rows = sum(statement[3] for statement in statements)
+
+        with _lock:
+            stats = routes.setdefault(route, {
+                "requests": 0, "total_ms": 0.0, "max_ms": 0.0, "sql_statements": 0, "sql_ms": 0.0,
+                "rows": 0, "recent_ms": deque(maxlen=RECENT_SAMPLES)
+            })
+            stats["requests"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["sql_statements"] += len(statements)
+            stats["sql_ms"] += sql_ms
+            stats["rows"] += rows
+            stats["recent_ms"].append(elapsed_ms)
+
+        # plans are looked up after the request is done so they don't count toward it
+        for sql, parameters, seconds, statement_rows in statements:
+            if seconds * 1000 < SLOW_QUERY_MS:
+                continue
+            plan = explain(db_path, sql, parameters)
+            slow_queries.append({
+                "route": route, "ms": round(seconds * 1000, 3), "rows": statement_rows,
+                "sql": " ".join(sql.split()), "plan": plan
+            })
+            print(f"Slow query ({seconds * 1000:.1f} ms, {statement_rows} rows) in {route}: {' '.join(sql.split())}")
+            for line in plan:
+                print(f"    {line}")
+
+    @app.route('/metrics')
+    def metrics():
+        if not can_see_metrics(request):
+            abort(404)
+        with _lock:
+            report = {}
+            for route, stats in routes.items():
+                requests = stats["requests"]
+                report[route] = {
+                    "requests": requests,
+                    "mean_ms": round(stats["total_ms"] / requests, 3),
+                    "p50_ms": round(percentile(stats["recent_ms"], 50), 3),
+                    "p95_ms": round(percentile(stats["recent_ms"], 95), 3),
+                    "max_ms": round(stats["max_ms"], 3),
+                    "sql_statements_per_request": round(stats["sql_statements"] / requests, 2),
+                    "sql_ms_per_request": round(stats["sql_ms"] / requests, 3),
+                    "rows_per_request": round(stats["rows"] / requests, 1),
+                }
+            return jsonify(
+                enabled=enabled,
+                slow_query_ms=SLOW_QUERY_MS,
+                routes=report,
+                slow_queries=list(slow_queries)
+            )
+
+def reset():
+    with _lock:
+        routes.clear()
+        slow_queries.clear()
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from sys import intern
+
+# records.py used for the rows database.py hands to the templates/api: small __slots__ classes
+# instead of one dict per row, with the text columns interned (sqlite hands back a new string per
+# cell, but names, stations and serving sizes repeat across thousands of rows). about half the
+# memory of the dicts on big results, see benchmarks/bench_records.py. templates read them the
+# same way (food.name) and jsonify serializes them like the dicts since they're dataclasses.
+# each class is its own sqlite3 row factory (cursor.row_factory = MenuFood), so a row becomes a
+# record in one call; the fields are in the order of the query's columns.
+
+
+@dataclass(slots=True, init=False)
+class MenuFood:
+    # SELECT f.id, f.name, f.serving_size, m.station, f.protein, f.carbs, f.fat, f.calories, m.id
+    id: int
+    name: str
+    serving_size: str
+    station: str
+    protein: float
+    carbs: float
+    fat: float
+    calories: float
+    menu_id: int
+
+    def __init__(self, cursor, row):
+        self.id, name, serving_size, station, self.protein, self.carbs, self.fat, self.calories, self.menu_id = row
+        self.name = intern(name)
+        self.serving_size = serving_size and intern(serving_size) # keeps None as None
+        self.station = station and intern(station)
+
+@dataclass(slots=True, init=False)
+class FoodLog:
+    # SELECT f.name, l.servings, <calories, protein, carbs, fat times servings>, l.meal_type,
+    # f.serving_size, l.id; the macros are rounded for display
+    name: str
+    servings: float
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    meal: str
+    serving_size: str
+    log_id: int
+
+    def __init__(self, cursor, row):
+        name, self.servings, calories, protein, carbs, fat, meal, serving_size, self.log_id = row
+        self.name = intern(name)
+        self.meal = intern(meal)
+        self.serving_size = serving_size and intern(serving_size) # keeps None as None
+        self.calories = round(calories, 1)
+        self.protein = round(protein, 1)
+        self.carbs = round(carbs, 1)
+        self.fat = round(fat, 1)
@@ -1,23 +1,40 @@
 from bs4 import BeautifulSoup
+import html
+import os
+import re
 import sqlite3
+from collections import deque
+from contextlib import closing
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import date, datetime, time
+from datetime import datetime
+from threading import Condition, Lock
+from time import monotonic
 import requests
 
+import canonical
+import menu_snapshot
+# dates, meal times and the default locations live in utils.py (shared with the web app)
+from utils import DEFAULT_DISPLAY_NAMES, DINING_HALL_ID_DICT, get_formatted_date, get_meal_type
+
 # scraper.py used for retrieving nutrition info from website and updating 'foods' and 'menus' table.
 
 BASE_URL = "https://nutrition.umd.edu/"
-DINING_HALL_ID_DICT = {
-    "South Campus": 16,
-    "Yahentamitsi Dining Hall": 19,
-    "251 North": 51
-}
 
 
+# adds a column that tables created by an older create_tables don't have
+def add_column(cursor, table, column, definition):
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
 # creates sqlite db (one time use) (DOESN'T HAVE MACRO_GOALS)
-def create_tables():
-    with sqlite3.connect('macro_tracker.db') as conn:
+def create_tables(db_path="macro_tracker.db"):
+    # closed explicitly: a lingering wal connection blocks a later journal_mode change (synthetic_data.py)
+    with closing(sqlite3.connect(db_path)) as conn:
         conn.execute('PRAGMA foreign_keys = ON')
+        # only takes on a new db (before the first table), existing ones switch with maintenance.py
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode = WAL') # readers keep reading while the scraper publishes
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -29,9 +46,22 @@ def create_tables():
                 carbs REAL DEFAULT 0.0,
                 fat REAL DEFAULT 0.0,
                 calories REAL DEFAULT 0.0,
-                serving_size TEXT DEFAULT ''
+                serving_size TEXT DEFAULT '',
+                canonical_id INTEGER REFERENCES canonical_foods(id)
         )
         """)
+        # one row per dish however many urls it's served under (recipe number + normalized name,
+        # see canonical.py), the scraper fetches one label per canonical food
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS canonical_foods (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipe TEXT NOT NULL,
+                name_key TEXT NOT NULL,
+                UNIQUE(recipe, name_key)
+        )
+        """)
+        add_column(cursor, "foods", "canonical_id", "INTEGER REFERENCES canonical_foods(id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_foods_canonical ON foods(canonical_id)")
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS menus (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,6 +74,7 @@ def create_tables():
                 UNIQUE(food_id, location, date, meal_type)
         )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_menus_date ON menus(date, location, meal_type)")
 
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS scrape_runs (
@@ -53,7 +84,115 @@ def create_tables():
                 status TEXT NOT NULL,
                 foods_found INTEGER DEFAULT 0,
                 new_foods INTEGER DEFAULT 0,
-                menu_rows INTEGER DEFAULT 0
+                menu_rows INTEGER DEFAULT 0,
+                labels_fetched INTEGER
+        )
+        """)
+        # NULL on runs from before canonical foods, when every new food was a label fetch
+        add_column(cursor, "scrape_runs", "labels_fetched", "INTEGER")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_runs_menu_date ON scrape_runs(menu_date)")
+
+        # every nutrient on a food's label (amount in unit), foods keeps the four macros the app shows
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS food_nutrients (
+                food_id INTEGER NOT NULL,
+                nutrient TEXT NOT NULL,
+                amount REAL NOT NULL,
+                unit TEXT NOT NULL,
+                PRIMARY KEY(food_id, nutrient),
+                FOREIGN KEY(food_id) REFERENCES foods(id) ON DELETE CASCADE
+        )
+        """)
+
+        # what each scrape run changed per (date, hall, meal), id is the /api/changes feed cursor.
+        # change is added/removed/moved/macros, old_value is the previous station (moved) or the
+        # previous "calories,protein,carbs,fat" (macros: a canonical food's label came back under a
+        # new url with other macros, see record_menu_changes)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS menu_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scrape_run_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                location TEXT NOT NULL,
+                meal_type TEXT NOT NULL,
+                change TEXT NOT NULL,
+                food_id INTEGER NOT NULL,
+                station TEXT,
+                old_value TEXT,
+                FOREIGN KEY(scrape_run_id) REFERENCES scrape_runs(id)
+        )
+        """)
+
+        # dining locations from the site's location list (discover_locations), seeded with the
+        # three halls so the app works before the first discovery. display_name is the dropdown label
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS locations (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                display_name TEXT,
+                active INTEGER NOT NULL DEFAULT 1,
+                last_seen TEXT
+        )
+        """)
+        cursor.executemany(
+            "INSERT OR IGNORE INTO locations (id, name, display_name) VALUES (?, ?, ?)",
+            [(location_num, name, DEFAULT_DISPLAY_NAMES.get(name)) for name, location_num in DINING_HALL_ID_DICT.items()]
+        )
+
+        # dates users asked for that haven't been scraped yet, prefetcher.py scrapes them first
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_requests (
+                date TEXT PRIMARY KEY,
+                requested_at TEXT NOT NULL
+        )
+        """)
+
+        # how often foods (and hall stations) get logged: logs is all-time, score_1d/score_7d are
+        # decaying counts that track roughly the last day/week. bumped by database.log_food in the
+        # same transaction as the log, decayed by popularity.py
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS food_popularity (
+                food_id INTEGER PRIMARY KEY,
+                logs INTEGER NOT NULL DEFAULT 0,
+                score_1d REAL NOT NULL DEFAULT 0,
+                score_7d REAL NOT NULL DEFAULT 0,
+                last_logged TEXT,
+                FOREIGN KEY(food_id) REFERENCES foods(id) ON DELETE CASCADE
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS station_popularity (
+                location TEXT NOT NULL,
+                station TEXT NOT NULL,
+                logs INTEGER NOT NULL DEFAULT 0,
+                score_1d REAL NOT NULL DEFAULT 0,
+                score_7d REAL NOT NULL DEFAULT 0,
+                last_logged TEXT,
+                PRIMARY KEY(location, station)
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS popularity_decay (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                decayed_at TEXT NOT NULL
+        )
+        """)
+
+        # client ids of logs the service worker queued offline and sent in a batch, so a batch
+        # that's retried (the response got lost) isn't logged twice. pruned by log_food_batch
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS offline_logs (
+                client_id TEXT PRIMARY KEY,
+                received_at TEXT NOT NULL
+        )
+        """)
+
+        # dates whose menus were moved to a per-semester archive file (archive.py)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archived_dates (
+                date TEXT PRIMARY KEY,
+                term TEXT NOT NULL,
+                archived_at TEXT NOT NULL
         )
         """)
 
@@ -100,26 +239,9 @@ def create_tables():
 
 
 # ------------- UTILITY FUNCTIONS --------------------------------
-def get_formatted_date():
-    today = date.today()
-    formatted_date = f"{today.month}/{today.day}/{today.year}"
-    return formatted_date
-
-# returns meal type (breakfast, lunch, or dinner) based on current time
-def get_meal_type():
-    breakfast_end = time(10, 30)
-    lunch_end = time(16, 0)
-    now = datetime.now().time()
-    
-    if now < breakfast_end:
-        return "breakfast"
-    elif now < lunch_end:
-        return "lunch"
-    else:
-        return "dinner"
-
-def get_menu_url(dining_hall, date_str=None):
-    if dining_hall not in DINING_HALL_ID_DICT:
+def get_menu_url(dining_hall, date_str=None, locations=None):
+    locations = locations or DINING_HALL_ID_DICT
+    if dining_hall not in locations:
         raise ValueError(f"{dining_hall} is not a valid dining hall.")
     
     if not date_str:
@@ -127,7 +249,7 @@ def get_menu_url(dining_hall, date_str=None):
     else:
         date = date_str
 
-    return f"{BASE_URL}?locationNum={DINING_HALL_ID_DICT[dining_hall]}&dtdate={date}"
+    return f"{BASE_URL}?locationNum={locations[dining_hall]}&dtdate={date}"
 
 def is_valid_menu(soup):
     text = soup.find("div", class_="tab-content")
@@ -153,8 +275,90 @@ def get_meal_id_map(soup):
 
     return meal_id_map
 
+# ------------- LOCATIONS ----------------------------------------
+# the site's location list is cached in the 'locations' table by discover_locations(), the scraper
+# and the web ui read it from there. DINING_HALL_ID_DICT is the seed/fallback when it can't be read.
+def parse_locations(soup):
+    # {name: location number} from the home page's location dropdown, or its links as a fallback
+    locations = {}
+    for select in soup.find_all("select"):
+        if "location" not in f"{select.get('id', '')} {select.get('name', '')}".lower():
+            continue
+        for option in select.find_all("option"):
+            value = option.get("value", "").strip()
+            name = option.text.strip()
+            if value.isdigit() and name:
+                locations[name] = int(value)
+
+    if not locations:
+        for link in soup.find_all("a", href=True):
+            match = re.search(r"locationNum=(\d+)", link["href"])
+            if match and link.text.strip():
+                locations[link.text.strip()] = int(match.group(1))
+    return locations
+
+def discover_locations(db_path="macro_tracker.db"):
+    # refreshes the locations table from the site, returns the active {name: location number}
+    try:
+        found = parse_locations(BeautifulSoup(fetch_page(BASE_URL), "html.parser"))
+    except requests.RequestException as e:
+        print(f"Couldn't load the location list: {e}")
+        found = {}
+    if not found:
+        print("No locations found on the site, keeping the saved list.")
+        return get_locations(db_path)
+
+    seen_at = datetime.now().isoformat()
+    with sqlite3.connect(db_path) as conn:
+        # name is what menus.location stores, so it never changes once saved: a location the site
+        # renamed keeps its name and shows the new one as its display_name, and a name the site
+        # moved to another location number takes its row along to the new number
+        for name, location_num in found.items():
+            if conn.execute("SELECT 1 FROM locations WHERE id = ?", (location_num,)).fetchone():
+                conn.execute("""
+                    UPDATE locations SET active = 1, last_seen = ?,
+                        display_name = CASE WHEN name = ? THEN display_name ELSE ? END
+                    WHERE id = ?
+                """, (seen_at, name, name, location_num))
+            elif conn.execute("SELECT 1 FROM locations WHERE name = ?", (name,)).fetchone():
+                conn.execute("UPDATE locations SET id = ?, active = 1, last_seen = ? WHERE name = ?", (location_num, seen_at, name))
+            else:
+                conn.execute("INSERT INTO locations (id, name, active, last_seen) VALUES (?, ?, 1, ?)", (location_num, name, seen_at))
+        # gone from the site's list: hidden from the ui and not scraped, old menus stay
+        conn.execute("UPDATE locations SET active = 0 WHERE last_seen IS NULL OR last_seen < ?", (seen_at,))
+        conn.commit()
+
+    print(f"Found {len(found)} locations.")
+    return get_locations(db_path)
+
+def get_locations(db_path="macro_tracker.db"):
+    try:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT name, id FROM locations WHERE active = 1 ORDER BY id").fetchall()
+    except sqlite3.OperationalError: # db created before locations existed
+        rows = []
+    return dict(rows) or dict(DINING_HALL_ID_DICT)
+
+# per page (connect, read) and per location (its menu page + new labels) timeouts, in seconds
+REQUEST_TIMEOUT = (5, 30)
+LOCATION_TIMEOUT = int(os.getenv("SCRAPE_LOCATION_TIMEOUT", "300"))
+
+# every page the scraper downloads goes through here, http_requests counts them (prefetcher.py's budget)
+http_requests = 0
+_http_requests_lock = Lock()
+# swapped by transport.py to record a run's responses or replay them offline
+http_get = requests.get
+
+def fetch_page(url):
+    global http_requests
+    with _http_requests_lock:
+        http_requests += 1
+    response = http_get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status() # a 5xx page isn't a menu/label, and it's the limiter's cue to back off
+    return response.text
+
 # ------------- DB HELPERS ---------------------------------------
-# gets all existing urls in the master foods table (used to compare )
+# gets all existing urls in the master foods table (used to compare against a scraped menu)
 def get_existing_urls():
     with sqlite3.connect("macro_tracker.db") as conn:
         conn.row_factory = sqlite3.Row
@@ -213,6 +417,377 @@ def log_scrape_run(menu_date, ran_at, status, foods_found, new_foods, menu_rows)
         ))
         conn.commit()
 
+# ------------- STAGING ------------------------------------------
+# a run is scraped into an in-memory staging db attached to the publishing connection, then
+# published to the live tables in one short transaction (publish_staged), so readers only ever
+# see the old or the new complete menu and the write lock is held for milliseconds.
+def create_staging_tables(conn):
+    conn.execute("ATTACH DATABASE ':memory:' AS staging")
+    conn.execute("""
+    CREATE TABLE staging.foods (
+            url TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            recipe TEXT NOT NULL,
+            name_key TEXT NOT NULL,
+            labeled INTEGER NOT NULL, -- 0: no label fetched, macros come from its canonical food
+            protein REAL,
+            carbs REAL,
+            fat REAL,
+            calories REAL,
+            serving_size TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE staging.menus (
+            url TEXT NOT NULL,
+            location TEXT NOT NULL,
+            station TEXT NOT NULL,
+            date TEXT NOT NULL,
+            meal_type TEXT NOT NULL,
+            PRIMARY KEY(url, location, date, meal_type)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE staging.food_nutrients (
+            url TEXT NOT NULL,
+            nutrient TEXT NOT NULL,
+            amount REAL NOT NULL,
+            unit TEXT NOT NULL,
+            PRIMARY KEY(url, nutrient)
+    )
+    """)
+    # this run's diff, copied to menu_changes once the scrape run has an id
+    conn.execute("""
+    CREATE TABLE staging.changes (
+            location TEXT NOT NULL,
+            meal_type TEXT NOT NULL,
+            change TEXT NOT NULL,
+            food_id INTEGER NOT NULL,
+            station TEXT,
+            old_value TEXT
+    )
+    """)
+    # halls that had a valid menu this run, their live menus get replaced
+    conn.execute("CREATE TABLE staging.halls (location TEXT PRIMARY KEY)")
+
+def stage_labels(conn, foods_with_macros):
+    # replaces an unlabeled row of the same url (a label fetched by retry_orphaned_labels)
+    conn.executemany("""
+        INSERT OR REPLACE INTO staging.foods (url, name, recipe, name_key, labeled, protein, carbs, fat, calories, serving_size)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+    """, [
+        (f["url"], f["name"], *f["canonical_key"], f["protein"], f["carbs"], f["fat"], f["calories"], f["serving_size"])
+        for f in foods_with_macros
+    ])
+    conn.executemany("""
+        INSERT OR IGNORE INTO staging.food_nutrients (url, nutrient, amount, unit) VALUES (?, ?, ?, ?)
+    """, [
+        (f["url"], nutrient, amount, unit)
+        for f in foods_with_macros for nutrient, (amount, unit) in f["nutrients"].items()
+    ])
+
+def stage_hall(conn, hall, foods, new_foods, foods_with_macros):
+    conn.execute("INSERT OR IGNORE INTO staging.halls (location) VALUES (?)", (hall,))
+    stage_labels(conn, foods_with_macros)
+    # the rest of the new urls, filled in from their canonical food's label by publish_staged
+    conn.executemany("""
+        INSERT OR IGNORE INTO staging.foods (url, name, recipe, name_key, labeled) VALUES (?, ?, ?, ?, 0)
+    """, [(f["url"], f["name"], *f["canonical_key"]) for f in new_foods])
+    conn.executemany("""
+        INSERT OR IGNORE INTO staging.menus (url, location, station, date, meal_type)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(f["url"], f["dining_hall"], f["station"], f["date"], f["meal"]) for f in foods])
+
+def record_menu_changes(conn, date_str):
+    # diff of the staged halls' menus against what's live, as set differences over
+    # (food, hall, meal) keys: staged - live = added, live - staged = removed, and keys in both
+    # with a different station = moved. an added and a removed food of one canonical food at the
+    # same hall and meal (its label came back under a new url) with different macros is one
+    # macros change instead of the pair
+    for table in ("new_menu", "old_menu", "added", "removed", "relabeled"):
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+    conn.execute("""
+        CREATE TEMP TABLE new_menu AS
+        SELECT f.id AS food_id, s.location, s.meal_type, s.station, f.canonical_id, f.calories, f.protein, f.carbs, f.fat
+        FROM staging.menus s JOIN main.foods f ON f.url = s.url
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE old_menu AS
+        SELECT m.food_id, m.location, m.meal_type, m.station, f.canonical_id, f.calories, f.protein, f.carbs, f.fat
+        FROM main.menus m JOIN main.foods f ON f.id = m.food_id
+        WHERE m.date = ? AND m.location IN (SELECT location FROM staging.halls)
+    """, (date_str,))
+    conn.execute("""
+        CREATE TEMP TABLE added AS
+        SELECT n.* FROM (
+            SELECT food_id, location, meal_type FROM temp.new_menu
+            EXCEPT
+            SELECT food_id, location, meal_type FROM temp.old_menu
+        ) k JOIN temp.new_menu n USING (food_id, location, meal_type)
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE removed AS
+        SELECT o.* FROM (
+            SELECT food_id, location, meal_type FROM temp.old_menu
+            EXCEPT
+            SELECT food_id, location, meal_type FROM temp.new_menu
+        ) k JOIN temp.old_menu o USING (food_id, location, meal_type)
+    """)
+    # one pair per canonical food, hall and meal (sqlite takes the bare columns from one row)
+    conn.execute("""
+        CREATE TEMP TABLE relabeled AS
+        SELECT a.food_id, a.location, a.meal_type, a.station, r.food_id AS old_food_id,
+               r.calories || ',' || r.protein || ',' || r.carbs || ',' || r.fat AS old_value
+        FROM temp.added a JOIN temp.removed r
+          ON r.location = a.location AND r.meal_type = a.meal_type AND r.canonical_id = a.canonical_id
+        WHERE (a.calories, a.protein, a.carbs, a.fat) IS NOT (r.calories, r.protein, r.carbs, r.fat)
+        GROUP BY a.location, a.meal_type, a.canonical_id
+    """)
+
+    conn.execute("""
+        INSERT INTO staging.changes (location, meal_type, change, food_id, station)
+        SELECT location, meal_type, 'added', food_id, station FROM temp.added a
+        WHERE NOT EXISTS (
+            SELECT 1 FROM temp.relabeled p
+            WHERE p.food_id = a.food_id AND p.location = a.location AND p.meal_type = a.meal_type
+        )
+    """)
+    conn.execute("""
+        INSERT INTO staging.changes (location, meal_type, change, food_id, station)
+        SELECT location, meal_type, 'removed', food_id, station FROM temp.removed r
+        WHERE NOT EXISTS (
+            SELECT 1 FROM temp.relabeled p
+            WHERE p.old_food_id = r.food_id AND p.location = r.location AND p.meal_type = r.meal_type
+        )
+    """)
+    conn.execute("""
+        INSERT INTO staging.changes (location, meal_type, change, food_id, station, old_value)
+        SELECT location, meal_type, 'macros', food_id, station, old_value FROM temp.relabeled
+    """)
+    conn.execute("""
+        INSERT INTO staging.changes (location, meal_type, change, food_id, station, old_value)
+        SELECT n.location, n.meal_type, 'moved', n.food_id, n.station, o.station
+        FROM temp.new_menu n JOIN temp.old_menu o USING (food_id, location, meal_type)
+        WHERE n.station != o.station
+    """)
+    for table in ("new_menu", "old_menu", "added", "removed", "relabeled"):
+        conn.execute(f"DROP TABLE temp.{table}")
+
+def retry_orphaned_labels(conn, limiter):
+    # only the location that claims a canonical food fetches its label. when that fetch failed (or
+    # the location timed out), its staged siblings at other locations have nothing to copy from,
+    # so one of their urls is fetched here instead of dropping them. returns labels fetched
+    orphans = [
+        {"url": url, "name": name, "canonical_key": (recipe, name_key)}
+        for url, name, recipe, name_key in conn.execute("""
+            SELECT MIN(url), name, recipe, name_key FROM staging.foods s
+            WHERE NOT labeled
+              AND NOT EXISTS (
+                  SELECT 1 FROM staging.foods l WHERE l.labeled AND l.recipe = s.recipe AND l.name_key = s.name_key
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM main.canonical_foods c JOIN main.foods f ON f.canonical_id = c.id
+                  WHERE c.recipe = s.recipe AND c.name_key = s.name_key
+              )
+            GROUP BY recipe, name_key
+        """).fetchall()
+    ]
+    if orphans:
+        print(f"Fetching {len(orphans)} labels the claiming location didn't get")
+        stage_labels(conn, fetch_macros_for_new(orphans, limiter, monotonic() + LOCATION_TIMEOUT))
+    return len(orphans)
+
+def fill_unlabeled(conn):
+    # macros for staged urls without a label of their own: from a url of the same canonical food
+    # labeled this run, else from one already live. ones with neither (the retry in
+    # retry_orphaned_labels failed too) aren't published and come back as new next run. returns
+    # how many were filled
+    conn.execute("""
+        UPDATE staging.foods SET protein = l.protein, carbs = l.carbs, fat = l.fat,
+                                 calories = l.calories, serving_size = l.serving_size
+        FROM staging.foods AS l
+        WHERE NOT foods.labeled AND l.labeled
+          AND l.recipe = foods.recipe AND l.name_key = foods.name_key
+    """)
+    conn.execute("""
+        UPDATE staging.foods SET protein = f.protein, carbs = f.carbs, fat = f.fat,
+                                 calories = f.calories, serving_size = f.serving_size
+        FROM main.canonical_foods c JOIN main.foods f ON f.canonical_id = c.id
+        WHERE NOT foods.labeled AND foods.calories IS NULL
+          AND c.recipe = foods.recipe AND c.name_key = foods.name_key
+    """)
+    conn.execute("DELETE FROM staging.foods WHERE calories IS NULL")
+    return conn.execute("SELECT COUNT(*) FROM staging.foods WHERE NOT labeled").fetchone()[0]
+
+def publish_staged(conn, date_str, ran_at, foods_found, new_foods, labels_fetched):
+    # returns the number of menu rows added, the scrape run is logged in the same transaction
+    # so caches keyed by scrape generation flip exactly when the new menu becomes visible
+    status = "success" if foods_found else "closed"
+    start = datetime.now()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        copied = fill_unlabeled(conn)
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO main.canonical_foods (recipe, name_key)
+            SELECT DISTINCT recipe, name_key FROM staging.foods
+        """)
+        new_canonical = cursor.rowcount
+        conn.execute("""
+            INSERT OR IGNORE INTO main.foods (name, url, protein, carbs, fat, calories, serving_size, canonical_id)
+            SELECT s.name, s.url, s.protein, s.carbs, s.fat, s.calories, s.serving_size, c.id
+            FROM staging.foods s JOIN main.canonical_foods c ON c.recipe = s.recipe AND c.name_key = s.name_key
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO main.food_nutrients (food_id, nutrient, amount, unit)
+            SELECT f.id, n.nutrient, n.amount, n.unit
+            FROM staging.food_nutrients n JOIN main.foods f ON f.url = n.url
+        """)
+        # the unlabeled urls get the full label of a food sharing their canonical food
+        conn.execute("""
+            INSERT OR IGNORE INTO main.food_nutrients (food_id, nutrient, amount, unit)
+            SELECT f.id, n.nutrient, n.amount, n.unit
+            FROM staging.foods s
+            JOIN main.foods f ON f.url = s.url
+            JOIN main.foods l ON l.canonical_id = f.canonical_id AND l.id != f.id
+            JOIN main.food_nutrients n ON n.food_id = l.id
+            WHERE NOT s.labeled
+        """)
+        record_menu_changes(conn, date_str)
+        # items no longer on a re-scraped hall's menu
+        conn.execute("""
+            DELETE FROM main.menus
+            WHERE date = ?
+              AND location IN (SELECT location FROM staging.halls)
+              AND NOT EXISTS (
+                  SELECT 1 FROM staging.menus s JOIN main.foods f ON f.url = s.url
+                  WHERE f.id = menus.food_id AND s.location = menus.location
+                    AND s.date = menus.date AND s.meal_type = menus.meal_type
+              )
+        """, (date_str,))
+        # items that moved station
+        conn.execute("""
+            UPDATE main.menus SET station = s.station
+            FROM staging.menus s JOIN main.foods f ON f.url = s.url
+            WHERE menus.food_id = f.id AND menus.location = s.location
+              AND menus.date = s.date AND menus.meal_type = s.meal_type
+              AND menus.station != s.station
+        """)
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO main.menus (food_id, location, station, date, meal_type)
+            SELECT f.id, s.location, s.station, s.date, s.meal_type
+            FROM staging.menus s JOIN main.foods f ON f.url = s.url
+        """)
+        menu_rows = cursor.rowcount
+        cursor = conn.execute("""
+            INSERT INTO main.scrape_runs (menu_date, ran_at, status, foods_found, new_foods, menu_rows, labels_fetched)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (date_str, ran_at, status, foods_found, new_foods, menu_rows, labels_fetched))
+        conn.execute("""
+            INSERT INTO main.menu_changes (scrape_run_id, date, location, meal_type, change, food_id, station, old_value)
+            SELECT ?, ?, location, meal_type, change, food_id, station, old_value FROM staging.changes
+            ORDER BY location, meal_type, change, food_id
+        """, (cursor.lastrowid, date_str))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    held_ms = (datetime.now() - start).total_seconds() * 1000
+    print(f"Published {menu_rows} new menu rows for {date_str} ({held_ms:.1f} ms write lock)")
+    if new_foods:
+        print(f"{new_foods} new foods are {new_canonical} new canonical foods, {copied} took an existing label "
+              f"({labels_fetched} label fetches instead of {new_foods})")
+    return menu_rows
+
+# ------------- CONCURRENCY --------------------------------------
+# label pages are fetched in parallel, how many at once is decided by AdaptiveLimiter (AIMD like
+# tcp): the limit doubles each round until the site first pushes back, then grows by 1 per round
+# of successful fetches. it's halved on a 429/503/timeout, when the smoothed latency climbs past
+# LATENCY_TOLERANCE x the latency of the last ~50 fetches (a slower moving average, so a site that
+# just got slower for good isn't held to how fast it once was), or when other errors pass
+# ERROR_TOLERANCE of recent fetches. so a struggling nutrition.umd.edu gets fewer requests and a
+# fast one gets more.
+# bounds can be set with SCRAPE_MIN_CONCURRENCY/SCRAPE_MAX_CONCURRENCY.
+MIN_CONCURRENCY = int(os.getenv("SCRAPE_MIN_CONCURRENCY", "2"))
+MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "16"))
+START_CONCURRENCY = 4
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.2 # weight of the newest fetch in the moving average
+BASELINE_SMOOTHING = 0.02 # same, for the baseline that average is compared against
+ERROR_TOLERANCE = 0.15
+ERROR_WINDOW = 20 # fetches the error rate is taken over
+BACKOFF_FACTOR = 0.5
+
+class AdaptiveLimiter:
+    def __init__(self, floor=None, ceiling=None, start=START_CONCURRENCY):
+        self.floor = max(1, floor or MIN_CONCURRENCY)
+        self.ceiling = max(self.floor, ceiling or MAX_CONCURRENCY)
+        self.limit = float(min(max(start, self.floor), self.ceiling))
+        self.in_flight = 0
+        self.avg_latency = None
+        self.base_latency = None
+        self.outcomes = deque(maxlen=ERROR_WINDOW) # True for each failed fetch
+        self.last_backoff = 0.0
+        self.slow_start = True # grow fast until the site first pushes back
+        self.history = [] # (seconds since start, limit) every time the limit changes
+        self.started = monotonic()
+        self.condition = Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            return monotonic()
+
+    def release(self, started, ok, overloaded=False):
+        latency = monotonic() - started
+        with self.condition:
+            self.in_flight -= 1
+            self.outcomes.append(not ok)
+            if ok:
+                if self.avg_latency is None:
+                    self.avg_latency = self.base_latency = latency
+                self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+                self.base_latency += BASELINE_SMOOTHING * (latency - self.base_latency)
+            # one failure in a big batch is noise, several in a row means the site is struggling
+            erroring = not ok and sum(self.outcomes) >= max(2, ERROR_TOLERANCE * ERROR_WINDOW)
+            slow = self.avg_latency is not None and self.avg_latency > self.base_latency * LATENCY_TOLERANCE
+            congested = overloaded or erroring or slow
+
+            if congested:
+                # requests sent before the last backoff were sent at the old limit, only back off once per round
+                if started >= self.last_backoff:
+                    self.set_limit(max(self.floor, self.limit * BACKOFF_FACTOR))
+                    self.last_backoff = monotonic()
+                    self.slow_start = False
+            elif ok:
+                self.set_limit(min(self.ceiling, self.limit + (1 if self.slow_start else 1 / self.limit)))
+            self.condition.notify_all()
+
+    def set_limit(self, limit):
+        if int(limit) != int(self.limit):
+            self.history.append((round(monotonic() - self.started, 3), int(limit)))
+        self.limit = limit
+
+    def call(self, func, *args):
+        started = self.acquire()
+        try:
+            result = func(*args)
+        except (requests.ConnectionError, requests.Timeout):
+            self.release(started, ok=False, overloaded=True)
+            raise
+        except requests.HTTPError as e:
+            # the site saying it's overloaded counts right away, other errors only when they pile up
+            self.release(started, ok=False, overloaded=e.response is not None and e.response.status_code in (429, 503))
+            raise
+        except Exception:
+            self.release(started, ok=False)
+            raise
+        self.release(started, ok=True)
+        return result
+
 # ------------- SCRAPING  ----------------------------------------
 
 def get_all_foods(soup, date, dining_hall):
@@ -262,10 +837,12 @@ def get_all_foods(soup, date, dining_hall):
     
     return foods
 
-def fetch_macros_for_new(new_foods):
+def fetch_macros_for_new(new_foods, limiter=None, deadline=None):
+    limiter = limiter or AdaptiveLimiter()
     results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_food = {executor.submit(get_macros, f["url"]): f for f in new_foods}
+    # the pool is sized for the ceiling, the limiter decides how many of those threads are fetching
+    with ThreadPoolExecutor(max_workers=limiter.ceiling) as executor:
+        future_to_food = {executor.submit(get_macros, f["url"], limiter, deadline): f for f in new_foods}
         for future in as_completed(future_to_food):
             f = future_to_food[future]
             try:
@@ -275,88 +852,256 @@ def fetch_macros_for_new(new_foods):
                 print(f"Error fetching macros for {f['name']}: {e}")
     return results
 
-def get_macros(url):
-    result = requests.get(url)
-    soup = BeautifulSoup(result.text, "html.parser")
-
-    # get name
-    name = soup.find("h2").text.strip() if soup.find("h2") else None
-    # get serving size
-    serving_sizes = soup.find_all("div", class_="nutfactsservsize")
-    serving_size = serving_sizes[1].text.strip().lower() if len(serving_sizes) > 1 else None 
-    # get macros
-    protein = None
-    carbs = None
-    fat = None
-    calories = None
-
-    nutrition_facts = soup.find_all(class_="nutfactstopnutrient")
-    for fact in nutrition_facts:
-        text = fact.text.lower().replace("\xa0", " ").strip()
-        if "protein" in text:
-            try:
-                protein = float(text.split()[1].replace("g", ""))
-            except:
-                pass
-        elif "total carbohydrate" in text:
-            try:
-                carbs = float(text.split()[2].replace("g", ""))
-            except:
-                pass
-        elif "total fat" in text:
-            try:
-                fat = float(text.split()[2].replace("g", ""))
-            except:
-                pass
-        elif "calories" in text and calories == None:
+def get_macros(url, limiter=None, deadline=None):
+    if deadline is not None and monotonic() > deadline:
+        raise TimeoutError("location timed out before this label was fetched")
+    # only the download is limited/timed, parsing is cpu and says nothing about the site
+    page = limiter.call(fetch_page, url) if limiter else fetch_page(url)
+    label = parse_label(page)
+
+    if label["unparsed"]:
+        print(f"Unrecognized label lines for {label['name']}: {label['unparsed']}")
+    print(f"Scraped macros for {label['name']}.")
+    return {
+        "name": label["name"],
+        "url": url,
+        "serving_size": label["serving_size"] or "",
+        "protein": label["nutrients"]["protein"][0],
+        "carbs": label["nutrients"]["total_carbohydrate"][0],
+        "fat": label["nutrients"]["total_fat"][0],
+        "calories": label["nutrients"]["calories"][0],
+        "nutrients": label["nutrients"]
+    }
+
+# ------------- LABEL PARSING ------------------------------------
+# a regex scan over the raw label html (no soup) for the food name (h2), the serving size (second
+# nutfactsservsize element) and every nutfactstopnutrient element, whatever their tag, attribute
+# order or nested markup. a nutrient reads like "Total Fat 8g", "Sodium 480mg", "Calories 250",
+# "Vitamin A 10%" or "Includes 2g Added Sugars"; bare "12%" ones are the % daily value column and
+# are skipped. "<1g" is stored as 0: the label rounds anything under 1g down to it.
+# a label missing one of the four macros raises LabelParseError instead of storing zeros.
+REQUIRED_NUTRIENTS = ("calories", "total_fat", "total_carbohydrate", "protein")
+LABEL_CLASSES = {"nutfactsservsize": "serving", "nutfactstopnutrient": "nutrient"}
+
+# an element worth a look: any h2, or a tag with "nutfacts" somewhere in its attributes, up to the
+# first closing tag of its name (iter_label_elements looks further when there's a nested one)
+ELEMENT_PATTERN = re.compile(r"""
+    <(?P<tag>h2\b|[a-z][a-z0-9]*+(?=[^>]*?nutfacts))(?P<attrs>[^>]*)>
+    (?P<inner>.*?)</(?P=tag)\s*>
+""", re.IGNORECASE | re.DOTALL | re.VERBOSE)
+CLASS_PATTERN = re.compile(r"""(?:^|\s)class\s*=\s*(?:"(?P<double>[^"]*)"|'(?P<single>[^']*)'|(?P<bare>[^\s"'>]+))""", re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+NUTRIENT_PATTERN = re.compile(r"""
+    ^(?P<name>[a-z][a-z ,.()/-]*?)\s*(?P<less_than><)?\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>kcal|mcg|mg|g|iu|%)?$
+""", re.VERBOSE)
+INCLUDES_PATTERN = re.compile(r"^includes\s*(?P<less_than><)?\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>mcg|mg|g)\s+(?P<name>[a-z][a-z ]*)$")
+PERCENT_PATTERN = re.compile(r"^<?\s*\d+(?:\.\d+)?\s*%$")
+NON_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+_tag_patterns = {} # tag -> get_tag_pattern's pattern
+
+class LabelParseError(ValueError):
+    pass
+
+def clean_text(fragment):
+    # tags out, entities decoded, nbsp and runs of whitespace collapsed
+    return " ".join(html.unescape(TAG_PATTERN.sub(" ", fragment)).split())
+
+def get_label_kind(tag, attrs):
+    # "name", "serving", "nutrient" or None for a tag that isn't part of the label
+    if tag == "h2":
+        return "name"
+    match = CLASS_PATTERN.search(attrs)
+    if not match:
+        return None
+    classes = (match["double"] or match["single"] or match["bare"] or "").lower().split()
+    return next((LABEL_CLASSES[c] for c in classes if c in LABEL_CLASSES), None)
+
+def get_tag_pattern(tag):
+    # matches <tag ...>, <tag .../> and </tag>
+    pattern = _tag_patterns.get(tag)
+    if pattern is None:
+        pattern = _tag_patterns[tag] = re.compile(rf"<(/?){tag}\b[^>]*?(/?)>", re.IGNORECASE)
+    return pattern
+
+def find_closing_tag(page, tag, pos):
+    # the </tag> closing an element whose content starts at pos, past any nested <tag>s
+    depth = 1
+    for match in get_tag_pattern(tag).finditer(page, pos):
+        if match[1]:
+            depth -= 1
+            if depth == 0:
+                return match
+        elif not match[2]: # <tag/> opens nothing
+            depth += 1
+    return None
+
+def iter_label_elements(page):
+    # yields (kind, inner html) for the label's elements in page order
+    pos = 0
+    while match := ELEMENT_PATTERN.search(page, pos):
+        tag = match["tag"].lower()
+        start = match.start("inner")
+        kind = get_label_kind(tag, match["attrs"])
+        if kind is None:
+            pos = start # its content can still hold label elements
+            continue
+        inner, pos = match["inner"], match.end()
+        if get_tag_pattern(tag).search(inner): # a nested <tag> took the first closing tag
+            closing_tag = find_closing_tag(page, tag, start)
+            if closing_tag is None:
+                pos = start
+                continue
+            inner, pos = page[start:closing_tag.start()], closing_tag.end()
+        yield kind, inner
+
+def parse_nutrient(text):
+    # "Total Fat 8g" -> ("total_fat", 8.0, "g"), None for % daily value spans
+    text = text.lower()
+    if not text or PERCENT_PATTERN.match(text):
+        return None
+    match = NUTRIENT_PATTERN.match(text) or INCLUDES_PATTERN.match(text)
+    if not match:
+        raise LabelParseError(f"can't read nutrient line {text!r}")
+    key = NON_WORD_PATTERN.sub("_", match["name"]).strip("_")
+    unit = match["unit"] or ("kcal" if key.startswith("calories") else "")
+    return key, 0.0 if match["less_than"] else float(match["amount"]), unit
+
+def parse_label(page):
+    # returns {"name", "serving_size", "nutrients": {key: (amount, unit)}, "unparsed": [text]}
+    name = None
+    servings = []
+    nutrients = {}
+    unparsed = []
+
+    for kind, inner in iter_label_elements(page):
+        if kind == "name":
+            name = name or clean_text(inner)
+        elif kind == "serving":
+            servings.append(clean_text(inner))
+        else:
+            text = clean_text(inner)
             try:
-                calories = float(text.split()[1].replace("kcal", ""))
-            except:
-                pass
+                nutrient = parse_nutrient(text)
+            except LabelParseError:
+                unparsed.append(text)
+                continue
+            if nutrient and nutrient[0] not in nutrients: # first one wins, like "calories" before "calories from fat"
+                nutrients[nutrient[0]] = nutrient[1:]
+
+    if not name:
+        raise LabelParseError("label has no food name")
+    missing = [key for key in REQUIRED_NUTRIENTS if key not in nutrients]
+    if missing:
+        unrecognized = f" (unrecognized: {unparsed})" if unparsed else ""
+        raise LabelParseError(f"label for {name} is missing {', '.join(missing)}{unrecognized}")
 
-    print(f"Scraped macros for {name}.")
     return {
         "name": name,
-        "url": url,
-        "serving_size": serving_size or 0.0,
-        "protein": protein or 0.0,
-        "carbs": carbs or 0.0,
-        "fat": fat or 0.0,
-        "calories": calories or 0.0
+        "serving_size": servings[1].lower() if len(servings) > 1 else None,
+        "nutrients": nutrients,
+        "unparsed": unparsed
     }
 
 
 # -------------- MAIN SCRAPER ------------------------------------
-def scrape_all_dining_halls(date_str=None):
+# each location is scraped by its own worker (menu page, then labels for canonical foods no other
+# location already claimed, see canonical.py) with its own deadline, so adding locations doesn't add their times up. label
+# fetches share one AdaptiveLimiter so more locations don't mean more load on the site.
+# LOCATION_WORKERS caps the workers (None = one per location).
+LOCATION_WORKERS = None
+
+def scrape_location(hall, locations, date_str, existing_urls, live_keys, claimed_keys, claimed_lock, limiter):
+    # returns (foods on the menu, foods new to the db, new foods with macros, labels fetched),
+    # foods is None if closed
+    deadline = monotonic() + LOCATION_TIMEOUT
+    url = get_menu_url(hall, date_str, locations)
+    soup = BeautifulSoup(fetch_page(url), "html.parser")
+    if not is_valid_menu(soup):
+        print(f"Invalid menu for {hall} on {date_str}")
+        return None, [], [], 0
+
+    print(f"Scraping {hall} menu on {date_str}")
+    foods = get_all_foods(soup, date_str, hall)
+
+    # Determine which foods are new (not live yet), and which of those are a dish no url has a label
+    # for yet. every location stages the new urls it serves, even ones another location also
+    # serves, so a url doesn't go missing when that other location fails. a new url replacing
+    # a live one of its canonical food at this hall and meal gets its own label too, so
+    # record_menu_changes can tell whether the macros changed
+    new_foods = list({f["url"]: f for f in foods if f["url"] not in existing_urls}.values())
+    with claimed_lock:
+        to_fetch = {}
+        for f in new_foods:
+            f["canonical_key"] = canonical.get_key(f["url"], f["name"])
+            if f["canonical_key"] not in claimed_keys:
+                to_fetch.setdefault(f["canonical_key"], f)
+        claimed_keys.update(to_fetch)
+    relabeled = [
+        f for f in new_foods
+        if (hall, f["meal"], *f["canonical_key"]) in live_keys and to_fetch.get(f["canonical_key"]) is not f
+    ]
+    to_fetch = list(to_fetch.values()) + relabeled
+
+    # Fetch macros only for new canonical foods, publish_staged copies them to the other new urls
+    return foods, new_foods, fetch_macros_for_new(to_fetch, limiter, deadline), len(to_fetch)
+
+def scrape_all_dining_halls(date_str=None, ran_at=None):
     if not date_str:
         date_str = get_formatted_date()
+    if not ran_at:
+        ran_at = datetime.now().isoformat()
 
     total_foods_found = 0 # foods scraped from menus
-    total_new_foods = 0 # unique new foods to be added to "foods" table
+    total_new_foods = 0 # unique new foods to be added to "foods" table, counted once staged
     total_menu_rows = 0 # rows to be added to "menus" table 
+    total_labels = 0 # label pages fetched, one per new canonical food
 
-    for hall in DINING_HALL_ID_DICT:
-        url = get_menu_url(hall, date_str)
-        soup = BeautifulSoup(requests.get(url).text, "html.parser")
-        if not is_valid_menu(soup):
-            print(f"Invalid menu for {hall} on {date_str}")
-            continue
+    locations = get_locations()
+    existing_urls = get_existing_urls()
+    claimed_lock = Lock()
+    limiter = AdaptiveLimiter() # shared across locations so what it learned about the site carries over
+
+    # isolation_level=None: staging writes autocommit, publish_staged manages its own transaction
+    with closing(sqlite3.connect("macro_tracker.db", isolation_level=None)) as conn:
+        canonical.backfill(conn) # foods from before canonical_foods, a no-op after the first run
+        claimed_keys = canonical.get_known_keys(conn)
+        # (hall, meal, recipe, name_key) live on this date, see scrape_location
+        live_keys = set(conn.execute("""
+            SELECT m.location, m.meal_type, c.recipe, c.name_key
+            FROM menus m JOIN foods f ON f.id = m.food_id JOIN canonical_foods c ON c.id = f.canonical_id
+            WHERE m.date = ?
+        """, (date_str,)).fetchall())
+        create_staging_tables(conn)
+        errors = []
 
-        print(f"Scraping {hall} menu on {date_str}")
-        foods = get_all_foods(soup, date_str, hall)
-        total_foods_found += len(foods)
+        with ThreadPoolExecutor(max_workers=LOCATION_WORKERS or len(locations)) as executor:
+            future_to_hall = {
+                executor.submit(scrape_location, hall, locations, date_str, existing_urls, live_keys, claimed_keys, claimed_lock, limiter): hall
+                for hall in locations
+            }
+            for future in as_completed(future_to_hall):
+                hall = future_to_hall[future]
+                try:
+                    foods, new_foods, foods_with_macros, labels = future.result()
+                except Exception as e:
+                    # this location keeps its last published menu, the others still go out
+                    print(f"Skipping {hall} on {date_str}: {e}")
+                    errors.append(e)
+                    continue
+                if foods is None:
+                    continue
+                total_foods_found += len(foods)
+                total_labels += labels
 
-        # Determine which foods are new
-        existing_urls = get_existing_urls()
-        new_foods = [f for f in foods if f["url"] not in existing_urls]
-        total_new_foods += len(new_foods)
+                # Stage new foods and menus, nothing is visible to readers yet
+                stage_hall(conn, hall, foods, new_foods, foods_with_macros)
 
-        # Fetch macros only for new foods
-        foods_with_macros = fetch_macros_for_new(new_foods)
+        if errors and len(errors) == len(locations):
+            raise errors[0]
+        total_new_foods = conn.execute("SELECT COUNT(*) FROM staging.foods").fetchone()[0]
+        total_labels += retry_orphaned_labels(conn, limiter)
 
-        # Insert new foods and menus
-        batch_insert_foods(foods_with_macros)
-        total_menu_rows = batch_insert_menus(foods)
+        total_menu_rows = publish_staged(conn, date_str, ran_at, total_foods_found, total_new_foods, total_labels)
 
     return total_foods_found, total_new_foods, total_menu_rows, date_str
 
@@ -366,7 +1111,7 @@ def run_scraper(date_str=None):
         date_str = get_formatted_date()
 
     try:
-        total_foods_found, total_new_foods, total_menu_rows, date_str = scrape_all_dining_halls(date_str)
+        total_foods_found, total_new_foods, total_menu_rows, date_str = scrape_all_dining_halls(date_str, ran_at)
         # Determine status
         if total_foods_found == 0:
             status = "closed"
@@ -377,17 +1122,25 @@ def run_scraper(date_str=None):
         status = "failed"
         error_message = str(e)
         total_foods_found = total_new_foods = total_menu_rows = 0
-        date_str = get_formatted_date()
 
-    # Log the run
-    log_scrape_run(
-        menu_date=date_str,
-        ran_at=ran_at,
-        status=status,
-        foods_found=total_foods_found,
-        new_foods=total_new_foods,
-        menu_rows=total_menu_rows
-    )
+    # Log the failed run (successful runs are logged by publish_staged along with their menus)
+    if status == "failed":
+        log_scrape_run(
+            menu_date=date_str,
+            ran_at=ran_at,
+            status=status,
+            foods_found=total_foods_found,
+            new_foods=total_new_foods,
+            menu_rows=total_menu_rows
+        )
+
+    # the web workers read near-term menus from the mmapped snapshot, not the db
+    if status != "failed":
+        try:
+            size = menu_snapshot.publish()
+            print(f"Published menu snapshot ({size / 1024:.1f} KB).")
+        except (OSError, sqlite3.Error) as e:
+            print(f"Couldn't publish menu snapshot: {e}")
 
     if status == "closed":
         print("Dining halls were closed today.")
@@ -395,7 +1148,9 @@ def run_scraper(date_str=None):
         print(f"Scraped {total_foods_found} foods, added {total_new_foods} new foods, {total_menu_rows} menu rows.")
     else:
         print(f"Scraper failed: {error_message}")
+    return status
 
 if __name__ == "__main__":
     create_tables()
+    discover_locations()
     run_scraper("12/18/2025")
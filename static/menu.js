@@ -0,0 +1,293 @@
+// menu.js: the menu page loads one payload per date (/api/menu/day, every hall and meal) and
+// does hall switching, sorting and filtering in the browser instead of a POST + redirect + render.
+// the server-rendered menu stays as the first paint and the fallback if the payload can't load.
+// it also registers the service worker (templates/sw.js) that keeps the page usable offline.
+
+(() => {
+    const MEAL_ORDER = ["breakfast", "brunch", "lunch", "dinner"];
+    const SORTS = {
+        "protein-per-calorie": (a, b) => ratio(b) - ratio(a),
+        "protein": (a, b) => b.protein - a.protein,
+        "calories-asc": (a, b) => a.calories - b.calories,
+        "calories-desc": (a, b) => b.calories - a.calories,
+        "carbs": (a, b) => b.carbs - a.carbs,
+        "fat-asc": (a, b) => a.fat - b.fat,
+    };
+
+    const page = document.getElementById("menu-page");
+    const controls = document.getElementById("menu-controls");
+    const hallSelect = document.getElementById("hall-select");
+    const dateInput = document.getElementById("date-input");
+    const content = document.getElementById("menu-content");
+    const noData = document.getElementById("no-data");
+    const tabs = document.getElementById("meal-tabs");
+    const list = document.getElementById("meal-list");
+    const mealInput = document.getElementById("current-meal");
+    const filterInput = document.getElementById("food-filter");
+    const sortSelect = document.getElementById("food-sort");
+
+    const offlineStatus = document.getElementById("offline-status");
+
+    // the url wins over the rendered page: offline, the page is the cached copy of the last visit
+    const params = new URLSearchParams(location.search);
+    let date = params.get("date") ? fromPicker(params.get("date")) : page.dataset.date; // M/D/YYYY like the server
+    let hall = params.get("hall") || page.dataset.hall;
+    let day = null; // decoded payload for `date`, null until loaded
+    let activeMeal = null;
+    const selected = new Map(); // food id -> quantity, survives re-renders
+
+    function ratio(food) {
+        return food.calories ? food.protein / food.calories : 0;
+    }
+
+    function escapeHtml(text) {
+        return String(text).replace(/[&<>"']/g, c => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"})[c]);
+    }
+
+    function capitalize(text) {
+        return text.charAt(0).toUpperCase() + text.slice(1);
+    }
+
+    // "10/19/2026" <-> "10-19-2026" (the api/date picker format)
+    function toParam(menuDate) {
+        return menuDate.replaceAll("/", "-");
+    }
+
+    function fromPicker(pickerDate) {
+        const [month, dayOfMonth, year] = pickerDate.split("-").map(Number);
+        return `${month}/${dayOfMonth}/${year}`;
+    }
+
+    // columnar payload -> {hall: {meal: [food]}}
+    function decode(payload) {
+        const foods = payload.foods;
+        const items = payload.items;
+        const byHall = {};
+        for (let i = 0; i < items.food.length; i++) {
+            const f = items.food[i];
+            const hallName = payload.halls[items.hall[i]];
+            const meal = payload.meals[items.meal[i]];
+            byHall[hallName] ??= {};
+            (byHall[hallName][meal] ??= []).push({
+                id: foods.id[f],
+                name: foods.name[f],
+                serving_size: foods.serving_size[f],
+                calories: foods.calories[f],
+                protein: foods.protein[f],
+                carbs: foods.carbs[f],
+                fat: foods.fat[f],
+                station: payload.stations[items.station[i]],
+                menu_id: items.menu_id[i],
+            });
+        }
+        return {date: payload.date, byHall};
+    }
+
+    async function loadDay(menuDate) {
+        // plain fetch so the browser's http cache (etag / max-age) does the caching
+        const response = await fetch(`${page.dataset.api}?date=${toParam(menuDate)}`);
+        if (!response.ok) {
+            throw new Error(`menu payload failed: ${response.status}`);
+        }
+        return decode(await response.json());
+    }
+
+    // same markup as templates/_meal.html so logging still posts the same fields
+    function renderFood(food, showStation) {
+        const quantity = selected.get(String(food.id));
+        const active = quantity !== undefined;
+        return `
+            <div class="col-md-6" data-name="${escapeHtml(food.name.toLowerCase())}">
+                <div class="p-3 food-card ${active ? "active" : ""}">
+                    <input type="hidden" name="menu_id_${food.id}" value="${food.menu_id}">
+                    <input type="checkbox" name="food_id" value="${food.id}" id="food_${food.id}" class="d-none" ${active ? "checked" : ""}>
+                    <label for="food_${food.id}" class="fw-bold mb-1" style="cursor: pointer;">${escapeHtml(food.name)}</label>
+                    <span class="text-muted"> | ${escapeHtml(food.serving_size)}${showStation ? ` | ${escapeHtml(food.station)}` : ""}</span>
+                    <div class="d-flex flex-wrap gap-2 mt-2 mb-2">
+                        <span class="macro-badge calories">${food.calories} cal</span>
+                        <span class="macro-badge">Protein ${food.protein}g</span>
+                        <span class="macro-badge">Carbs ${food.carbs}g</span>
+                        <span class="macro-badge">Fat ${food.fat}g</span>
+                    </div>
+                    <input type="number" name="quantity_${food.id}" class="form-control quantity-input" min="1"
+                        value="${quantity ?? 1}" placeholder="Quantity" style="display: ${active ? "block" : "none"}">
+                </div>
+            </div>`;
+    }
+
+    function renderGroup(title, foods, showStation) {
+        return `
+            <div class="card mb-4 station-card">
+                <div class="card-header"><h4 class="mb-0">${escapeHtml(title)}</h4></div>
+                <div class="card-body"><div class="row g-3">${foods.map(f => renderFood(f, showStation)).join("")}</div></div>
+            </div>`;
+    }
+
+    function renderMeal(meal, foods) {
+        const sort = SORTS[sortSelect.value];
+        let groups;
+        if (sort) {
+            groups = renderGroup(`All stations - ${sortSelect.selectedOptions[0].text}`, [...foods].sort(sort), true);
+        } else {
+            const byStation = new Map();
+            [...foods]
+                .sort((a, b) => a.station.localeCompare(b.station) || a.name.localeCompare(b.name))
+                .forEach(f => byStation.has(f.station) ? byStation.get(f.station).push(f) : byStation.set(f.station, [f]));
+            groups = [...byStation].map(([station, stationFoods]) => renderGroup(station, stationFoods, false)).join("");
+        }
+        return `<div class="meal ${meal === activeMeal ? "active" : ""}" id="${meal}">${groups}</div>`;
+    }
+
+    function render() {
+        const meals = day.byHall[hall] || {};
+        const mealNames = MEAL_ORDER.filter(m => meals[m]).concat(Object.keys(meals).filter(m => !MEAL_ORDER.includes(m)));
+
+        document.getElementById("hall-name").textContent = hall;
+        document.getElementById("menu-date").textContent = date;
+        content.classList.toggle("d-none", mealNames.length === 0);
+        noData.classList.toggle("d-none", mealNames.length > 0);
+        if (!mealNames.length) {
+            return;
+        }
+
+        if (!mealNames.includes(activeMeal)) {
+            activeMeal = mealNames[0];
+        }
+        tabs.innerHTML = mealNames.map(m =>
+            `<button type="button" class="meal-tab ${m === activeMeal ? "active" : ""}" data-meal="${m}">${capitalize(m)}</button>`
+        ).join("");
+        list.innerHTML = mealNames.map(m => renderMeal(m, meals[m])).join("");
+        mealInput.value = activeMeal;
+        applyFilter();
+    }
+
+    // filtering only hides cards, so selected foods stay in the form
+    function applyFilter() {
+        const text = filterInput.value.trim().toLowerCase();
+        list.querySelectorAll(".station-card, .card.mb-4").forEach(card => {
+            let visible = 0;
+            card.querySelectorAll(".col-md-6").forEach(col => {
+                const name = col.dataset.name ?? col.querySelector("label").textContent.trim().toLowerCase();
+                const match = !text || name.includes(text);
+                col.classList.toggle("d-none", !match);
+                visible += match;
+            });
+            card.classList.toggle("d-none", visible === 0);
+        });
+    }
+
+    function showMeal(meal) {
+        activeMeal = meal;
+        tabs.querySelectorAll(".meal-tab").forEach(t => t.classList.toggle("active", t.dataset.meal === meal));
+        list.querySelectorAll(".meal").forEach(m => m.classList.toggle("active", m.id === meal));
+        mealInput.value = meal;
+    }
+
+    function rememberUrl() {
+        history.replaceState(null, "", `?hall=${encodeURIComponent(hall)}&date=${toParam(date)}`);
+    }
+
+    // --- events (delegated, the lists get re-rendered) ---
+    list.addEventListener("click", e => {
+        const card = e.target.closest(".food-card");
+        if (!card || e.target.matches("input")) {
+            return;
+        }
+        const checkbox = card.querySelector('input[type="checkbox"]');
+        const quantity = card.querySelector(".quantity-input");
+        const active = card.classList.toggle("active");
+        checkbox.checked = active;
+        quantity.style.display = active ? "block" : "none";
+        active ? selected.set(checkbox.value, quantity.value) : selected.delete(checkbox.value);
+    });
+
+    list.addEventListener("input", e => {
+        if (e.target.matches(".quantity-input")) {
+            const foodId = e.target.name.replace("quantity_", "");
+            if (selected.has(foodId)) {
+                selected.set(foodId, e.target.value);
+            }
+        }
+    });
+
+    tabs.addEventListener("click", e => {
+        const tab = e.target.closest(".meal-tab");
+        if (tab && document.getElementById(tab.dataset.meal)) {
+            showMeal(tab.dataset.meal);
+        }
+    });
+
+    filterInput.addEventListener("input", applyFilter);
+    sortSelect.addEventListener("change", () => day && render());
+
+    hallSelect.addEventListener("change", () => {
+        if (day && hallSelect.value !== "Placeholder") {
+            hall = hallSelect.value;
+            render();
+            rememberUrl();
+        }
+    });
+
+    controls.addEventListener("submit", async e => {
+        if (!day) {
+            return; // payload never loaded, let the form post like before
+        }
+        e.preventDefault();
+        try {
+            if (dateInput.value && fromPicker(dateInput.value) !== date) {
+                day = await loadDay(fromPicker(dateInput.value));
+                date = day.date;
+                selected.clear();
+            }
+        } catch (err) {
+            day = null;
+            controls.requestSubmit(e.submitter);
+            return;
+        }
+        if (hallSelect.value !== "Placeholder") {
+            hall = hallSelect.value;
+        }
+        render();
+        rememberUrl();
+    });
+
+    // --- offline mode ---
+    function showOfflineStatus(text) {
+        offlineStatus.textContent = text;
+        offlineStatus.classList.toggle("d-none", !text);
+    }
+
+    if (params.get("queued")) { // the service worker queued a log-foods post it couldn't send
+        showOfflineStatus(`You're offline. ${params.get("queued")} food(s) saved, they'll be logged once you're back online.`);
+    }
+
+    if ("serviceWorker" in navigator) {
+        navigator.serviceWorker.register(page.dataset.sw).catch(err => console.warn("No offline mode:", err));
+        navigator.serviceWorker.addEventListener("message", e => {
+            if (e.data?.type === "logs-flushed" && e.data.logged) {
+                showOfflineStatus(`Logged ${e.data.logged} food(s) saved while offline.` +
+                    (e.data.remaining ? ` ${e.data.remaining} still waiting.` : ""));
+            }
+        });
+        const flush = () => navigator.serviceWorker.controller?.postMessage({type: "flush-logs"});
+        window.addEventListener("online", flush);
+        flush();
+    }
+
+    if (hall !== page.dataset.hall && [...hallSelect.options].some(o => o.value === hall)) {
+        hallSelect.value = hall;
+    }
+
+    const renderedMeal = document.querySelector(".meal.active");
+    if (renderedMeal) {
+        activeMeal = renderedMeal.id;
+        mealInput.value = activeMeal;
+    }
+
+    loadDay(date)
+        .then(loaded => {
+            day = loaded;
+            render();
+        })
+        .catch(err => console.warn("Using the server-rendered menu:", err));
+})();
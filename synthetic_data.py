@@ -0,0 +1,305 @@
+import argparse
+import math
+import os
+import random
+import sqlite3
+import time
+import uuid
+from datetime import date, timedelta
+
+import scraper
+
+# synthetic_data.py used for filling a database (same schema as scraper.create_tables) with a
+# deterministic, realistic-looking dataset for scale testing. the same seed, --as-of and --end-date
+# always produce the same db.
+#   python synthetic_data.py --db synthetic.db --scale medium --seed 1
+#   python synthetic_data.py --db huge.db --scale large --logs-per-day 40000
+
+SCALES = {
+    "small": {"foods": 2000, "days": 60, "users": 200, "visitors": 1000, "logs_per_day": 200},
+    "medium": {"foods": 8000, "days": 365, "users": 2000, "visitors": 20000, "logs_per_day": 3000},
+    "large": {"foods": 20000, "days": 365 * 4, "users": 10000, "visitors": 200000, "logs_per_day": 20000},
+}
+
+# station name per hall -> category, foods belong to a category
+HALL_STATIONS = {
+    "South Campus": {
+        "Breakfast Station": "breakfast", "Grill Works": "grill", "Terrapin Favorites": "entree",
+        "Pizza": "pizza", "Deli": "deli", "Salad Bar": "salad", "Vegan Station": "vegan",
+        "Soup Station": "soup", "Dessert": "dessert",
+    },
+    "Yahentamitsi Dining Hall": {
+        "Morning Bites": "breakfast", "Grill": "grill", "Chef's Table": "entree", "Halal": "entree",
+        "Pizza & Flatbreads": "pizza", "Salad Bar": "salad", "Purple Zone": "vegan",
+        "Global Kitchen": "international", "Soup": "soup", "Sweet Treats": "dessert",
+    },
+    "251 North": {
+        "Breakfast": "breakfast", "Grill Works": "grill", "Home Style": "entree", "Pasta Bar": "pasta",
+        "Deli": "deli", "Salad Bar": "salad", "Vegan": "vegan", "Mongolian Grill": "international",
+        "Dessert": "dessert",
+    },
+}
+
+# how many foods a hall serves per meal, and which categories they come from
+MEAL_ITEMS = {"breakfast": 35, "lunch": 70, "dinner": 75, "brunch": 80}
+MEAL_CATEGORIES = {
+    "breakfast": {"breakfast": 60, "grill": 10, "vegan": 10, "dessert": 10, "salad": 10},
+    "lunch": {"grill": 15, "entree": 15, "pizza": 10, "deli": 10, "salad": 15, "vegan": 10,
+              "international": 10, "pasta": 5, "soup": 5, "dessert": 5},
+    "dinner": {"grill": 10, "entree": 20, "pizza": 10, "deli": 5, "salad": 15, "vegan": 10,
+               "international": 15, "pasta": 5, "soup": 5, "dessert": 5},
+    "brunch": {"breakfast": 35, "grill": 15, "entree": 10, "pizza": 5, "salad": 15, "vegan": 10, "dessert": 10},
+}
+
+# (median calories, protein/carbs/fat share of calories, serving sizes, base names)
+CATEGORIES = {
+    "breakfast": (250, (0.2, 0.5, 0.3), ["1 each", "1/2 cup", "2 oz", "1 slice"],
+                  ["Scrambled Eggs", "Pancakes", "French Toast", "Hash Browns", "Turkey Sausage", "Bacon",
+                   "Oatmeal", "Breakfast Burrito", "Belgian Waffle", "Egg and Cheese Biscuit"]),
+    "grill": (420, (0.25, 0.35, 0.4), ["1 each", "4 oz", "1 sandwich"],
+              ["Cheeseburger", "Chicken Tenders", "French Fries", "Grilled Chicken", "Hot Dog",
+               "Veggie Burger", "Sweet Potato Fries", "Chicken Sandwich"]),
+    "entree": (380, (0.3, 0.4, 0.3), ["4 oz", "6 oz", "1 cup"],
+               ["Roast Chicken", "Beef Brisket", "Baked Salmon", "Meatloaf", "Pork Carnitas", "Rice Pilaf",
+                "Mashed Potatoes", "Steamed Broccoli", "Roasted Vegetables", "Chicken Tikka Masala"]),
+    "pizza": (290, (0.17, 0.48, 0.35), ["1 slice"],
+              ["Cheese Pizza", "Pepperoni Pizza", "Veggie Pizza", "Buffalo Chicken Pizza", "Margherita Flatbread"]),
+    "deli": (350, (0.25, 0.45, 0.3), ["1 sandwich", "1 each"],
+             ["Turkey Sub", "Ham and Swiss", "Italian Sub", "Tuna Salad Wrap", "Chicken Caesar Wrap"]),
+    "salad": (90, (0.15, 0.55, 0.3), ["1/2 cup", "1 cup", "1 oz", "2 tbsp"],
+              ["Romaine Lettuce", "Spinach", "Cherry Tomatoes", "Cucumbers", "Chickpeas", "Ranch Dressing",
+               "Balsamic Vinaigrette", "Shredded Cheddar", "Hard Boiled Egg", "Croutons"]),
+    "vegan": (260, (0.18, 0.57, 0.25), ["1/2 cup", "1 cup", "4 oz"],
+              ["Tofu Stir Fry", "Black Bean Burger", "Vegan Chili", "Quinoa Salad", "Lentil Curry", "Falafel"]),
+    "international": (400, (0.22, 0.5, 0.28), ["1 cup", "6 oz"],
+                      ["Beef Bulgogi", "Chicken Pad Thai", "Vegetable Lo Mein", "Chicken Shawarma", "Jollof Rice",
+                       "Pork Dumplings", "Chana Masala"]),
+    "pasta": (420, (0.15, 0.6, 0.25), ["1 cup", "8 oz"],
+              ["Penne Marinara", "Fettuccine Alfredo", "Baked Ziti", "Mac and Cheese", "Pesto Pasta"]),
+    "soup": (160, (0.2, 0.5, 0.3), ["8 fl oz", "1 cup"],
+             ["Chicken Noodle Soup", "Tomato Bisque", "Minestrone", "Broccoli Cheddar Soup", "Lentil Soup"]),
+    "dessert": (330, (0.05, 0.6, 0.35), ["1 each", "1 slice", "1/2 cup"],
+                ["Chocolate Chip Cookie", "Brownie", "Vanilla Cake", "Apple Pie", "Rice Krispie Treat",
+                 "Soft Serve Ice Cream"]),
+}
+STYLES = ["", "Grilled", "Roasted", "Spicy", "Herb", "Garlic", "Classic", "Homestyle", "Lemon", "BBQ",
+          "Honey", "Cajun", "Smoked", "Teriyaki", "Cilantro Lime", "Southwest", "Mediterranean"]
+
+SERVINGS = [1.0, 2.0, 0.5, 1.5, 3.0]
+SERVING_WEIGHTS = [70, 18, 5, 4, 3]
+VARIANT_SHARE = 0.15 # foods that are the same recipe under another url (another hall/port)
+
+
+def format_date(day):
+    return f"{day.month}/{day.day}/{day.year}"
+
+def zipf_cum_weights(n, exponent=1.0):
+    # cumulative weights for random.choices, a few items get most of the picks
+    total = 0.0
+    cum_weights = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** exponent
+        cum_weights.append(total)
+    return cum_weights
+
+# activity multiplier for a day: quieter weekends, summer and winter break
+def day_activity(day):
+    activity = 0.7 if day.weekday() >= 5 else 1.0
+    if day.month in (6, 7) or (day.month == 8 and day.day < 25):
+        activity *= 0.15
+    elif (day.month == 12 and day.day > 20) or (day.month == 1 and day.day < 25):
+        activity *= 0.25
+    return activity
+
+def generate_foods(rng, num_foods):
+    # returns (rows for the foods table, {category: [food ids]})
+    categories = list(CATEGORIES)
+    rows = []
+    pools = {category: [] for category in categories}
+    recipes = [] # (category, name, recipe number, macros, serving size)
+
+    for food_id in range(1, num_foods + 1):
+        if recipes and rng.random() < VARIANT_SHARE:
+            category, name, recipe_num, macros, serving_size = rng.choice(recipes)
+            port = rng.choice([1, 5, 7, 9])
+        else:
+            category = rng.choice(categories)
+            median_calories, shares, serving_sizes, base_names = CATEGORIES[category]
+            name = f"{rng.choice(STYLES)} {rng.choice(base_names)}".strip()
+            recipe_num = 100000 + len(recipes) * 7 + rng.randint(0, 6)
+            calories = round(rng.lognormvariate(math.log(median_calories), 0.45))
+            protein_share, carb_share, fat_share = (max(0.01, share + rng.uniform(-0.08, 0.08)) for share in shares)
+            share_total = protein_share + carb_share + fat_share
+            macros = (
+                round(calories * protein_share / share_total / 4), # protein
+                round(calories * carb_share / share_total / 4), # carbs
+                round(calories * fat_share / share_total / 9), # fat
+                float(calories),
+            )
+            serving_size = rng.choice(serving_sizes)
+            port = 3
+            recipes.append((category, name, recipe_num, macros, serving_size))
+
+        protein, carbs, fat, calories = macros
+        url = f"{scraper.BASE_URL}label.aspx?RecNumAndPort={recipe_num}*{port}"
+        if port != 3:
+            url += f"&food={food_id}" # keep urls unique even if the same port is drawn twice
+        rows.append((food_id, name, url, protein, carbs, fat, calories, serving_size))
+        pools[category].append(food_id)
+
+    for category in categories:
+        rng.shuffle(pools[category]) # popularity rank within the pool
+    return rows, pools
+
+def pick_menu(rng, pools, pool_weights, hall, meal):
+    # foods for one (hall, meal): [(food_id, station)]
+    stations_by_category = {}
+    for station, category in HALL_STATIONS[hall].items():
+        stations_by_category.setdefault(category, []).append(station)
+
+    total_items = max(5, round(MEAL_ITEMS[meal] * rng.uniform(0.8, 1.2)))
+    categories = [c for c in MEAL_CATEGORIES[meal] if c in stations_by_category and pools[c]]
+    weights = [MEAL_CATEGORIES[meal][c] for c in categories]
+    counts = {}
+    for category in rng.choices(categories, weights, k=total_items):
+        counts[category] = counts.get(category, 0) + 1
+
+    picked = []
+    for category, count in counts.items():
+        pool = pools[category]
+        count = min(count, len(pool))
+        chosen = set()
+        while len(chosen) < count: # zipf picks so staples show up most days
+            chosen.update(rng.choices(pool, cum_weights=pool_weights[category], k=count - len(chosen)))
+        stations = stations_by_category[category]
+        picked.extend((food_id, rng.choice(stations)) for food_id in chosen)
+    return picked
+
+def generate(db_path, as_of, seed=0, foods=2000, days=60, users=200, visitors=1000, logs_per_day=200, end_date=None):
+    # as_of is the day the db is "taken": menus run a week past it, logs stop at it
+    rng = random.Random(seed)
+    end_date = end_date or as_of + timedelta(days=7)
+    start_date = end_date - timedelta(days=days - 1)
+    halls = list(scraper.DINING_HALL_ID_DICT)
+    counts = {"foods": 0, "menus": 0, "food_logs": 0, "users": 0, "scrape_runs": 0}
+
+    scraper.create_tables(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # bulk load: no journal, no fsync, one big transaction
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("BEGIN")
+
+    food_rows, pools = generate_foods(rng, foods)
+    conn.executemany("""
+        INSERT INTO foods (id, name, url, protein, carbs, fat, calories, serving_size)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, food_rows)
+    counts["foods"] = len(food_rows)
+    pool_weights = {category: zipf_cum_weights(len(pool), 0.8) for category, pool in pools.items()}
+
+    # every user shares one hash, hashing thousands of passwords would dominate the run
+    password_hash = "scrypt:32768:8:1$synthetic$" + "0" * 128
+    conn.executemany(
+        "INSERT INTO users (id, username, email, password, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((i, f"terp{i}", f"terp{i}@terpmail.umd.edu", password_hash, f"{start_date.isoformat()} 12:00:00")
+         for i in range(1, users + 1))
+    )
+    counts["users"] = users
+    visitor_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(visitors)]
+    user_weights = zipf_cum_weights(users, 0.7) if users else None
+    visitor_weights = zipf_cum_weights(visitors, 0.5) if visitors else None
+
+    menu_id = 0
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        date_str = format_date(day)
+        meals = ["brunch", "dinner"] if day.weekday() >= 5 else ["breakfast", "lunch", "dinner"]
+
+        menu_rows = []
+        served = {} # (hall, meal) -> [(food_id, menu_id)]
+        for hall in halls:
+            for meal in meals:
+                items = []
+                for food_id, station in pick_menu(rng, pools, pool_weights, hall, meal):
+                    menu_id += 1
+                    menu_rows.append((menu_id, food_id, hall, station, date_str, meal))
+                    items.append(food_id)
+                served[(hall, meal)] = items
+        conn.executemany("""
+            INSERT INTO menus (id, food_id, location, station, date, meal_type)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, menu_rows)
+        conn.execute("""
+            INSERT INTO scrape_runs (menu_date, ran_at, status, foods_found, new_foods, menu_rows)
+            VALUES (?, ?, 'success', ?, 0, ?)
+        """, (date_str, f"{day.isoformat()}T06:00:00", len(menu_rows), len(menu_rows)))
+        counts["menus"] += len(menu_rows)
+        counts["scrape_runs"] += 1
+
+        # only days that already happened have logs
+        if day > as_of:
+            continue
+        num_logs = round(logs_per_day * day_activity(day) * rng.uniform(0.85, 1.15))
+        if num_logs == 0 or not (users or visitors):
+            continue
+        keys = rng.choices(list(served), k=num_logs)
+        is_user = [rng.random() < 0.4 if users and visitors else bool(users) for _ in range(num_logs)]
+        num_user_logs = sum(is_user)
+        user_picks = iter(rng.choices(range(1, users + 1), cum_weights=user_weights, k=num_user_logs)) if users else None
+        visitor_picks = iter(rng.choices(visitor_ids, cum_weights=visitor_weights, k=num_logs - num_user_logs)) if visitors else None
+        servings = rng.choices(SERVINGS, SERVING_WEIGHTS, k=num_logs)
+
+        log_rows = []
+        for (hall, meal), logged_by_user, serving in zip(keys, is_user, servings):
+            items = served[(hall, meal)]
+            food_id = items[min(int(rng.expovariate(0.08)), len(items) - 1)] # front of the menu is popular
+            if logged_by_user:
+                log_rows.append((next(user_picks), None, food_id, date_str, meal, serving))
+            else:
+                log_rows.append((None, next(visitor_picks), food_id, date_str, meal, serving))
+        conn.executemany("""
+            INSERT INTO food_logs (user_id, visitor_id, food_id, date, meal_type, servings)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, log_rows)
+        counts["food_logs"] += len(log_rows)
+
+    conn.execute("COMMIT")
+    conn.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic TerpEats database for scale testing.")
+    parser.add_argument("--db", default="synthetic.db")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--as-of", help="the db's today (YYYY-MM-DD), no logs after it, defaults to today")
+    parser.add_argument("--end-date", help="last menu date (YYYY-MM-DD), defaults to a week after --as-of")
+    parser.add_argument("--force", action="store_true", help="overwrite --db if it exists")
+    for option in SCALES["small"]:
+        parser.add_argument(f"--{option.replace('_', '-')}", type=int, help=f"override the scale's {option}")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} already exists (use --force to overwrite)")
+        os.remove(args.db)
+
+    options = dict(SCALES[args.scale])
+    for option in options:
+        if getattr(args, option) is not None:
+            options[option] = getattr(args, option)
+    as_of = date.fromisoformat(args.as_of) if args.as_of else date.today()
+    end_date = date.fromisoformat(args.end_date) if args.end_date else None
+
+    start = time.perf_counter()
+    counts = generate(args.db, as_of, seed=args.seed, end_date=end_date, **options)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
+    print(f"Wrote {total} rows to {args.db} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
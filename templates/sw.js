@@ -0,0 +1,249 @@
+// sw.js: the service worker behind the menu page's offline mode (served by app.py at /sw.js so it
+// controls the whole site, rendered with the fingerprinted asset urls).
+//   static files   cache first (fingerprinted, they never change under the same url)
+//   menu payloads  /api/menu/day from cache straight away, refreshed in the background
+//   /menu page     network first, the last copy if the network is slow or gone
+//   logging        a log-foods post that can't reach the server is queued in indexeddb and sent
+//                  as one /api/logs/batch request once the connection is back
+
+const VERSION = {{ version|tojson }};
+const STATIC_CACHE = `terpeats-static-${VERSION}`;
+const MENU_CACHE = "terpeats-menus";
+const PAGE_CACHE = "terpeats-pages";
+const PRECACHE = {{ precache|tojson }};
+const MENU_URL = {{ menu_url|tojson }};
+const MENU_API_URL = {{ menu_api_url|tojson }};
+const BATCH_URL = {{ batch_url|tojson }};
+const BATCH_SIZE = {{ batch_size|tojson }};
+const CDN_HOSTS = ["cdn.jsdelivr.net", "fonts.googleapis.com", "fonts.gstatic.com"];
+const MENU_DAYS_KEPT = 8; // payloads kept, oldest written dropped first
+const NAVIGATION_TIMEOUT_MS = 3000; // then the cached page, the network answer still refreshes it
+
+const QUEUE_DB = "terpeats";
+const QUEUE_STORE = "queued_logs";
+
+// "10/19/2026" like the server's dates, and "10-19-2026" like menu.js asks for them
+function today() {
+    const now = new Date();
+    return `${now.getMonth() + 1}/${now.getDate()}/${now.getFullYear()}`;
+}
+
+function menuDayUrl(menuDate) {
+    return `${MENU_API_URL}?date=${menuDate.replaceAll("/", "-")}`;
+}
+
+// --- install / activate ---
+self.addEventListener("install", event => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(STATIC_CACHE);
+        await cache.addAll(PRECACHE);
+        // today's menus and the page itself, so the first offline visit already works
+        await Promise.allSettled([
+            caches.open(MENU_CACHE).then(menus => menus.add(menuDayUrl(today()))),
+            caches.open(PAGE_CACHE).then(pages => pages.add(MENU_URL)),
+        ]);
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener("activate", event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => name.startsWith("terpeats-static-") && name !== STATIC_CACHE)
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+        await flushLogs();
+    })());
+});
+
+// --- fetch ---
+self.addEventListener("fetch", event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin === self.location.origin && url.pathname === MENU_URL) {
+        if (request.method === "POST") {
+            event.respondWith(postMenu(request));
+        } else if (request.mode === "navigate") {
+            event.respondWith(networkFirst(event, request));
+        }
+    } else if (request.method !== "GET") {
+        return;
+    } else if (url.origin === self.location.origin && url.pathname === MENU_API_URL) {
+        event.respondWith(staleWhileRevalidate(event, request));
+    } else if ((url.origin === self.location.origin && url.pathname.startsWith("/static/")) || CDN_HOSTS.includes(url.hostname)) {
+        event.respondWith(cacheFirst(request));
+    }
+});
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok || response.type === "opaque") { // cdn css is fetched no-cors
+        const cache = await caches.open(STATIC_CACHE);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event, request) {
+    const cache = await caches.open(MENU_CACHE);
+    const cached = await cache.match(request);
+    const refresh = fetch(request).then(async response => {
+        if (response.ok) {
+            await cache.put(request, response.clone());
+            await trimMenus(cache);
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(refresh.catch(() => {})); // offline: the cached payload is all there is
+        return cached;
+    }
+    return refresh;
+}
+
+async function trimMenus(cache) {
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(keys.length - MENU_DAYS_KEPT, 0)).map(key => cache.delete(key)));
+}
+
+async function networkFirst(event, request) {
+    // one cached copy of the page whatever the query string, menu.js takes hall/date from the url
+    const cache = await caches.open(PAGE_CACHE);
+    const network = fetch(request).then(async response => {
+        if (response.ok && !response.redirected) {
+            await cache.put(MENU_URL, response.clone());
+        }
+        event.waitUntil(flushLogs()); // we're online, send anything queued
+        return response;
+    });
+    event.waitUntil(network.catch(() => {}));
+
+    const timeout = new Promise(resolve => setTimeout(resolve, NAVIGATION_TIMEOUT_MS));
+    const first = await Promise.race([network.catch(() => null), timeout]);
+    if (first) {
+        return first;
+    }
+    const cached = await cache.match(MENU_URL);
+    return cached || network;
+}
+
+// --- queued logging ---
+async function postMenu(request) {
+    const form = await request.clone().formData();
+    try {
+        return await fetch(request);
+    } catch (err) {
+        const foodIds = form.getAll("food_id");
+        if (form.get("change-menu") || !foodIds.length) {
+            throw err; // only log-foods posts are queued, menu.js switches halls/dates itself
+        }
+        const queuedAt = new Date().toISOString();
+        await queueLogs(foodIds.map(foodId => ({
+            client_id: crypto.randomUUID(), // lets the server drop a batch it already logged
+            food_id: Number(foodId),
+            menu_id: Number(form.get(`menu_id_${foodId}`)),
+            quantity: Number(form.get(`quantity_${foodId}`) || 1),
+            date: today(), // the day it was eaten, not the day the batch gets through
+            queued_at: queuedAt,
+        })));
+        if (self.registration.sync) {
+            await self.registration.sync.register("flush-logs").catch(() => {});
+        }
+        return Response.redirect(`${MENU_URL}?queued=${foodIds.length}`, 303);
+    }
+}
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(QUEUE_DB, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(QUEUE_STORE, {keyPath: "client_id"});
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+// runs use(store) in one transaction, resolves with the result of the request it returns
+async function withQueue(mode, use) {
+    const db = await openQueue();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(QUEUE_STORE, mode);
+        const request = use(transaction.objectStore(QUEUE_STORE));
+        transaction.oncomplete = () => {
+            db.close();
+            resolve(request?.result);
+        };
+        transaction.onerror = () => {
+            db.close();
+            reject(transaction.error);
+        };
+    });
+}
+
+function queueLogs(entries) {
+    return withQueue("readwrite", store => entries.forEach(entry => store.put(entry)));
+}
+
+function removeQueued(entries) {
+    return withQueue("readwrite", store => entries.forEach(entry => store.delete(entry.client_id)));
+}
+
+let flushing = null;
+
+function flushLogs() {
+    // one flush at a time, the sync event, page messages and navigations can all ask at once
+    flushing ??= sendQueued().finally(() => {
+        flushing = null;
+    });
+    return flushing;
+}
+
+async function sendQueued() {
+    let logged = 0;
+    let queued = await withQueue("readonly", store => store.getAll());
+    while (queued.length) {
+        const batch = queued.slice(0, BATCH_SIZE);
+        let response;
+        try {
+            response = await fetch(BATCH_URL, {
+                method: "POST",
+                headers: {"Content-Type": "application/json"},
+                body: JSON.stringify({logs: batch}),
+                credentials: "same-origin",
+            });
+        } catch (err) {
+            break; // still offline, try again on the next sync/visit
+        }
+        if (response.status === 400) {
+            await removeQueued(batch); // the server can never take it, don't retry forever
+        } else if (!response.ok) {
+            break; // signed out or server trouble, keep the logs for later
+        } else {
+            logged += (await response.json()).logged;
+            await removeQueued(batch);
+        }
+        queued = queued.slice(BATCH_SIZE);
+    }
+
+    const remaining = await withQueue("readonly", store => store.count());
+    const pages = await self.clients.matchAll({type: "window"});
+    pages.forEach(page => page.postMessage({type: "logs-flushed", logged, remaining}));
+    return logged;
+}
+
+self.addEventListener("sync", event => {
+    if (event.tag === "flush-logs") {
+        event.waitUntil(flushLogs());
+    }
+});
+
+self.addEventListener("message", event => {
+    if (event.data?.type === "flush-logs") {
+        event.waitUntil(flushLogs());
+    }
+});
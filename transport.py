@@ -0,0 +1,183 @@
+import argparse
+import json
+import lzma
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http import HTTPStatus
+from threading import Lock
+
+import requests
+
+import scraper
+
+# transport.py used for recording every page a scraper run downloads (location list, menus,
+# nutrition labels) into one xz-compressed archive, and replaying it later with no network: same
+# pages, same status codes, same timeouts, with the original latencies or none at all. good for
+# benchmarking/regression testing scraper changes without hitting nutrition.umd.edu.
+#   python transport.py record runs/12-18-2025.jsonl.xz --date 12/18/2025
+#   python transport.py replay runs/12-18-2025.jsonl.xz --zero-latency
+# replay writes to macro_tracker.db like a real run, run it from a scratch directory. which labels
+# get fetched depends on the foods already in the db, so replay against the same starting db the
+# run was recorded with (usually an empty one) or some labels will be missing from the archive.
+# archive: json lines, a header then one line per response, in the order they finished.
+
+FORMAT_VERSION = 1
+
+
+class ReplayMissError(requests.RequestException):
+    # the replayed run asked for a page the recorded one never downloaded
+    pass
+
+def request_exception(name):
+    # the requests exception class recorded by name, RequestException for one this version lacks
+    cls = getattr(requests.exceptions, name or "", None)
+    if isinstance(cls, type) and issubclass(cls, requests.RequestException):
+        return cls
+    return requests.RequestException
+
+def make_response(url, status, body):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.reason = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else ""
+    response.encoding = "utf-8"
+    response._content = body.encode("utf-8")
+    return response
+
+class Recorder:
+    def __init__(self, get=requests.get):
+        self.get_page = get
+        self.entries = []
+        self.lock = Lock()
+
+    def get(self, url, **kwargs):
+        started = time.monotonic()
+        entry = {"url": url}
+        try:
+            response = self.get_page(url, **kwargs)
+            entry.update(status=response.status_code, body=response.text)
+            return response
+        except requests.Timeout:
+            entry["error"] = "timeout"
+            raise
+        except requests.ConnectionError:
+            entry["error"] = "connection"
+            raise
+        except requests.RequestException as e:
+            # TooManyRedirects, ChunkedEncodingError, InvalidURL...: replayed as the same class
+            entry.update(error="request", exception=type(e).__name__)
+            raise
+        finally:
+            entry["elapsed"] = round(time.monotonic() - started, 4)
+            with self.lock:
+                self.entries.append(entry)
+
+    def save(self, path, dates):
+        header = {
+            "version": FORMAT_VERSION,
+            "recorded_at": datetime.now().isoformat(),
+            "base_url": scraper.BASE_URL,
+            "dates": dates,
+            "responses": len(self.entries),
+        }
+        with lzma.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry) + "\n")
+
+class Replayer:
+    def __init__(self, path, latency=True):
+        self.latency = latency
+        self.responses = defaultdict(list) # url -> entries, in recorded order
+        self.served = defaultdict(int)
+        self.misses = []
+        self.lock = Lock()
+
+        with lzma.open(path, "rt", encoding="utf-8") as f:
+            self.header = json.loads(f.readline())
+            if self.header.get("version") != FORMAT_VERSION:
+                raise ValueError(f"{path} is archive version {self.header.get('version')}, expected {FORMAT_VERSION}")
+            for line in f:
+                entry = json.loads(line)
+                if "status" not in entry and "error" not in entry:
+                    raise ValueError(f"{path}: entry for {entry.get('url')} has neither a status nor an error")
+                self.responses[entry["url"]].append(entry)
+
+    def get(self, url, **kwargs):
+        # a url fetched more than once (a retry after an error) replays its responses in order,
+        # then keeps repeating the last one
+        with self.lock:
+            entries = self.responses.get(url)
+            if not entries:
+                self.misses.append(url)
+                raise ReplayMissError(f"{url} is not in the recorded run")
+            entry = entries[min(self.served[url], len(entries) - 1)]
+            self.served[url] += 1
+
+        if self.latency:
+            time.sleep(entry["elapsed"])
+        if entry.get("error") == "timeout":
+            raise requests.Timeout(f"recorded timeout for {url}")
+        if entry.get("error") == "connection":
+            raise requests.ConnectionError(f"recorded connection error for {url}")
+        if "error" in entry:
+            raise request_exception(entry.get("exception"))(f"recorded {entry.get('exception')} for {url}")
+        return make_response(url, entry["status"], entry["body"])
+
+@contextmanager
+def recording(path, dates=()):
+    recorder = Recorder(scraper.http_get)
+    original = scraper.http_get
+    scraper.http_get = recorder.get
+    try:
+        yield recorder
+    finally:
+        scraper.http_get = original
+        recorder.save(path, list(dates))
+
+@contextmanager
+def replaying(path, latency=True):
+    replayer = Replayer(path, latency)
+    original_get, original_base_url = scraper.http_get, scraper.BASE_URL
+    scraper.http_get = replayer.get
+    scraper.BASE_URL = replayer.header["base_url"] # label urls are built from it, they have to match the recording
+    try:
+        yield replayer
+    finally:
+        scraper.http_get, scraper.BASE_URL = original_get, original_base_url
+
+def scrape(dates):
+    scraper.create_tables()
+    scraper.discover_locations()
+    for date_str in dates:
+        scraper.run_scraper(date_str)
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a scraper run's responses, or replay them offline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="scrape for real and save every response")
+    record_parser.add_argument("archive", help="where to write the archive (.jsonl.xz)")
+    record_parser.add_argument("--date", nargs="+", help="menu dates to scrape (M/D/YYYY), default today")
+    replay_parser = subparsers.add_parser("replay", help="run the scraper against a recorded archive")
+    replay_parser.add_argument("archive")
+    replay_parser.add_argument("--date", nargs="+", help="menu dates to scrape, default the recorded ones")
+    replay_parser.add_argument("--zero-latency", action="store_true", help="answer right away instead of at the recorded speed")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "record":
+        dates = args.date or [scraper.get_formatted_date()]
+        with recording(args.archive, dates) as recorder:
+            scrape(dates)
+        print(f"Recorded {len(recorder.entries)} responses to {args.archive} in {time.perf_counter() - started:.1f}s")
+        return
+
+    with replaying(args.archive, latency=not args.zero_latency) as replayer:
+        scrape(args.date or replayer.header["dates"])
+    print(f"Replayed {sum(replayer.served.values())} responses in {time.perf_counter() - started:.1f}s"
+          f" ({len(replayer.misses)} not in the archive)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from datetime import date, datetime, time
+
+# utils.py used for the small helpers shared by the web app and the scraper (dates, meal times,
+# the default dining locations). keep it to the standard library: every web worker imports it,
+# and app.py must not pull in scraper.py's bs4/requests just to know today's date.
+
+DINING_HALL_ID_DICT = {
+    "South Campus": 16,
+    "Yahentamitsi Dining Hall": 19,
+    "251 North": 51
+}
+# short labels for the menu page's hall dropdown
+DEFAULT_DISPLAY_NAMES = {
+    "South Campus": "South",
+    "Yahentamitsi Dining Hall": "Yahentamitsi"
+}
+
+
+def get_formatted_date():
+    today = date.today()
+    formatted_date = f"{today.month}/{today.day}/{today.year}"
+    return formatted_date
+
+# returns meal type (breakfast, lunch, or dinner) based on current time
+def get_meal_type():
+    breakfast_end = time(10, 30)
+    lunch_end = time(16, 0)
+    now = datetime.now().time()
+    
+    if now < breakfast_end:
+        return "breakfast"
+    elif now < lunch_end:
+        return "lunch"
+    else:
+        return "dinner"
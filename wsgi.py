@@ -0,0 +1,6 @@
+from app import app, warm_up
+
+# wsgi.py is the production entrypoint (see gunicorn.conf.py):
+#   gunicorn -c gunicorn.conf.py wsgi:app
+
+warm_up()